@@ -1,5 +1,6 @@
 # functions just for this project
 import os
+import sys
 import getpass
 import subprocess
 
@@ -8,15 +9,23 @@ import tasklib
 # this is the svn repository that holds private fixtures
 fixtures_repo = "https://svn.aptivate.org/svn/reactionsarpam/data/fixtures/"
 
+# the group apache runs as
+apache_group = "apache"
+
 def deploy(environment=None, svnuser=None, svnpass=None):
     if environment == None:
         environment = tasklib._infer_environment()
 
     tasklib.create_ve()
     tasklib.link_local_settings(environment)
+    create_shared_cache_dir()
+    create_static_pages_dir()
     tasklib.update_db()
+    # syncdb doesn't add indexes to tables that already exist
+    tasklib._manage_py(['create_indexes'])
     checkout_or_update_fixtures(svnuser, svnpass)
     load_fixtures()
+    render_static_pages(rebuild_all=True)
 
 def run_jenkins(svnuser, svnpass):
     """ make sure the local settings is correct and the database exists """
@@ -66,7 +75,45 @@ def load_fixtures():
     fixture_list = map(lambda fn: os.path.join('fixtures', 'initial_data', fn), 
                         fixture_list)
     fixture_list.sort()
-    tasklib._manage_py(['loaddata'] + fixture_list)
+    tasklib._manage_py(['bulk_loaddata'] + fixture_list)
+    # loading fixtures doesn't trigger the search index or price summary
+    # updates
+    tasklib._manage_py(['rebuild_formulation_index'])
+    tasklib._manage_py(['rebuild_price_summaries'])
+
+def render_static_pages(rebuild_all=False):
+    """ rewrite the pages apache serves whose data has changed """
+    args = ['render_static_pages']
+    if rebuild_all:
+        # the templates may have changed too
+        args.append('--all')
+    tasklib._manage_py(args)
+
+def load_fixture_delta():
+    """ apply the changes written by scripts/scrape.py --incremental """
+    delta_dir = os.path.join('fixtures', 'delta')
+    tasklib._manage_py(['apply_fixture_delta',
+                        os.path.join(delta_dir, 'changes.json'),
+                        os.path.join(delta_dir, 'deletes.json')])
+    render_static_pages()
+
+def create_shared_cache_dir():
+    """ make the shared cache directory writable by us and apache """
+    sys.path.append(tasklib.env['django_dir'])
+    import settings
+    cache_dir = os.path.dirname(settings.SARPAM_SHARED_CACHE_PATH)
+    # setgid, so that the cache file belongs to apache's group whoever
+    # creates it
+    subprocess.call(['sudo', 'install', '-d', '-o', getpass.getuser(),
+                     '-g', apache_group, '-m', '2770', cache_dir])
+
+def create_static_pages_dir():
+    """ make the static pages directory one apache can remove pages from """
+    sys.path.append(tasklib.env['django_dir'])
+    import settings
+    subprocess.call(['sudo', 'install', '-d', '-o', getpass.getuser(),
+                     '-g', apache_group, '-m', '2775',
+                     settings.SARPAM_STATIC_PAGES_ROOT])
 
 def create_cache_table():
     (db_engine, db_name, db_user, db_pw, db_port) = tasklib._get_django_db_settings()
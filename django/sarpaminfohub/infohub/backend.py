@@ -9,12 +9,47 @@ class Backend(object):
     def get_formulations_that_match(self, search_term):
         self.abstract()
 
+    def get_price_summaries_that_match(self, search_term):
+        # Backends that keep precomputed median prices return them here,
+        # otherwise DrugSearcher works them out from the individual prices
+        return None
+
     def get_prices_for_formulation_with_id(self, formulation_id):
         self.abstract()
         
     def get_formulation_name_with_id(self, formulation_id):
         self.abstract()
 
+    def get_formulation_with_id(self, formulation_id):
+        """
+        Returns a dict of the formulation's name, msh_price and prices, as
+        get_formulation_name_with_id(), get_formulation_msh_with_id() and
+        get_prices_for_formulation_with_id() would, read together.
+        """
+        self.abstract()
+
+    # The batched methods below take a list of ids and return a dict keyed
+    # by each id as an int. Ids that don't exist are left out.
+
+    def get_formulation_names_with_ids(self, formulation_ids):
+        self.abstract()
+
+    def get_formulation_mshs_with_ids(self, formulation_ids):
+        """
+        Returns the MSH price of each formulation, or None if it has none.
+        """
+        self.abstract()
+
+    def get_prices_for_formulations_with_ids(self, formulation_ids):
+        """
+        Returns the price records of each formulation, which may be an empty
+        list.
+        """
+        self.abstract()
+
+    def get_names_of_suppliers_with_ids(self, supplier_ids):
+        self.abstract()
+
     def get_product_registrations_based_on_formulation_with_id(self,
                                                                formulation_id):
         self.abstract()
@@ -22,5 +57,20 @@ class Backend(object):
     def get_products_from_supplier_with_id(self, supplier_id):
         self.abstract()
 
+    def get_registrations_from_supplier_with_id(self, supplier_id):
+        """
+        Returns a row for each registration of a product by the supplier,
+        with the product, country, formulation_id and formulation_name.
+        """
+        self.abstract()
+
     def get_name_of_supplier_with_id(self, supplier_id):
         self.abstract()
+
+    def get_supplier_catalogue_with_id(self, supplier_id):
+        """
+        Returns the supplier's name and registrations, which backends that
+        can should look up together.
+        """
+        return (self.get_name_of_supplier_with_id(supplier_id),
+                self.get_registrations_from_supplier_with_id(supplier_id))
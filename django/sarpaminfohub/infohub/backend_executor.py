@@ -0,0 +1,55 @@
+"""
+Runs independent backend calls for a page on a pool of threads, so that
+their queries wait on the database together rather than one after the
+other.
+
+It is off unless SARPAM_BACKEND_THREADS is set, since it only pays when the
+database is on another host or busy enough for queries to wait.
+"""
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connection
+
+def call_and_close_connection(function, args):
+    try:
+        return function(*args)
+    finally:
+        # Each thread has its own connection, and Django only closes the
+        # one belonging to the thread that handled the request
+        connection.close()
+
+class BackendExecutor(object):
+    def __init__(self, num_threads):
+        self.pool = ThreadPool(num_threads)
+
+    def call_all(self, calls):
+        """
+        Calls each (function, args) in calls at the same time, returning
+        their results in the same order.
+        """
+        results = [self.pool.apply_async(call_and_close_connection,
+                                         (function, args))
+                   for (function, args) in calls]
+
+        return [result.get() for result in results]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+shared_executor = None
+
+def get_shared_executor():
+    """
+    Returns the executor the views share, or None if
+    SARPAM_BACKEND_THREADS is 0.
+    """
+    global shared_executor # pylint: disable-msg=W0603
+
+    num_threads = getattr(settings, 'SARPAM_BACKEND_THREADS', 0)
+
+    if num_threads and shared_executor is None:
+        shared_executor = BackendExecutor(num_threads)
+
+    return shared_executor
@@ -0,0 +1,295 @@
+"""
+Rough timings for the hot paths behind the price pages. Run them with
+
+    ./manage.py benchmark [name ...]
+
+Only indexes touches the database, and it builds a test database of its
+own, as the tests do, so they can all be run against any settings.
+"""
+import random
+import sys
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from sarpaminfohub.infohub.currency_exchange import CurrencyExchange
+from sarpaminfohub.infohub.django_backend import DjangoBackend
+from sarpaminfohub.infohub.drug_searcher import DrugSearcher
+from sarpaminfohub.infohub.formulation_table import FormulationTable
+from sarpaminfohub.infohub.fixture_loader import BulkFixtureLoader
+from sarpaminfohub.infohub.indexes import create_missing_indexes, \
+    drop_indexes
+from sarpaminfohub.infohub.models import ExchangeRate, Formulation, Price
+from sarpaminfohub.infohub.price_record import PriceRecord
+from sarpaminfohub.infohub.results_table import ResultsTable
+from sarpaminfohub.infohub.test_backend import TestBackend
+from sarpaminfohub.infohub import utils
+
+def time_call(function, *args):
+    start = time.time()
+    function(*args)
+    return time.time() - start
+
+def report(name, size, old_time, new_time, unit="rows"):
+    if new_time > 0:
+        speedup = "%.1fx" % (old_time / new_time)
+    else:
+        speedup = "-"
+
+    print "%-20s %9d %-5s old %8.3fs  new %8.3fs  speedup %s" % \
+        (name, size, unit, old_time, new_time, speedup)
+
+def get_price_rows(size):
+    backend = TestBackend()
+    templates = [backend.get_amitriptyline(),
+                 backend.get_ciprofloxacin(),
+                 backend.get_amitriptyline_with_issue_unit_none()] + \
+                backend.get_amox()
+
+    return [templates[i % len(templates)].copy() for i in range(size)]
+
+def set_up_exchange_rates():
+    CurrencyExchange.rates = {('NAD', 2009): 0.12314,
+                              ('ZAR', 2009): 0.11873,
+                              ('EUR', 2009): 1.39071,
+                              ('USD', 2007): 1.03,
+                              ('USD', 2009): 1.0}
+
+def get_unit_price_in_usd(exchanger, price, currency, period, issue_unit):
+    if price is None or issue_unit is None:
+        return None
+
+    price_in_usd = exchanger.exchange(float(price), currency, period)
+
+    if price_in_usd is None:
+        return None
+
+    return price_in_usd / int(issue_unit)
+
+def convert_prices_to_usd(exchanger, formulation):
+    # DrugSearcher.convert_prices_to_usd() before prices were converted a
+    # column at a time
+    for (price_field, currency_field) in DrugSearcher.PRICE_FIELDS:
+        formulation[price_field] = \
+            get_unit_price_in_usd(exchanger, formulation[price_field],
+                                  formulation[currency_field],
+                                  formulation['period'],
+                                  formulation['issue_unit'])
+
+def benchmark_usd_conversion(sizes=(10000, 100000)):
+    drug_searcher = DrugSearcher(TestBackend())
+    # After the searcher, which would otherwise drop them for the ones in
+    # the database
+    set_up_exchange_rates()
+
+    def convert_row_by_row(rows):
+        for row in rows:
+            convert_prices_to_usd(drug_searcher.exchanger, row)
+
+    try:
+        for size in sizes:
+            old_time = time_call(convert_row_by_row, get_price_rows(size))
+            new_time = time_call(drug_searcher.convert_all_prices_to_usd,
+                                 get_price_rows(size))
+            report("usd_conversion", size, old_time, new_time)
+    finally:
+        CurrencyExchange.clear_rates()
+
+def get_median_by_sorting(values):
+    # utils.get_median() before it used selection
+    sorted_values = sorted(values)
+    (mid_point, remainder) = divmod(len(values), 2)
+
+    if remainder == 1:
+        return sorted_values[mid_point]
+    else:
+        return (sorted_values[mid_point] + sorted_values[mid_point - 1]) / 2
+
+def benchmark_median(sizes=(1000, 10000, 100000, 1000000)):
+    if utils.numpy is None:
+        print "numpy not available, using quickselect"
+
+    for size in sizes:
+        values = [random.random() for _ in range(size)]
+
+        old_time = time_call(get_median_by_sorting, values)
+        new_time = time_call(utils.get_median, values)
+        report("median", size, old_time, new_time)
+
+def benchmark_price_records(sizes=(100000,)):
+    template = TestBackend().get_ciprofloxacin()
+    fields = dict(template.items())
+
+    for size in sizes:
+        start = time.time()
+        dicts = [dict(fields) for _ in range(size)]
+        old_time = time.time() - start
+
+        start = time.time()
+        records = [PriceRecord(**fields) for _ in range(size)]
+        new_time = time.time() - start
+
+        report("price_records", size, old_time, new_time)
+
+        # The field values are shared, so only the containers differ
+        old_bytes = sum([sys.getsizeof(row) for row in dicts])
+        new_bytes = sum([sys.getsizeof(row) for row in records])
+
+        print "%-20s %9d rows  old %7.1fMB  new %7.1fMB" % \
+            ("price_records", size, old_bytes / 1048576.0,
+             new_bytes / 1048576.0)
+
+def get_index_benchmark_objects(num_formulations, prices_per_formulation):
+    """
+    Yields fixture objects for the tables the indexes are on.
+    """
+    currencies = ['C%02d' % i for i in range(50)]
+
+    for (i, symbol) in enumerate(currencies):
+        for year in range(1990, 2010):
+            yield {'model': 'infohub.exchangerate', 'pk': i * 20 + year - 1989,
+                   'fields': {'symbol': symbol, 'year': year, 'rate': 1.5}}
+
+    for formulation_id in range(1, num_formulations + 1):
+        yield {'model': 'infohub.formulation', 'pk': formulation_id,
+               'fields': {'name': 'formulation %d' % formulation_id,
+                          'generic_name': '', 'strength': ''}}
+
+    # Interleaved, as prices are scraped country by country
+    for i in range(prices_per_formulation):
+        for formulation_id in range(1, num_formulations + 1):
+            yield {'model': 'infohub.price',
+                   'pk': i * num_formulations + formulation_id,
+                   'fields': {'formulation': formulation_id,
+                              'fob_price': '1.5', 'fob_currency': 'C01',
+                              'period': 2009, 'issue_unit': 100.0}}
+
+def get_query_plan(queryset):
+    (sql, params) = queryset.query.get_compiler(using='default').as_sql()
+
+    if connection.settings_dict['ENGINE'].endswith('sqlite3'):
+        explain = "EXPLAIN QUERY PLAN "
+    else:
+        explain = "EXPLAIN "
+
+    cursor = connection.cursor()
+    cursor.execute(explain + sql, params)
+
+    return [" | ".join([unicode(value) for value in row])
+            for row in cursor.fetchall()]
+
+def benchmark_indexes(num_formulations=20000, prices_per_formulation=10,
+                      num_lookups=500):
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        loader = BulkFixtureLoader()
+        loader.load_from(loader.load_objects, get_index_benchmark_objects(
+            num_formulations, prices_per_formulation))
+
+        backend = DjangoBackend()
+        formulation_ids = [random.randint(1, num_formulations)
+                           for _ in range(num_lookups)]
+        rates = [('C%02d' % random.randint(0, 49), random.randint(1990, 2009))
+                 for _ in range(num_lookups)]
+
+        def get_rates():
+            for (symbol, year) in rates:
+                # pylint: disable-msg=E1101
+                ExchangeRate.objects.get(symbol=symbol, year=year)
+
+        def get_formulations_by_name():
+            for formulation_id in formulation_ids:
+                # pylint: disable-msg=E1101
+                Formulation.objects.get(name='formulation %d' % formulation_id)
+
+        def get_prices():
+            for formulation_id in formulation_ids:
+                backend.get_prices_for_formulation_with_id(formulation_id)
+
+        # pylint: disable-msg=E1101
+        queries = [
+            ('exchange_rate', get_rates,
+             ExchangeRate.objects.filter(symbol='C01', year=2000)),
+            ('formulation_name', get_formulations_by_name,
+             Formulation.objects.filter(name='formulation 1')),
+            ('formulation_prices', get_prices,
+             Price.objects.filter(formulation=1).values(
+                *DjangoBackend.PRICE_RECORD_FIELDS))]
+
+        drop_indexes()
+        before = [(time_call(function), get_query_plan(queryset))
+                  for (_, function, queryset) in queries]
+
+        create_missing_indexes()
+        after = [(time_call(function), get_query_plan(queryset))
+                 for (_, function, queryset) in queries]
+
+        for ((name, _, _), (old_time, old_plan), (new_time, new_plan)) in \
+                zip(queries, before, after):
+            report(name, num_lookups, old_time, new_time, unit="gets")
+
+            for line in old_plan:
+                print "    before: %s" % line
+            for line in new_plan:
+                print "    after:  %s" % line
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+def get_table_rows(size):
+    rows = []
+
+    for i in range(size):
+        # Every fifth price is missing, as they often are
+        if i % 5 == 0:
+            price = None
+        else:
+            price = random.random()
+
+        rows.append({'formulation': 'formulation %d' % i,
+                     'country': 'country %d' % (i % 50),
+                     'fob_price': price,
+                     'landed_price': random.random(),
+                     'msh_price': price,
+                     'href': '/formulation/%d/' % i})
+
+    return rows
+
+def render_tables(tables, render):
+    for table in tables:
+        render(table)
+
+def benchmark_tables(sizes=(1000,), repeats=10):
+    # As in production, where templates are compiled without the debugging
+    # information
+    template_debug = settings.TEMPLATE_DEBUG
+    settings.TEMPLATE_DEBUG = False
+
+    try:
+        for size in sizes:
+            rows = get_table_rows(size)
+
+            for (name, make_table) in \
+                    (('results_table', lambda: ResultsTable(rows, "")),
+                     ('formulation_table', lambda: FormulationTable(rows))):
+                # Once first, so the compiled template is already cached
+                make_table().as_compiled_html()
+
+                tables = [make_table() for _ in range(repeats)]
+                old_time = time_call(render_tables, tables,
+                                     lambda table: table.as_template_html())
+
+                tables = [make_table() for _ in range(repeats)]
+                new_time = time_call(render_tables, tables,
+                                     lambda table: table.as_compiled_html())
+
+                report(name, size * repeats, old_time, new_time)
+    finally:
+        settings.TEMPLATE_DEBUG = template_debug
+
+BENCHMARKS = {'indexes': benchmark_indexes,
+              'median': benchmark_median,
+              'price_records': benchmark_price_records,
+              'tables': benchmark_tables,
+              'usd_conversion': benchmark_usd_conversion}
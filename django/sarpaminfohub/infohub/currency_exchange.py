@@ -1,18 +1,74 @@
+from django.db.models.signals import post_save, post_delete
+
 from sarpaminfohub.infohub.models import ExchangeRate
+from sarpaminfohub.infohub.response_cache import get_data_version
 
 class CurrencyExchange(object):
+    # (symbol, year) -> rate, loaded once and shared by every instance in
+    # this process until an ExchangeRate is saved or deleted here, or the
+    # data version is bumped by another process
+    rates = None
+    rates_version = None
+
+    def __init__(self):
+        # Each instance only looks at the data version once, and only
+        # reloads the rates once when one is missing
+        version = get_data_version()
+
+        if version != CurrencyExchange.rates_version:
+            CurrencyExchange.clear_rates()
+            CurrencyExchange.rates_version = version
+
+        self.reloaded = False
+
+    @classmethod
+    def get_rates(cls):
+        rates = cls.rates
+
+        if rates is None:
+            rates = {}
+
+            # pylint: disable-msg=E1101
+            for (symbol, year, rate) in \
+                    ExchangeRate.objects.values_list('symbol', 'year', 'rate'):
+                rates[(symbol, year)] = rate
+
+            cls.rates = rates
+
+        return rates
+
+    @classmethod
+    def clear_rates(cls):
+        cls.rates = None
+
+    def get_rate(self, currency, year):
+        key = (currency, year)
+        rates = self.get_rates()
+
+        if key not in rates and not self.reloaded:
+            # The rate may have been added since the rates were loaded
+            self.clear_rates()
+            self.reloaded = True
+            rates = self.get_rates()
+
+        try:
+            return rates[key]
+        except KeyError:
+            raise ExchangeRate.DoesNotExist(
+                "No exchange rate for %s in %s" % (currency, year))
+
     def exchange(self, local_price, currency, year):
         if local_price is None: 
             return None
         
         if currency is None:
             return None
-        
-        try:
-            # pylint: disable-msg=E1101
-            exchange = ExchangeRate.objects.get(symbol=currency, year=year)
-        except ExchangeRate.DoesNotExist:
-            print "Currency = %s, Year = %s" % (currency, year)
-            raise
 
-        return local_price * exchange.rate
+        return local_price * self.get_rate(currency, year)
+
+# pylint: disable-msg=W0613
+def clear_exchange_rates(sender, **kwargs):
+    CurrencyExchange.clear_rates()
+
+post_save.connect(clear_exchange_rates, sender=ExchangeRate)
+post_delete.connect(clear_exchange_rates, sender=ExchangeRate)
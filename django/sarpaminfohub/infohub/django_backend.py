@@ -1,10 +1,44 @@
 from django.core.exceptions import ObjectDoesNotExist
 
 from sarpaminfohub.infohub.backend import Backend
+from sarpaminfohub.infohub.formulation_index import FormulationIndex
 from sarpaminfohub.infohub.models import Formulation, Supplier, Price, \
-    ProductRegistration
+    Product, ProductRegistration, MSHPrice, PriceSummary
+from sarpaminfohub.infohub.price_record import PriceRecord
 
 class DjangoBackend(Backend):
+    # Columns needed to build a price record, fetched with joins in a single
+    # query rather than through the lazy foreign keys in Price.get_record()
+    PRICE_RECORD_FIELDS = ('formulation__id',
+                           'formulation__name',
+                           'country__name',
+                           'fob_price',
+                           'landed_price',
+                           'fob_currency',
+                           'period',
+                           'issue_unit',
+                           'landed_currency',
+                           'incoterm__name',
+                           'supplier__name',
+                           'supplier_country__name',
+                           'manufacture_country__name',
+                           'volume')
+
+    # Columns shown in the list of a formulation's products
+    FORMULATION_REGISTRATION_FIELDS = ('product__id',
+                                       'product__name',
+                                       'supplier__id',
+                                       'supplier__name',
+                                       'manufacturer__id',
+                                       'manufacturer__name',
+                                       'country__name')
+
+    # Columns shown in a supplier's catalogue
+    SUPPLIER_REGISTRATION_FIELDS = ('product__name',
+                                    'country__name',
+                                    'product__formulation__id',
+                                    'product__formulation__name')
+
     def get_msh_price_from_formulation(self, formulation):
         try:
             msh_price = formulation.mshprice.price
@@ -13,27 +47,129 @@ class DjangoBackend(Backend):
             
         return msh_price
     
-    def get_formulations_that_match(self, search_term):
-        # pylint:disable-msg=E1101
-        prices = Price.objects.filter(formulation__name__icontains=search_term)
+    def get_price_records(self, prices):
+        """
+        Returns the same records as Price.get_record() for each of the
+        given prices, but without any per-row queries.
+        """
+        return [record for (_, record) in self.get_price_records_with_ids(prices)]
+
+    def get_price_records_with_ids(self, prices):
+        """
+        Returns (formulation id, record) for each of the given prices, as
+        get_price_records() does.
+        """
+        formulation_urls = {}
+        rows = list(prices.values(*self.PRICE_RECORD_FIELDS))
+
+        for values in rows:
+            formulation_id = values['formulation__id']
+
+            if formulation_id not in formulation_urls:
+                formulation = Formulation(id=formulation_id)
+                formulation_urls[formulation_id] = formulation.get_url()
+
+        msh_prices = self.get_msh_prices_for_formulations(formulation_urls.keys())
 
         results = []
 
-        for price in prices:
-            results.append(price.get_record())
+        for values in rows:
+            formulation_id = values['formulation__id']
+
+            record = PriceRecord(
+                formulation=values['formulation__name'],
+                country=values['country__name'],
+                fob_price=values['fob_price'],
+                landed_price=values['landed_price'],
+                msh_price=msh_prices.get(formulation_id),
+                fob_currency=values['fob_currency'],
+                period=values['period'],
+                issue_unit=values['issue_unit'],
+                landed_currency=values['landed_currency'],
+                url=formulation_urls[formulation_id],
+                incoterm=values['incoterm__name'],
+                supplier=values['supplier__name'],
+                supplier_country=values['supplier_country__name'],
+                manufacture_country=values['manufacture_country__name'],
+                volume=values['volume'])
+
+            results.append((formulation_id, record))
 
         return results
 
-    def get_prices_for_formulation_with_id(self, formulation_id):
+    def get_msh_prices_for_formulations(self, formulation_ids):
+        if not formulation_ids:
+            return {}
+
+        # values() can't follow the reverse one-to-one to MSHPrice, so fetch
+        # them all in one go instead
         # pylint:disable-msg=E1101
-        prices = Price.objects.filter(formulation=formulation_id)
+        msh_prices = MSHPrice.objects.filter(formulation__in=formulation_ids)
 
-        results = []
+        return dict(msh_prices.values_list('formulation', 'price'))
 
-        for price in prices:
-            results.append(price.get_record())
+    def get_formulation_ids_that_match(self, search_term):
+        return FormulationIndex().search(search_term)
 
-        return results
+    def get_formulations_that_match(self, search_term):
+        formulation_ids = self.get_formulation_ids_that_match(search_term)
+
+        # pylint:disable-msg=E1101
+        prices = Price.objects.filter(formulation__in=formulation_ids)
+
+        return self.get_price_records(prices)
+
+    def get_price_summaries_that_match(self, search_term):
+        """
+        Returns the price summaries of the formulations that match, or None
+        if any of them has prices but no summary yet (as after loaddata,
+        until rebuild_price_summaries is run), for the medians to be worked
+        out from the prices instead.
+        """
+        formulation_ids = self.get_formulation_ids_that_match(search_term)
+
+        # pylint:disable-msg=E1101
+        summaries = PriceSummary.objects.filter(formulation__in=formulation_ids)
+
+        # Kept in the order the index returned them, best matches first
+        ranks = dict([(formulation_id, rank) for (rank, formulation_id)
+                      in enumerate(formulation_ids)])
+        ranked_rows = []
+
+        for values in summaries.values('formulation__id',
+                                       'formulation__name',
+                                       'median_fob_price',
+                                       'median_landed_price',
+                                       'msh_price'):
+            formulation = Formulation(id=values['formulation__id'])
+
+            row = {'formulation': values['formulation__name'],
+                   'fob_price': values['median_fob_price'],
+                   'landed_price': values['median_landed_price'],
+                   'msh_price': values['msh_price'],
+                   'href': formulation.get_url()}
+            ranked_rows.append((ranks[formulation.id], row))
+
+        if len(ranked_rows) < len(formulation_ids):
+            summarised_ranks = set([rank for (rank, _) in ranked_rows])
+            unsummarised_ids = [formulation_id for (rank, formulation_id)
+                                in enumerate(formulation_ids)
+                                if rank not in summarised_ranks]
+
+            # Formulations without prices have no summary anyway
+            # pylint:disable-msg=E1101
+            if Price.objects.filter(formulation__in=unsummarised_ids).exists():
+                return None
+
+        ranked_rows.sort()
+
+        return [row for (_, row) in ranked_rows]
+
+    def get_prices_for_formulation_with_id(self, formulation_id):
+        # pylint:disable-msg=E1101
+        prices = Price.objects.filter(formulation=formulation_id)
+
+        return self.get_price_records(prices)
 
     def get_formulation_name_with_id(self, formulation_id):
         # pylint:disable-msg=E1101
@@ -46,38 +182,127 @@ class DjangoBackend(Backend):
         formulation = Formulation.objects.get(pk=formulation_id)
         return self.get_msh_price_from_formulation(formulation)
 
+    def get_formulation_with_id(self, formulation_id):
+        prices = self.get_prices_for_formulation_with_id(formulation_id)
+
+        if prices:
+            # Every price record carries the formulation's name and MSH price
+            name = prices[0]['formulation']
+            msh_price = prices[0]['msh_price']
+        else:
+            # pylint:disable-msg=E1101
+            formulation = Formulation.objects.get(pk=formulation_id)
+            name = formulation.name
+            msh_price = self.get_msh_prices_for_formulations(
+                [formulation.id]).get(formulation.id)
+
+        return {'name': name,
+                'msh_price': msh_price,
+                'prices': prices}
+
+    def get_formulation_names_with_ids(self, formulation_ids):
+        # pylint:disable-msg=E1101
+        formulations = Formulation.objects.filter(pk__in=formulation_ids)
+
+        return dict(formulations.values_list('id', 'name'))
+
+    def get_formulation_mshs_with_ids(self, formulation_ids):
+        # pylint:disable-msg=E1101
+        formulations = Formulation.objects.filter(pk__in=formulation_ids)
+        ids = list(formulations.values_list('id', flat=True))
+        msh_prices = self.get_msh_prices_for_formulations(ids)
+
+        return dict([(formulation_id, msh_prices.get(formulation_id))
+                     for formulation_id in ids])
+
+    def get_prices_for_formulations_with_ids(self, formulation_ids):
+        # pylint:disable-msg=E1101
+        formulations = Formulation.objects.filter(pk__in=formulation_ids)
+        results = dict([(formulation_id, []) for formulation_id
+                        in formulations.values_list('id', flat=True)])
+
+        prices = Price.objects.filter(formulation__in=formulation_ids)
+
+        for (formulation_id, record) in self.get_price_records_with_ids(prices):
+            results[formulation_id].append(record)
+
+        return results
+
+    def get_names_of_suppliers_with_ids(self, supplier_ids):
+        # pylint:disable-msg=E1101
+        suppliers = Supplier.objects.filter(pk__in=supplier_ids)
+
+        return dict(suppliers.values_list('id', 'name'))
+
     def get_product_registrations_based_on_formulation_with_id(self,
                                                                formulation_id):
         # pylint:disable-msg=E1101
         registrations = ProductRegistration.objects.filter(product__formulation=formulation_id)
-        
+        # reverse() is only called once for each supplier
+        supplier_urls = {}
+
         results = []
-        
-        for registration in registrations:
+
+        for values in registrations.values(*self.FORMULATION_REGISTRATION_FIELDS):
             record = {}
-            record['product'] = registration.product.get_record()
-            if registration.supplier != None:
-                supplier_record = registration.supplier.get_record()
+            record['product'] = {'id': values['product__id'],
+                                 'name': values['product__name']}
+
+            supplier_id = values['supplier__id']
+
+            if supplier_id is not None:
+                if supplier_id not in supplier_urls:
+                    supplier_urls[supplier_id] = \
+                        Supplier(id=supplier_id).get_url()
+
+                supplier_record = {'name': values['supplier__name'],
+                                   'url': supplier_urls[supplier_id]}
             else:
                 supplier_record = None
-                
+
             record['supplier'] = supplier_record
-            
-            if registration.manufacturer != None:
-                manufacturer_record = registration.manufacturer.get_record()
+
+            if values['manufacturer__id'] is not None:
+                manufacturer_record = {'name': values['manufacturer__name']}
             else:
                 manufacturer_record = None
 
-            record['manufacturer'] = manufacturer_record 
-            record['country'] = registration.country.get_record()
+            record['manufacturer'] = manufacturer_record
+            record['country'] = {'name': values['country__name']}
             results.append(record)
-            
+
         return results
 
-    def get_registrations_from_supplier_with_id(self, supplier_id):
+    def get_supplier_registration_rows(self, supplier_id, *extra_fields):
         # pylint:disable-msg=E1101
-        return [registration for registration
-            in ProductRegistration.objects.filter(supplier=supplier_id)]
+        registrations = ProductRegistration.objects.filter(supplier=supplier_id)
+
+        return list(registrations.values(*(self.SUPPLIER_REGISTRATION_FIELDS +
+                                           extra_fields)))
+
+    def get_supplier_registration_record(self, values):
+        return {'product': values['product__name'],
+                'country': values['country__name'],
+                'formulation_id': values['product__formulation__id'],
+                'formulation_name': values['product__formulation__name']}
+
+    def get_registrations_from_supplier_with_id(self, supplier_id):
+        return [self.get_supplier_registration_record(values) for values
+                in self.get_supplier_registration_rows(supplier_id)]
+
+    def get_supplier_catalogue_with_id(self, supplier_id):
+        rows = self.get_supplier_registration_rows(supplier_id,
+                                                   'supplier__name')
+
+        if rows:
+            supplier_name = rows[0]['supplier__name']
+        else:
+            supplier_name = self.get_name_of_supplier_with_id(supplier_id)
+
+        registrations = [self.get_supplier_registration_record(values)
+                         for values in rows]
+
+        return (supplier_name, registrations)
 
     def get_products_from_supplier_with_id(self, supplier_id):
         registrations = self.get_registrations_from_supplier_with_id(supplier_id)
@@ -85,10 +310,65 @@ class DjangoBackend(Backend):
         results = []
 
         for reg in registrations:
-            results.append(reg.product.get_formulation_record())
+            formulation = Formulation(id=reg['formulation_id'])
+            results.append({'product': reg['product'],
+                            'formulation_name': reg['formulation_name'],
+                            'formulation_url': formulation.get_url()})
 
         return results
 
+    def get_product_with_id(self, product_id):
+        """
+        Returns the product with its formulation and registrations as
+        nested dicts, read in two queries however many registrations it
+        has.
+        """
+        # pylint:disable-msg=E1101
+        products = Product.objects.filter(pk=product_id).values(
+            'id', 'name', 'packaging', 'unit_of_issue', 'who_prequalified',
+            'formulation__id', 'formulation__name',
+            'formulation__generic_name', 'formulation__strength')
+
+        try:
+            values = products[0]
+        except IndexError:
+            raise Product.DoesNotExist("No product with id %s" % product_id)
+
+        registrations = ProductRegistration.objects.filter(product=product_id)
+
+        product = {'id': values['id'],
+                   'name': values['name'],
+                   'packaging': values['packaging'],
+                   'unit_of_issue': values['unit_of_issue'],
+                   'who_prequalified': values['who_prequalified'],
+                   'formulation': {
+                       'id': values['formulation__id'],
+                       'name': values['formulation__name'],
+                       'generic_name': values['formulation__generic_name'],
+                       'strength': values['formulation__strength']},
+                   'registrations': []}
+
+        for values in registrations.values('country__name', 'supplier__id',
+                                           'supplier__name',
+                                           'manufacturer__name'):
+            if values['supplier__id'] is not None:
+                supplier = {'id': values['supplier__id'],
+                            'name': values['supplier__name']}
+            else:
+                supplier = None
+
+            if values['manufacturer__name'] is not None:
+                manufacturer = {'name': values['manufacturer__name']}
+            else:
+                manufacturer = None
+
+            product['registrations'].append({
+                'country': {'name': values['country__name']},
+                'supplier': supplier,
+                'manufacturer': manufacturer})
+
+        return product
+
     def get_name_of_supplier_with_id(self, supplier_id):
         # pylint:disable-msg=E1101
         supplier = Supplier.objects.get(pk=supplier_id)
@@ -1,57 +1,115 @@
+from itertools import izip
+
 from sarpaminfohub.infohub.currency_exchange import CurrencyExchange
+from sarpaminfohub.infohub.models import ExchangeRate
+from sarpaminfohub.infohub.price_record import PriceRecord
 import utils
 
+# Stands in for the rate of a currency and period with no exchange rate
+MISSING_RATE = object()
+
 class DrugSearcher(object):
+    PRICE_FIELDS = (('fob_price', 'fob_currency'),
+                    ('landed_price', 'landed_currency'))
     
-    def __init__(self, backend):
+    def __init__(self, backend, executor=None):
         self.backend = backend
+        self.executor = executor
         self.exchanger = CurrencyExchange()
+        self.formulations = {}
     
-    def unit_price_in_usd(self, price, currency, period, issue_unit):
-        if issue_unit is None:
-            return None
-        
-        price_in_usd = self.exchanger.exchange(price, currency, period)
-        
-        if price_in_usd is None:
-            return None
-        
-        return price_in_usd / issue_unit
-    
-    def float_or_none(self, value):
-        if value is None:
-            return None
-        
-        return float(value)
-    
-    def int_or_none(self, value):
-        if value is None:
-            return None
-        
-        return int(value)
-    
-    def convert_prices_to_usd(self, formulation):
-        fob_local_price = self.float_or_none(formulation['fob_price'])
-        fob_currency = formulation['fob_currency']
-        period = formulation['period']
-        issue_unit = self.int_or_none(formulation['issue_unit'])
-    
-        formulation['fob_price'] = self.unit_price_in_usd(fob_local_price,
-                                                  fob_currency,
-                                                  period, 
-                                                  issue_unit)
+    def get_rate_indexes(self, currencies, periods):
+        """
+        Numbers each distinct currency and period. Returns the number of
+        each row's currency and period, and the (currency, period) for each
+        number.
+        """
+        keys = list(set(izip(currencies, periods)))
+        numbers = dict((key, index) for (index, key) in enumerate(keys))
+        indexes = map(numbers.__getitem__, izip(currencies, periods))
+
+        return (indexes, keys)
+
+    def unit_prices_in_usd(self, prices, currencies, periods, issue_units,
+                           missing_rates=None):
+        """
+        Takes columns of equal length and returns a list of the unit
+        prices in USD, None where the price, currency or issue unit is.
+        Each exchange rate is only looked up once for its currency and
+        period.
+
+        If missing_rates is a set, prices with no exchange rate are left as
+        None and their (currency, period) added to it, rather than raising
+        ExchangeRate.DoesNotExist.
+        """
+        (indexes, keys) = self.get_rate_indexes(currencies, periods)
+
+        rates = [None] * len(keys)
+        usd_prices = [None] * len(prices)
+
+        for (i, (price, index, issue_unit)) in \
+                enumerate(izip(prices, indexes, issue_units)):
+            if price is None or issue_unit is None:
+                continue
+
+            rate = rates[index]
+
+            if rate is None:
+                (currency, period) = keys[index]
+
+                if currency is None:
+                    continue
+
+                try:
+                    rate = self.exchanger.get_rate(currency, period)
+                except ExchangeRate.DoesNotExist:
+                    if missing_rates is None:
+                        raise
+
+                    missing_rates.add((currency, period))
+                    rate = MISSING_RATE
+
+                rates[index] = rate
+
+            if rate is MISSING_RATE:
+                continue
+
+            usd_prices[i] = (float(price) * rate) / int(issue_unit)
+
+        return usd_prices
+
+    def convert_all_prices_to_usd(self, formulations, missing_rates=None):
+        """
+        Converts the FOB and landed prices of every formulation to unit
+        prices in USD, a column at a time. See unit_prices_in_usd() for
+        missing_rates.
+        """
+        periods = PriceRecord.get_column(formulations, 'period')
+        issue_units = PriceRecord.get_column(formulations, 'issue_unit')
 
-        landed_local_price = self.float_or_none(formulation['landed_price'])
-        landed_currency = formulation['landed_currency']
+        for (price_field, currency_field) in self.PRICE_FIELDS:
+            prices = PriceRecord.get_column(formulations, price_field)
+            currencies = PriceRecord.get_column(formulations, currency_field)
 
-        formulation['landed_price'] = self.unit_price_in_usd(landed_local_price, 
-                                                     landed_currency, 
-                                                     period, 
-                                                     issue_unit)
+            usd_prices = self.unit_prices_in_usd(prices, currencies, periods,
+                                                 issue_units, missing_rates)
+
+            PriceRecord.set_column(formulations, price_field, usd_prices)
 
     def get_formulations_that_match(self, search_term):
+        rows = self.backend.get_price_summaries_that_match(search_term)
+
+        if rows is None:
+            rows = self.get_median_prices_that_match(search_term)
+
+        return rows
+
+    def get_median_prices_that_match(self, search_term):
         formulations = self.backend.get_formulations_that_match(search_term)
 
+        # Left out of the medians, as they are from the price summaries
+        self.convert_all_prices_to_usd(formulations, missing_rates=set())
+
         formulation_dict = {}
         formulation_hrefs = {}
         formulation_mshs = {}
@@ -64,7 +122,6 @@ class DrugSearcher(object):
                 formulation_hrefs[name] = formulation['url']
                 formulation_mshs[name] = formulation['msh_price']
 
-            self.convert_prices_to_usd(formulation)
             formulation_dict[name].append(formulation)
 
         rows = []
@@ -87,15 +144,64 @@ class DrugSearcher(object):
 
     def get_prices_for_formulation_with_id(self, formulation_id):
         formulations = self.backend.get_prices_for_formulation_with_id(formulation_id)
-
-        for formulation in formulations:
-            self.convert_prices_to_usd(formulation)
+        self.convert_all_prices_to_usd(formulations)
 
         return formulations
 
+    def get_formulation_with_id(self, formulation_id):
+        """
+        Returns the formulation's name, MSH price and prices in USD. The
+        views make a searcher for each request, so the backend is only asked
+        once per formulation in a request.
+        """
+        key = str(formulation_id)
+
+        if key not in self.formulations:
+            formulation = self.backend.get_formulation_with_id(formulation_id)
+            self.convert_all_prices_to_usd(formulation['prices'])
+            self.formulations[key] = formulation
+
+        return self.formulations[key]
+
     def get_formulation_name_with_id(self, formulation_id):
         return self.backend.get_formulation_name_with_id(formulation_id)
 
+    def get_formulation_names_with_ids(self, formulation_ids):
+        return self.backend.get_formulation_names_with_ids(formulation_ids)
+
+    def get_formulation_mshs_with_ids(self, formulation_ids):
+        return self.backend.get_formulation_mshs_with_ids(formulation_ids)
+
+    def get_prices_for_formulations_with_ids(self, formulation_ids):
+        prices = self.backend.get_prices_for_formulations_with_ids(formulation_ids)
+
+        for formulations in prices.values():
+            self.convert_all_prices_to_usd(formulations)
+
+        return prices
+
+    def get_names_of_suppliers_with_ids(self, supplier_ids):
+        return self.backend.get_names_of_suppliers_with_ids(supplier_ids)
+
+    def call_all(self, calls):
+        """
+        Makes each (function, args) call to the backend, at the same time if
+        there is an executor, returning their results in order.
+        """
+        if self.executor is None:
+            return [function(*args) for (function, args) in calls]
+
+        return self.executor.call_all(calls)
+
+    def get_formulation_products_with_id(self, formulation_id):
+        """
+        Returns the formulation's name and product registrations.
+        """
+        return tuple(self.call_all(
+            [(self.backend.get_formulation_name_with_id, (formulation_id,)),
+             (self.backend.get_product_registrations_based_on_formulation_with_id,
+              (formulation_id,))]))
+
     def get_formulation_msh_with_id(self, formulation_id):
         return self.backend.get_formulation_msh_with_id(formulation_id)
 
@@ -111,3 +217,6 @@ class DrugSearcher(object):
 
     def get_name_of_supplier_with_id(self, supplier_id):
         return self.backend.get_name_of_supplier_with_id(supplier_id)
+
+    def get_supplier_catalogue_with_id(self, supplier_id):
+        return self.backend.get_supplier_catalogue_with_id(supplier_id)
@@ -0,0 +1,413 @@
+import os
+import time
+
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import connection, transaction
+from django.db.models import get_model
+from django.utils import simplejson
+
+from sarpaminfohub.infohub.formulation_index import FormulationIndex
+from sarpaminfohub.infohub.models import ExchangeRate, Formulation, \
+    FormulationTrigram, MSHPrice, Price, PriceSummary
+from sarpaminfohub.infohub.price_summaries import PriceSummaryBuilder, \
+    deferred_rebuilds
+
+def iter_json_array(json_file, chunk_size=64 * 1024):
+    """
+    Yields the items of the JSON array in json_file one at a time, so the
+    whole file never has to be held in memory.
+    """
+    decoder = simplejson.JSONDecoder()
+    buffer = ""
+    position = 0
+    at_end = False
+    started = False
+
+    while True:
+        # Skip to the start of the next item
+        while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+            if buffer[position] == "[":
+                started = True
+            elif buffer[position] == "]":
+                return
+
+            position += 1
+
+        if position < len(buffer) and started:
+            try:
+                (item, end) = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # Probably only part of the item has been read so far
+                if at_end:
+                    raise
+            else:
+                position = end
+                yield item
+                continue
+        elif position < len(buffer):
+            raise ValueError("Fixture is not a JSON array")
+
+        if at_end:
+            if started:
+                raise ValueError("Fixture ended in the middle of the array")
+            return
+
+        chunk = json_file.read(chunk_size)
+        at_end = (chunk == "")
+        buffer = buffer[position:] + chunk
+        position = 0
+
+class BulkFixtureLoader(object):
+    """
+    Loads JSON fixtures into the database with multi-row INSERTs instead of
+    saving one object at a time as loaddata does, leaving the database as
+    loaddata would.
+
+    Fixtures are loaded in order of their file names, which start 00_,
+    10_, 20_ and so on so that later files can refer to earlier ones.
+    Foreign key checks are turned off during the load, so within a file
+    the order doesn't matter.
+
+    As with loaddata, no signals are sent, so the search index and price
+    summaries need rebuilding afterwards. Call bump_data_version() once the
+    load has been committed.
+    """
+    # Rows per INSERT
+    BATCH_SIZE = 500
+
+    # SQLite can't take any more parameters than this in one statement
+    SQLITE_MAX_PARAMETERS = 999
+
+    def __init__(self):
+        self.cursor = connection.cursor()
+        self.pending = {}
+        self.models = []
+        self.counts = {}
+        self.loaded_pks = {}
+        self.elapsed_time = 0.0
+
+    def is_using(self, engine):
+        return connection.settings_dict['ENGINE'].endswith(engine)
+
+    def get_batch_size(self, model):
+        # pylint: disable-msg=W0212
+        if self.is_using('sqlite3'):
+            num_columns = len(model._meta.local_fields)
+            return max(1, min(self.BATCH_SIZE,
+                              self.SQLITE_MAX_PARAMETERS // num_columns))
+
+        return self.BATCH_SIZE
+
+    def check_model_supported(self, model):
+        # pylint: disable-msg=W0212
+        meta = model._meta
+
+        if meta.many_to_many or meta.parents or meta.order_with_respect_to:
+            raise ValueError("%s can't be bulk loaded, use loaddata" %
+                             meta.object_name)
+
+    def load(self, filenames):
+        filenames = sorted(filenames, key=os.path.basename)
+        self.load_from(self.load_files, filenames)
+
+    def load_from(self, function, *args):
+        """
+        Calls function(*args) to add the objects with foreign key checks
+        turned off, then finishes off the load as loaddata would.
+        """
+        start = time.time()
+
+        self.disable_foreign_key_checks()
+        old_sql_mode = self.keep_zero_pks()
+        try:
+            function(*args)
+        finally:
+            self.restore_sql_mode(old_sql_mode)
+            self.enable_foreign_key_checks()
+
+        self.reset_sequences()
+
+        transaction.commit_unless_managed()
+
+        self.elapsed_time = time.time() - start
+
+    def load_files(self, filenames):
+        for filename in filenames:
+            fixture_file = open(filename, 'rb')
+            try:
+                self.load_file(fixture_file)
+            finally:
+                fixture_file.close()
+
+    def load_file(self, fixture_file):
+        # Each file is finished before the next is started, so that an
+        # object in a later file replaces one with the same primary key in
+        # an earlier one
+        self.load_objects(iter_json_array(fixture_file))
+
+    def load_objects(self, objects):
+        self.add_objects(objects)
+        self.flush()
+
+    def add_objects(self, objects):
+        """
+        Adds objects, given as dicts in the layout of a JSON fixture.
+        """
+        for deserialized in Deserializer(objects):
+            instance = deserialized.object
+            model = instance.__class__
+
+            if model not in self.pending:
+                self.check_model_supported(model)
+                self.pending[model] = {}
+                self.models.append(model)
+                self.counts[model] = 0
+                self.loaded_pks[model] = []
+
+            # Keyed by primary key so that, as with loaddata, the last
+            # object with a given key wins
+            rows = self.pending[model]
+            rows[instance.pk] = self.get_row(instance)
+
+            if len(rows) >= self.get_batch_size(model):
+                self.insert(model, rows.values())
+                self.pending[model] = {}
+
+    def flush(self):
+        for model in self.models:
+            if self.pending[model]:
+                self.insert(model, self.pending[model].values())
+                self.pending[model] = {}
+
+    def get_row(self, instance):
+        """
+        Returns the values loaddata would insert for instance.
+        """
+        # pylint: disable-msg=W0212
+        if instance.pk is None:
+            raise ValueError("%s in fixture has no primary key" %
+                             instance._meta.object_name)
+
+        # As in Model.save_base() when raw is True
+        return [field.get_db_prep_save(getattr(instance, field.attname) or
+                                       field.pre_save(instance, True),
+                                       connection=connection)
+                for field in instance._meta.local_fields]
+
+    def insert(self, model, rows):
+        # pylint: disable-msg=W0212
+        meta = model._meta
+        quote_name = connection.ops.quote_name
+        table = quote_name(meta.db_table)
+        columns = [quote_name(field.column) for field in meta.local_fields]
+        pk_index = meta.local_fields.index(meta.pk)
+
+        # loaddata replaces objects that already exist
+        pks = [row[pk_index] for row in rows]
+        self.cursor.execute("DELETE FROM %s WHERE %s IN (%s)" %
+                            (table, quote_name(meta.pk.column),
+                             ", ".join(["%s"] * len(pks))), pks)
+
+        row_placeholders = "(%s)" % ", ".join(["%s"] * len(columns))
+        parameters = []
+        for row in rows:
+            parameters.extend(row)
+
+        self.cursor.execute("INSERT INTO %s (%s) VALUES %s" %
+                            (table, ", ".join(columns),
+                             ", ".join([row_placeholders] * len(rows))),
+                            parameters)
+
+        self.counts[model] += len(rows)
+        self.loaded_pks[model].extend(pks)
+
+    def disable_foreign_key_checks(self):
+        if self.is_using('mysql'):
+            self.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        elif self.is_using('postgresql_psycopg2') or \
+                self.is_using('postgresql'):
+            self.cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+
+    def enable_foreign_key_checks(self):
+        if self.is_using('mysql'):
+            self.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    def keep_zero_pks(self):
+        """
+        Stops MySQL giving a row whose primary key is 0 (as the first
+        exchange rate's is) the next id instead, which could replace
+        another row. Returns the SQL mode to restore afterwards.
+        """
+        if not self.is_using('mysql'):
+            return None
+
+        self.cursor.execute("SELECT @@SESSION.sql_mode")
+        (old_sql_mode,) = self.cursor.fetchone()
+        self.cursor.execute("SET SESSION sql_mode = "
+                            "CONCAT_WS(',', @@SESSION.sql_mode, "
+                            "'NO_AUTO_VALUE_ON_ZERO')")
+
+        return old_sql_mode
+
+    def restore_sql_mode(self, old_sql_mode):
+        if old_sql_mode is not None:
+            self.cursor.execute("SET SESSION sql_mode = %s", [old_sql_mode])
+
+    def reset_sequences(self):
+        # As loaddata does, for databases whose sequences don't notice
+        # explicit primary keys
+        for line in connection.ops.sequence_reset_sql(no_style(),
+                                                      self.models):
+            self.cursor.execute(line)
+
+    def get_num_objects(self):
+        return sum(self.counts.values())
+
+class FixtureDeltaLoader(BulkFixtureLoader):
+    """
+    Applies the changes.json and deletes.json written by
+    scripts/scrape.py --incremental, then brings the search index and price
+    summaries up to date for just the formulations affected.
+    """
+    # Models whose rows feed into a formulation's price summary
+    PRICED_MODELS = (Price, MSHPrice)
+
+    def __init__(self):
+        BulkFixtureLoader.__init__(self)
+        self.deleted_counts = {}
+        self.num_summaries_rebuilt = 0
+        self.missing_rates = set()
+
+    # The MSH prices of deleted formulations are deleted through the ORM
+    @deferred_rebuilds
+    def apply(self, changes_filename, deletes_filename):
+        deletes_file = open(deletes_filename, 'rb')
+        try:
+            deleted_pks = self.read_deletes(deletes_file)
+        finally:
+            deletes_file.close()
+
+        # Found before the rows that say which formulations they belong to
+        # are gone
+        affected = self.get_affected_formulations(deleted_pks)
+
+        deleted_formulations = deleted_pks.get(Formulation, [])
+        for pks in self.get_batches(deleted_formulations):
+            # Raw deletes don't cascade to rows the fixtures don't hold
+            # pylint: disable-msg=E1101
+            FormulationTrigram.objects.filter(formulation__in=pks).delete()
+            MSHPrice.objects.filter(formulation__in=pks).delete()
+            PriceSummary.objects.filter(formulation__in=pks).delete()
+
+        # Foreign key checks are still on, so rows are deleted before the
+        # rows they refer to
+        for model in self.get_delete_order(deleted_pks.keys()):
+            self.delete(model, deleted_pks[model])
+
+        self.load([changes_filename])
+
+        affected.update(self.get_affected_formulations(self.loaded_pks))
+        affected.difference_update(deleted_formulations)
+
+        formulation_index = FormulationIndex()
+        for pks in self.get_batches(self.loaded_pks.get(Formulation, [])):
+            # pylint: disable-msg=E1101
+            for formulation in Formulation.objects.filter(pk__in=pks):
+                formulation_index.index(formulation)
+
+        builder = PriceSummaryBuilder()
+
+        if ExchangeRate in deleted_pks or ExchangeRate in self.loaded_pks:
+            # Any price could have been converted with the changed rate
+            self.num_summaries_rebuilt = len(builder.rebuild_all())
+        else:
+            for formulation_id in affected:
+                builder.rebuild(formulation_id)
+
+            self.num_summaries_rebuilt = len(affected)
+
+        self.missing_rates = builder.missing_rates
+
+        transaction.commit_unless_managed()
+
+    def read_deletes(self, deletes_file):
+        """
+        Returns the primary keys to delete, grouped by model.
+        """
+        deleted_pks = {}
+
+        for item in iter_json_array(deletes_file):
+            (app_label, model_name) = item['model'].split(".")
+            model = get_model(app_label, model_name)
+
+            if model is None:
+                raise ValueError("Unknown model %s" % item['model'])
+
+            # pylint: disable-msg=W0212
+            pk = model._meta.pk.to_python(item['pk'])
+            deleted_pks.setdefault(model, []).append(pk)
+
+        return deleted_pks
+
+    def get_delete_order(self, models):
+        """
+        Returns models ordered so that each comes before any of them its
+        foreign keys refer to.
+        """
+        remaining = list(models)
+        ordered = []
+
+        while remaining:
+            # pylint: disable-msg=W0212
+            referred_to = set([field.rel.to for model in remaining
+                               for field in model._meta.fields
+                               if field.rel is not None and
+                               field.rel.to is not model])
+            unreferred = [model for model in remaining
+                          if model not in referred_to]
+
+            if not unreferred:
+                # A cycle, which only nullable keys could allow
+                unreferred = remaining
+
+            ordered.extend(unreferred)
+            remaining = [model for model in remaining
+                         if model not in unreferred]
+
+        return ordered
+
+    def get_batches(self, pks):
+        for start in range(0, len(pks), self.BATCH_SIZE):
+            yield pks[start:start + self.BATCH_SIZE]
+
+    def get_affected_formulations(self, pks_by_model):
+        """
+        Returns the ids of the formulations whose price summaries depend on
+        the given rows.
+        """
+        affected = set(pks_by_model.get(Formulation, []))
+
+        for model in self.PRICED_MODELS:
+            for pks in self.get_batches(pks_by_model.get(model, [])):
+                # pylint: disable-msg=E1101
+                affected.update(model.objects.filter(pk__in=pks).values_list(
+                    'formulation', flat=True))
+
+        return affected
+
+    def delete(self, model, pks):
+        # pylint: disable-msg=W0212
+        meta = model._meta
+        quote_name = connection.ops.quote_name
+
+        for batch in self.get_batches(pks):
+            self.cursor.execute("DELETE FROM %s WHERE %s IN (%s)" %
+                                (quote_name(meta.db_table),
+                                 quote_name(meta.pk.column),
+                                 ", ".join(["%s"] * len(batch))), batch)
+
+        self.deleted_counts[model] = len(pks)
+
+    def get_num_deleted(self):
+        return sum(self.deleted_counts.values())
@@ -1,4 +1,6 @@
-from copy import deepcopy
+from itertools import izip
+import math
+
 import django_tables as tables
 from sarpaminfohub.infohub.sarpam_table import SarpamTable
 from django.template.loader import render_to_string
@@ -14,75 +16,160 @@ class FormulationGraph(SarpamTable):
     median_fob_price = 0.0
     median_landed_price = 0.0
 
-    def __init__(self, rows, msh_price=None):
-        # Don't like this, but rows is being modified below, causing side effects
-        rows = deepcopy(rows)
-        
-        if msh_price is not None:
-            # msh_price might be a Decimal, which max() thinks is larger than
-            # any float, so in order to compare properly with floats we need
-            # to convert msh_price to float as well
-            self.max_price = max(self.max_price, float(msh_price)) 
+    # Pixels from 0 to max_price
+    WIDTH = 696
+
+    # Pixels given to each country in the SVG graph, and to the scale above
+    # them
+    ROW_HEIGHT = 36
+    SCALE_HEIGHT = 20
+    LABEL_WIDTH = 200
 
-        # print "input data = %s" % rows        
+    def __init__(self, rows, msh_price=None):
         (self.median_fob_price, self.median_landed_price) = \
             utils.get_median_prices(rows)
-        # print "median prices = %s, %s" % (self.median_fob_price, self.median_landed_price)
-        
-        for row in rows:
-            new_max_price = max(self.max_price, row['fob_price'], 
-                row['landed_price'])
-            # logging.warning("max of %s, %s and %s is %s" %
-            #    (self.max_price, row['fob_price'], row['landed_price'],
-            #        new_max_price))
-            self.max_price = new_max_price
-            
-            self.round_to_set_decimal_places(row, 'fob_price')
-            self.round_to_set_decimal_places(row, 'landed_price')
-
-        # scale up the value to between 1 and 10, then round up the first
-        # digit to 1, 2 or 5 to make nicer graph scales
-        rounded_up = self.max_price
-        scale_factor = 1
-
-        while rounded_up < 1:
-            rounded_up = rounded_up * 10
-            scale_factor = scale_factor * 10
-        
-        while rounded_up > 10:
-            rounded_up = rounded_up / 10.0
-            scale_factor = scale_factor / 10.0
-
-        if rounded_up > 5:
-            rounded_up = 10.0
-        elif rounded_up > 2:
-            rounded_up = 5.0
-        elif rounded_up > 1:
-            rounded_up = 2.0
-        # else it's 1, which is fine
-        
-        # scale back down
-        self.max_price = rounded_up / scale_factor
-        
-        # generate the intervals on the graph scale
-        self.scale = []
-        for k in range(1, 11):
-            self.scale.append(k * (self.max_price / 10))
+
+        fob_prices = self.get_float_column(rows, 'fob_price')
+        landed_prices = self.get_float_column(rows, 'landed_price')
+
+        # msh_price might be a Decimal, which max() thinks is larger than
+        # any float, so it's compared as a float as well
+        prices = [price for price in fob_prices + landed_prices
+                  if price is not None]
+        if msh_price is not None:
+            prices.append(float(msh_price))
+
+        self.max_price = get_scale_maximum(max([self.max_price] + prices))
+
+        # the intervals on the graph scale
+        self.scale = [k * (self.max_price / 10) for k in range(1, 11)]
 
         self.msh_price = msh_price
 
+        # The bars show the prices as they are displayed, rounded
+        fob_prices = self.get_rounded_column(fob_prices)
+        landed_prices = self.get_rounded_column(landed_prices)
+
+        self.bars = [{'country': row['country'],
+                      'fob_price': self.get_label(fob_price),
+                      'landed_price': self.get_label(landed_price),
+                      'fob_width': fob_width,
+                      'landed_width': landed_width}
+                     for (row, fob_price, landed_price, fob_width,
+                          landed_width) in
+                     izip(rows, fob_prices, landed_prices,
+                          self.get_widths(fob_prices),
+                          self.get_widths(landed_prices))]
+
+        # Markers are left out for missing or zero prices
+        (self.msh_offset, self.median_fob_offset,
+         self.median_landed_offset) = self.get_widths(
+            [price and float(price) or None
+             for price in (msh_price, self.median_fob_price,
+                           self.median_landed_price)], missing=None)
+
         SarpamTable.__init__(self, rows)
 
+    def get_float_column(self, rows, name):
+        return [None if row[name] is None else float(row[name])
+                for row in rows]
+
+    def get_rounded_column(self, prices):
+        rounding = settings.SARPAM_NUMBER_ROUNDING
+        return [None if price is None else round(price, rounding)
+                for price in prices]
+
+    def get_label(self, price):
+        if price is None:
+            return self.NO_DATA
+
+        return price
+
+    def get_widths(self, prices, missing=0):
+        """
+        Returns the pixels across the graph for each price, or missing if
+        there's no price.
+        """
+        max_price = self.max_price
+        width = self.WIDTH
+
+        # Worked out as {% widthratio %} did, so the bars don't move
+        return [missing if price is None else
+                int(round((price / max_price) * width))
+                for price in prices]
+
+    def get_context(self):
+        return {'sarpam_number_rounding':settings.SARPAM_NUMBER_ROUNDING,
+                'sarpam_currency_code':settings.SARPAM_CURRENCY_CODE,
+                'table':self,
+                'bars':self.bars,
+                'msh_price':self.msh_price,
+                'median_fob_price':self.median_fob_price,
+                'median_landed_price':self.median_landed_price}
+
     def as_html(self):
-        extra_context = {
-            'sarpam_number_format':settings.SARPAM_NUMBER_FORMAT,
-            'sarpam_number_rounding':settings.SARPAM_NUMBER_ROUNDING,
-            'sarpam_currency_code':settings.SARPAM_CURRENCY_CODE,
-            'table':self,
-            'msh_price':self.msh_price,
-            'median_fob_price':self.median_fob_price,
-            'median_landed_price':self.median_landed_price
-        }
-        return render_to_string('formulation/graph.html', 
-            extra_context)
+        if settings.SARPAM_SVG_GRAPH:
+            return self.as_svg()
+
+        return render_to_string('formulation/graph.html', self.get_context())
+
+    def as_svg(self):
+        """
+        Draws the same graph as an SVG image, which takes much less markup
+        than the nested tables, as each marker is a single line rather than
+        one for each country.
+        """
+        context = self.get_context()
+
+        rows = []
+        for (i, bar) in enumerate(self.bars):
+            row = dict(bar)
+            row['y'] = self.SCALE_HEIGHT + i * self.ROW_HEIGHT
+            rows.append(row)
+
+        height = self.SCALE_HEIGHT + len(rows) * self.ROW_HEIGHT
+
+        markers = [(name, offset) for (name, offset) in
+                   (('msh_price', self.msh_offset),
+                    ('median_fob_price', self.median_fob_offset),
+                    ('median_landed_price', self.median_landed_offset))
+                   if offset is not None]
+
+        context.update({'rows': rows,
+                        'scale_labels': zip(self.get_widths(self.scale),
+                                            self.scale),
+                        'markers': markers,
+                        'label_width': self.LABEL_WIDTH,
+                        'graph_width': self.WIDTH,
+                        'width': self.LABEL_WIDTH + self.WIDTH,
+                        'scale_height': self.SCALE_HEIGHT,
+                        'height': height})
+
+        return render_to_string('formulation/graph_svg.html', context)
+
+def get_scale_maximum(price):
+    """
+    Rounds price up to the next 1, 2 or 5 times a power of ten, to make a
+    nicer graph scale.
+    """
+    exponent = int(math.floor(math.log10(price)))
+
+    # Scaled to between 1 and 10, dividing by a whole power of ten where
+    # possible as that's exact
+    if exponent < 0:
+        scale_factor = 10 ** -exponent
+        scaled = price * scale_factor
+    else:
+        scale_factor = 1.0 / (10 ** exponent)
+        scaled = price / (10 ** exponent)
+
+    if scaled > 5:
+        rounded_up = 10.0
+    elif scaled > 2:
+        rounded_up = 5.0
+    elif scaled > 1:
+        rounded_up = 2.0
+    else:
+        rounded_up = 1.0
 
+    return rounded_up / scale_factor
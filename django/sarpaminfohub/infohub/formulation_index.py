@@ -0,0 +1,112 @@
+from django.db.models import Count
+
+from sarpaminfohub.infohub.models import Formulation, FormulationTrigram
+
+class FormulationIndex(object):
+    """
+    Searches formulation names using a table of the trigrams in each name,
+    so that searching doesn't have to scan every name with LIKE '%term%'.
+
+    Names containing the search term are returned if there are any,
+    otherwise names sharing enough trigrams with it, so that a misspelt
+    search still finds something.
+    """
+    # Fraction of the search term's trigrams a name must contain to be
+    # returned when no name contains the term itself
+    MIN_SIMILARITY = 0.5
+
+    def get_trigrams(self, text):
+        text = text.lower()
+        trigrams = set()
+
+        for i in range(len(text) - 2):
+            trigrams.add(text[i:i + 3])
+
+        return trigrams
+
+    def index(self, formulation):
+        # pylint: disable-msg=E1101
+        FormulationTrigram.objects.filter(formulation=formulation).delete()
+
+        for trigram in self.get_trigrams(formulation.name):
+            FormulationTrigram.objects.create(formulation=formulation,
+                                              trigram=trigram)
+
+    def rebuild_all(self):
+        # pylint: disable-msg=E1101
+        FormulationTrigram.objects.all().delete()
+
+        formulations = Formulation.objects.all()
+
+        for formulation in formulations:
+            self.index(formulation)
+
+        return len(formulations)
+
+    def search(self, search_term):
+        """
+        Returns the ids of the formulations that match, best matches first.
+        """
+        search_term = search_term.lower()
+        trigrams = self.get_trigrams(search_term)
+
+        if len(trigrams) == 0:
+            # Too short to have any trigrams, but then there's not much to
+            # scan for either
+            # pylint: disable-msg=E1101
+            formulations = Formulation.objects.filter(
+                name__icontains=search_term)
+
+            return list(formulations.order_by('name').values_list('id',
+                                                                  flat=True))
+
+        # pylint: disable-msg=E1101
+        hits = FormulationTrigram.objects.filter(trigram__in=trigrams)
+        hits = hits.values('formulation').annotate(count=Count('trigram'))
+
+        hit_counts = {}
+
+        for hit in hits:
+            hit_counts[hit['formulation']] = hit['count']
+
+        matching_ids = self.get_ids_of_names_containing(search_term, 
+                                                        trigrams, hit_counts)
+
+        if len(matching_ids) == 0:
+            matching_ids = self.get_ids_of_similar_names(trigrams, hit_counts)
+
+        return matching_ids
+
+    def get_ids_of_names_containing(self, search_term, trigrams, hit_counts):
+        candidate_ids = [formulation_id for (formulation_id, count)
+                         in hit_counts.iteritems() if count == len(trigrams)]
+
+        if len(candidate_ids) == 0:
+            return []
+
+        # Having all the trigrams doesn't guarantee they are in the right
+        # order, so check the names themselves
+        # pylint: disable-msg=E1101
+        formulations = Formulation.objects.filter(id__in=candidate_ids)
+        matches = []
+
+        for (formulation_id, name) in formulations.values_list('id', 'name'):
+            name = name.lower()
+
+            if search_term in name:
+                # Names starting with the search term come first
+                is_prefix = name.startswith(search_term)
+                matches.append((not is_prefix, name, formulation_id))
+
+        matches.sort()
+
+        return [formulation_id for (_, _, formulation_id) in matches]
+
+    def get_ids_of_similar_names(self, trigrams, hit_counts):
+        min_count = self.MIN_SIMILARITY * len(trigrams)
+
+        matches = [(-count, formulation_id) for (formulation_id, count)
+                   in hit_counts.iteritems() if count >= min_count]
+        matches.sort()
+
+        return [formulation_id for (_, formulation_id) in matches]
@@ -0,0 +1,159 @@
+"""
+Indexes for the columns the price pages and importers look things up by,
+beyond the ones Django makes for primary and foreign keys.
+
+They are kept here rather than on the models, since Django 1.2 can't
+declare an index on several columns and syncdb only creates indexes with
+new tables. syncdb creates them along with the infohub tables, and the
+create_indexes command adds any that are missing from an existing
+database.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.backends.util import truncate_name
+
+from sarpaminfohub.infohub.models import ExchangeRate, Formulation, Price
+
+class Index(object):
+    def __init__(self, model, name, field_names, unique=False):
+        self.model = model
+        self.name = name
+        self.field_names = field_names
+        self.unique = unique
+
+    def get_table(self):
+        # pylint: disable-msg=W0212
+        return self.model._meta.db_table
+
+    def get_columns(self):
+        # pylint: disable-msg=W0212
+        meta = self.model._meta
+        return tuple([meta.get_field(name).column
+                      for name in self.field_names])
+
+    def get_quoted_name(self):
+        return connection.ops.quote_name(
+            truncate_name(self.name, connection.ops.max_name_length()))
+
+    def get_create_sql(self):
+        quote_name = connection.ops.quote_name
+
+        if self.unique:
+            create = "CREATE UNIQUE INDEX"
+        else:
+            create = "CREATE INDEX"
+
+        return "%s %s ON %s (%s)" % (create, self.get_quoted_name(),
+                                     quote_name(self.get_table()),
+                                     ", ".join([quote_name(column) for column
+                                                in self.get_columns()]))
+
+    def get_drop_sql(self):
+        if connection.settings_dict['ENGINE'].endswith('mysql'):
+            return "DROP INDEX %s ON %s" % \
+                (self.get_quoted_name(),
+                 connection.ops.quote_name(self.get_table()))
+
+        return "DROP INDEX %s" % self.get_quoted_name()
+
+    def exists(self, cursor):
+        """
+        True if the table already has an index on the same columns, whatever
+        it is called, that is unique if this one should be.
+        """
+        for (columns, unique) in get_table_indexes(cursor, self.get_table()):
+            if columns == self.get_columns() and (unique or not self.unique):
+                return True
+
+        return False
+
+# The columns DjangoBackend.get_price_records() reads, so that the prices
+# of a formulation can be read from the index alone
+PRICE_RECORD_FIELDS = ('formulation', 'country', 'incoterm', 'supplier',
+                       'supplier_country', 'manufacture_country', 'period',
+                       'fob_price', 'landed_price', 'fob_currency',
+                       'landed_currency', 'issue_unit', 'volume')
+
+INDEXES = (
+    # CurrencyExchange looks rates up by currency and year
+    Index(ExchangeRate, 'infohub_exchangerate_symbol_year',
+          ('symbol', 'year'), unique=True),
+    # import_msh_prices matches formulations by name
+    Index(Formulation, 'infohub_formulation_name', ('name',)),
+    Index(Price, 'infohub_price_formulation_covering', PRICE_RECORD_FIELDS),
+)
+
+def get_table_indexes(cursor, table):
+    """
+    Returns (columns, unique) for each index on table.
+    """
+    engine = connection.settings_dict['ENGINE']
+    indexes = {}
+
+    if engine.endswith('sqlite3'):
+        cursor.execute("PRAGMA index_list(%s)" %
+                       connection.ops.quote_name(table))
+
+        for row in cursor.fetchall():
+            (name, unique) = row[1:3]
+            cursor.execute("PRAGMA index_info(%s)" %
+                           connection.ops.quote_name(name))
+            columns = [column for (_, _, column) in
+                       sorted(cursor.fetchall())]
+            indexes[name] = (tuple(columns), bool(unique))
+    elif engine.endswith('mysql'):
+        cursor.execute("SHOW INDEX FROM %s" % connection.ops.quote_name(table))
+        parts = {}
+
+        for row in cursor.fetchall():
+            (non_unique, name, sequence, column) = row[1:5]
+            parts.setdefault(name, []).append((sequence, column))
+            indexes[name] = (None, not non_unique)
+
+        for (name, (_, unique)) in indexes.items():
+            columns = [column for (_, column) in sorted(parts[name])]
+            indexes[name] = (tuple(columns), unique)
+    else:
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s",
+                       [table])
+
+        for (definition,) in cursor.fetchall():
+            columns = re.search(r"\(([^)]*)\)\s*$", definition).group(1)
+            columns = [column.strip().strip('"')
+                       for column in columns.split(",")]
+            indexes[definition] = (tuple(columns),
+                                   definition.startswith("CREATE UNIQUE"))
+
+    return indexes.values()
+
+def create_missing_indexes(indexes=INDEXES):
+    """
+    Creates those of indexes that the database doesn't have, returning
+    them.
+    """
+    cursor = connection.cursor()
+    created = []
+
+    for index in indexes:
+        if not index.exists(cursor):
+            cursor.execute(index.get_create_sql())
+            created.append(index)
+
+    transaction.commit_unless_managed()
+
+    return created
+
+def drop_indexes(indexes=INDEXES):
+    cursor = connection.cursor()
+
+    for index in indexes:
+        cursor.execute(index.get_drop_sql())
+
+    transaction.commit_unless_managed()
+
+# pylint: disable-msg=W0613
+def create_indexes_for_new_tables(sender, created_models, **kwargs):
+    # Only for new tables, which can't hold rows that break a unique index
+    create_missing_indexes([index for index in INDEXES
+                            if index.model in created_models])
@@ -0,0 +1,6 @@
+from django.db.models.signals import post_syncdb
+
+from sarpaminfohub.infohub import models
+from sarpaminfohub.infohub.indexes import create_indexes_for_new_tables
+
+post_syncdb.connect(create_indexes_for_new_tables, sender=models)
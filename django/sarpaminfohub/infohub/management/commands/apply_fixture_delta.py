@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from sarpaminfohub.infohub.fixture_loader import FixtureDeltaLoader
+from sarpaminfohub.infohub.price_summaries import describe_missing_rates
+from sarpaminfohub.infohub.response_cache import bump_data_version
+
+class Command(BaseCommand):
+    args = '<changes.json> <deletes.json>'
+    help = 'Applies the delta written by scripts/scrape.py --incremental'
+
+    def handle(self, *filenames, **options):
+        if len(filenames) != 2:
+            raise CommandError("Give the changes and deletes files")
+
+        loader = self.apply(*filenames)
+
+        # Not until the delta is committed, or a page rendered from the old
+        # data could be cached under the new version
+        bump_data_version()
+
+        # pylint: disable-msg=W0212
+        for model in loader.models:
+            print "%-30s %8d changed" % (model._meta.object_name,
+                                         loader.counts[model])
+
+        for (model, count) in loader.deleted_counts.items():
+            print "%-30s %8d deleted" % (model._meta.object_name, count)
+
+        print "Changed %d and deleted %d objects, rebuilt %d price " \
+            "summaries" % (loader.get_num_objects(), loader.get_num_deleted(),
+                           loader.num_summaries_rebuilt)
+
+        for warning in describe_missing_rates(loader.missing_rates):
+            print warning
+
+    @transaction.commit_on_success
+    def apply(self, changes_filename, deletes_filename):
+        loader = FixtureDeltaLoader()
+
+        try:
+            loader.apply(changes_filename, deletes_filename)
+        except ValueError, e:
+            raise CommandError(str(e))
+
+        return loader
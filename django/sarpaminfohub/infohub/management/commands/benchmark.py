@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sarpaminfohub.infohub.benchmarks import BENCHMARKS
+
+class Command(BaseCommand):
+    args = '[<benchmark> ...]'
+    help = 'Runs the named benchmarks, or all of them: %s' % \
+        ", ".join(sorted(BENCHMARKS))
+
+    def handle(self, *args, **options):
+        names = args or sorted(BENCHMARKS)
+
+        for name in names:
+            if name not in BENCHMARKS:
+                raise CommandError("Unknown benchmark %s" % name)
+
+            BENCHMARKS[name]()
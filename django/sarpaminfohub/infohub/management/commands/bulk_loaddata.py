@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from sarpaminfohub.infohub.fixture_loader import BulkFixtureLoader
+from sarpaminfohub.infohub.response_cache import bump_data_version
+
+class Command(BaseCommand):
+    args = '<fixture.json> [<fixture.json> ...]'
+    help = 'Loads JSON fixtures with multi-row INSERTs, in file name order'
+
+    def handle(self, *filenames, **options):
+        if len(filenames) == 0:
+            raise CommandError("Give at least one JSON fixture file")
+
+        loader = self.load(filenames)
+
+        # Not until the load is committed, or a page rendered from the old
+        # data could be cached under the new version
+        bump_data_version()
+
+        # pylint: disable-msg=W0212
+        for model in loader.models:
+            print "%-30s %8d objects" % (model._meta.object_name,
+                                         loader.counts[model])
+
+        print "Loaded %d objects from %d fixtures in %.2fs" % \
+            (loader.get_num_objects(), len(filenames), loader.elapsed_time)
+
+    @transaction.commit_on_success
+    def load(self, filenames):
+        loader = BulkFixtureLoader()
+
+        try:
+            loader.load(filenames)
+        except ValueError, e:
+            raise CommandError(str(e))
+
+        return loader
@@ -0,0 +1,16 @@
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+from sarpaminfohub.infohub.indexes import INDEXES, create_missing_indexes
+
+class Command(NoArgsCommand):
+    help = 'Adds the indexes in infohub/indexes.py that the database lacks'
+
+    @transaction.commit_on_success
+    def handle_noargs(self, **options):
+        created = create_missing_indexes()
+
+        for index in created:
+            print "Created %s" % index.name
+
+        print "Created %d of %d indexes" % (len(created), len(INDEXES))
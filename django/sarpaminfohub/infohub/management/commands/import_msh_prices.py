@@ -1,35 +1,49 @@
 # -*- coding: utf-8 -*-
 
-import csv
-
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
-from sarpaminfohub.infohub.models import Formulation, MSHPrice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from sarpaminfohub.infohub.msh_price_importer import MSHPriceImporter
+from sarpaminfohub.infohub.response_cache import bump_data_version
+from sarpaminfohub.infohub.static_pages import update_static_pages
 
 
 class Command(BaseCommand):
-    args = '<csv_file>'
-    help = 'Enter the CVS file for the MSH prices'
+    args = '<csv_file> [<csv_file> ...]'
+    help = 'Enter the CVS files for the MSH prices, one per period'
 
     def handle(self, *args, **options):
-        csvReader = csv.reader(open(args[0]), delimiter="\t")
-
-        currency_line = next(csvReader)
-        next(csvReader)
-
-        period = currency_line[0].split(' ')[2]
-
-        for row in csvReader:
-            (formulation, msh_price, dummy) = row
-            msh_price = msh_price.strip()
-
-            if msh_price:
-                try:
-                    f = Formulation.objects.get(name=formulation)
-                    MSHPrice.objects.create(formulation=f, period=period, price=msh_price)
-                except IntegrityError:
-                    msh = MSHPrice.objects.get(formulation=f, period=period)
-                    msh.price = msh_price
-                    msh.save()
-                except Formulation.DoesNotExist:
-                    print "Formulation %s doesn't exist" % (formulation,)
+        if len(args) == 0:
+            raise CommandError("Give at least one MSH price CSV file")
+
+        importer = self.import_files(args)
+
+        # Not until the prices are committed, or a page rendered from the
+        # old ones could be cached under the new version
+        bump_data_version()
+        writer = update_static_pages()
+
+        for formulation in importer.unknown_formulations:
+            print "Formulation %s doesn't exist" % (formulation,)
+
+        print "Imported %d rows in %.2fs (%.0f rows/sec): " \
+            "%d prices added, %d updated, %d unknown formulations" % \
+            (importer.num_rows, importer.elapsed_time,
+             importer.get_rows_per_second(), importer.num_inserted,
+             importer.num_updated, len(importer.unknown_formulations))
+
+        if writer is not None:
+            print "Rewrote %d static pages, removed %d" % \
+                (writer.num_written, writer.num_removed)
+
+    @transaction.commit_on_success
+    def import_files(self, filenames):
+        csv_files = [open(filename) for filename in filenames]
+
+        try:
+            importer = MSHPriceImporter()
+            importer.import_files(csv_files)
+        finally:
+            for csv_file in csv_files:
+                csv_file.close()
+
+        return importer
@@ -0,0 +1,60 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from sarpaminfohub.infohub.price_summaries import describe_missing_rates
+from sarpaminfohub.infohub.response_cache import bump_data_version
+from sarpaminfohub.infohub.static_pages import update_static_pages
+from sarpaminfohub.infohub.scrape_importer import ScrapeImporter
+
+class Command(BaseCommand):
+    args = '<data_dir>'
+    help = 'Loads the file.db in data_dir into the database as scrape.py ' \
+        'and bulk_loaddata would, without the fixtures in between'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=1,
+                    help='Standardise names in this many processes'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("Give the directory containing file.db")
+
+        quiet = int(options.get('verbosity', 1)) == 0
+        importer = self.import_data_dir(args[0], options['workers'], quiet)
+
+        # Not until the import is committed, or a page rendered from the old
+        # data could be cached under the new version
+        bump_data_version()
+        writer = update_static_pages()
+
+        loader = importer.loader
+
+        # pylint: disable-msg=W0212
+        for model in loader.models:
+            print "%-30s %8d objects" % (model._meta.object_name,
+                                         loader.counts[model])
+
+        print "Loaded %d objects in %.2fs" % (loader.get_num_objects(),
+                                              loader.elapsed_time)
+        print "Indexed %d formulations, summarised prices for %d" % \
+            (importer.num_indexed, importer.num_summaries)
+
+        for warning in describe_missing_rates(importer.missing_rates):
+            print warning
+
+        if writer is not None:
+            print "Rewrote %d static pages, removed %d" % \
+                (writer.num_written, writer.num_removed)
+
+    @transaction.commit_on_success
+    def import_data_dir(self, data_dir, workers, quiet):
+        importer = ScrapeImporter(workers, quiet)
+
+        try:
+            importer.import_data_dir(data_dir)
+        except ValueError, e:
+            raise CommandError(str(e))
+
+        return importer
@@ -0,0 +1,19 @@
+from django.core.management.commands import loaddata
+from django.db import DatabaseError
+
+from sarpaminfohub.infohub.response_cache import bump_data_version
+
+class Command(loaddata.Command):
+    """
+    Django's loaddata, but also stops any pages cached from the old data
+    being served.
+    """
+    def handle(self, *fixture_labels, **options):
+        loaddata.Command.handle(self, *fixture_labels, **options)
+
+        try:
+            bump_data_version()
+        except DatabaseError:
+            # syncdb loads initial_data before createcachetable has been
+            # run, in which case nothing can have been cached
+            pass
@@ -0,0 +1,13 @@
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+from sarpaminfohub.infohub.formulation_index import FormulationIndex
+
+class Command(NoArgsCommand):
+    help = 'Rebuilds the index used to search formulation names'
+
+    @transaction.commit_on_success
+    def handle_noargs(self, **options):
+        num_formulations = FormulationIndex().rebuild_all()
+
+        print "Indexed %d formulations" % num_formulations
@@ -0,0 +1,21 @@
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+from sarpaminfohub.infohub.models import Formulation
+from sarpaminfohub.infohub.price_summaries import PriceSummaryBuilder, \
+    describe_missing_rates
+
+class Command(NoArgsCommand):
+    help = 'Recalculates the median price summaries used by the search page'
+
+    @transaction.commit_on_success
+    def handle_noargs(self, **options):
+        builder = PriceSummaryBuilder()
+        summaries = builder.rebuild_all()
+
+        # pylint: disable-msg=E1101
+        print "Summarised prices for %d of %d formulations" % \
+            (len(summaries), Formulation.objects.count())
+
+        for warning in describe_missing_rates(builder.missing_rates):
+            print warning
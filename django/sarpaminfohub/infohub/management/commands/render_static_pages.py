@@ -0,0 +1,26 @@
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand, CommandError
+
+from sarpaminfohub.infohub.static_pages import StaticPageWriter
+
+class Command(NoArgsCommand):
+    help = 'Writes the formulation, supplier and product pages whose data ' \
+        'has changed to SARPAM_STATIC_PAGES_ROOT for Apache to serve'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--all', action='store_true', dest='rebuild_all',
+                    default=False,
+                    help='Write every page, as after changing a template'),
+    )
+
+    def handle_noargs(self, **options):
+        writer = StaticPageWriter(settings.SARPAM_STATIC_PAGES_ROOT)
+
+        try:
+            writer.write_all(options['rebuild_all'])
+        except ValueError, e:
+            raise CommandError(str(e))
+
+        print "Wrote %d pages, %d unchanged, removed %d" % \
+            (writer.num_written, writer.num_unchanged, writer.num_removed)
@@ -0,0 +1,20 @@
+from django.core.management.base import NoArgsCommand
+
+from sarpaminfohub.infohub.response_cache import get_counters, \
+    get_data_version
+
+class Command(NoArgsCommand):
+    help = 'Shows how often cached formulation and supplier pages are used'
+
+    def handle_noargs(self, **options):
+        counters = get_counters()
+        requests = counters['hits'] + counters['misses']
+
+        if requests > 0:
+            hit_rate = 100.0 * counters['hits'] / requests
+        else:
+            hit_rate = 0.0
+
+        print "Data version %s: %d hits, %d misses (%.1f%% hit rate)" % \
+            (get_data_version(), counters['hits'], counters['misses'],
+             hit_rate)
@@ -0,0 +1,42 @@
+from sarpaminfohub.infohub.price_summaries import finish_deferring, \
+    start_deferring
+from sarpaminfohub.infohub.response_cache import finish_watching_changes, \
+    start_watching_changes
+
+class DataVersionMiddleware(object):
+    """
+    Bumps the data version at the end of a request that saved or deleted
+    rows behind the cached pages, once the admin site has committed them.
+    It comes before DeferredPriceSummaryMiddleware in MIDDLEWARE_CLASSES,
+    so the version is bumped after the summaries are rebuilt too.
+    """
+    def process_request(self, request):
+        start_watching_changes()
+        request.watching_changes = True
+
+    def process_response(self, request, response):
+        if getattr(request, 'watching_changes', False):
+            request.watching_changes = False
+            finish_watching_changes()
+
+        return response
+
+class DeferredPriceSummaryMiddleware(object):
+    """
+    Rebuilds the price summaries the rows saved during a request call for
+    once, at the end of it, so that editing many prices in the admin site
+    doesn't rebuild a summary for each one. It wants to come first in
+    MIDDLEWARE_CLASSES, so that its response is processed last.
+    """
+    def process_request(self, request):
+        start_deferring()
+        request.deferring_price_summaries = True
+
+    def process_response(self, request, response):
+        # Not every response has been through process_request, for instance
+        # if middleware before this one returned early
+        if getattr(request, 'deferring_price_summaries', False):
+            request.deferring_price_summaries = False
+            finish_deferring()
+
+        return response
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -21,6 +22,17 @@ class Formulation(models.Model):
     def __unicode__(self):
         return self.name
 
+class FormulationTrigram(models.Model):
+    """
+    One row for each distinct three character sequence in the lower case
+    name of a formulation, used by FormulationIndex to search names.
+    """
+    formulation = models.ForeignKey(Formulation, related_name='trigrams')
+    trigram = models.CharField(max_length=3, db_index=True)
+
+    def __unicode__(self):
+        return "%s (%s)" % (self.trigram, self.formulation)
+
 class Country(models.Model):
     code = models.CharField(max_length=2, primary_key=True)
     name = models.CharField(max_length=200)
@@ -85,7 +97,9 @@ class Price(models.Model):
     supplier = models.ForeignKey(Supplier, null=True)
 
     def get_record(self):
-        record = {}
+        from sarpaminfohub.infohub.price_record import PriceRecord
+
+        record = PriceRecord()
         record['formulation'] = self.formulation.name
         
         if self.country is not None:
@@ -151,6 +165,20 @@ class MSHPrice(models.Model):
     def __unicode__(self):
         return "%s (%s)" % (self.formulation, self.period)
 
+class PriceSummary(models.Model):
+    """
+    Median USD prices for a formulation, precomputed from its prices so
+    that searching doesn't have to convert and sort every price.
+    """
+    formulation = models.OneToOneField(Formulation)
+    median_fob_price = models.FloatField(null=True)
+    median_landed_price = models.FloatField(null=True)
+    msh_price = models.DecimalField(max_digits=20, decimal_places=6, null=True)
+    price_count = models.IntegerField()
+
+    def __unicode__(self):
+        return "%s (%d prices)" % (self.formulation, self.price_count)
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     formulation = models.ForeignKey(Formulation)
@@ -182,3 +210,79 @@ class ProductRegistration(models.Model):
 
     def __unicode__(self):
         return "%s (%s)" % (self.product, self.country)
+
+# Keep the formulation search index up to date. As with the price summaries
+# below, loaddata is followed by the rebuild_formulation_index command.
+# pylint: disable-msg=W0613
+def index_formulation(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from sarpaminfohub.infohub.formulation_index import FormulationIndex
+        FormulationIndex().index(instance)
+
+post_save.connect(index_formulation, sender=Formulation)
+
+# Keep the price summaries up to date. Fixtures are loaded raw, so loaddata
+# is followed by the rebuild_price_summaries command instead. Within a
+# request the rebuilds are put off until its end, see infohub/middleware.py.
+# pylint: disable-msg=W0613
+def remember_stored_formulation(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        # pylint: disable-msg=W0212
+        instance._stored_formulation_ids = list(
+            sender._default_manager.filter(pk=instance.pk).values_list(
+                'formulation', flat=True))
+
+def rebuild_price_summary_for_formulation(sender, instance, raw=False,
+                                          **kwargs):
+    if not raw:
+        from sarpaminfohub.infohub.price_summaries import rebuild_later
+        rebuild_later(instance.formulation_id)
+
+        # A row moved to another formulation leaves the one it was in
+        for formulation_id in getattr(instance, '_stored_formulation_ids', []):
+            if formulation_id != instance.formulation_id:
+                rebuild_later(formulation_id)
+
+        instance._stored_formulation_ids = []
+
+def rebuild_all_price_summaries(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from sarpaminfohub.infohub.price_summaries import rebuild_later
+        rebuild_later()
+
+for model in (Price, MSHPrice):
+    pre_save.connect(remember_stored_formulation, sender=model)
+    post_save.connect(rebuild_price_summary_for_formulation, sender=model)
+    post_delete.connect(rebuild_price_summary_for_formulation, sender=model)
+
+post_save.connect(rebuild_all_price_summaries, sender=ExchangeRate)
+post_delete.connect(rebuild_all_price_summaries, sender=ExchangeRate)
+
+# Stop Apache serving pages written by render_static_pages that show the
+# old data. Fixtures are loaded raw, and render_static_pages is run after
+# loading them.
+# pylint: disable-msg=W0613
+def remove_static_pages_of_stored(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from sarpaminfohub.infohub.static_pages import remove_pages_showing
+        remove_pages_showing(instance, stored=True)
+
+def remove_static_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from sarpaminfohub.infohub.static_pages import remove_pages_showing
+        remove_pages_showing(instance)
+
+# The cached responses of those pages are dropped the same way. The commands
+# that load fixtures bump the data version once they have committed.
+def bump_data_version_for_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from sarpaminfohub.infohub.response_cache import data_changed
+        data_changed()
+
+for model in (Formulation, Price, MSHPrice, ExchangeRate, Product,
+              ProductRegistration, Supplier, Manufacturer, Country, Incoterm):
+    pre_save.connect(remove_static_pages_of_stored, sender=model)
+    post_save.connect(remove_static_pages, sender=model)
+    post_delete.connect(remove_static_pages, sender=model)
+    post_save.connect(bump_data_version_for_change, sender=model)
+    post_delete.connect(bump_data_version_for_change, sender=model)
@@ -0,0 +1,154 @@
+import csv
+import time
+
+from django.db import connection, transaction
+
+from sarpaminfohub.infohub.models import Formulation, MSHPrice, \
+    PriceSummary
+
+class MSHPriceImporter(object):
+    """
+    Imports MSH price guide files, as exported to tab separated CSV with
+    the period on the first line, column headings on the second and then
+    one formulation name and price per row.
+
+    A formulation only has one MSH price, so when several files are
+    imported the price from the latest period is kept. Prices are written
+    with a few multi-row statements rather than a query or two per row.
+
+    Call bump_data_version() once the import has been committed.
+    """
+    # Rows per INSERT, keeping within SQLite's limit of 999 parameters per
+    # statement
+    BATCH_SIZE = 300
+
+    def __init__(self):
+        self.unknown_formulations = []
+        self.num_rows = 0
+        self.num_inserted = 0
+        self.num_updated = 0
+        self.elapsed_time = 0.0
+
+    def read_prices(self, csv_file):
+        """
+        Yields (formulation name, period, price) for each priced row.
+        """
+        csv_reader = csv.reader(csv_file, delimiter="\t")
+
+        currency_line = csv_reader.next()
+        csv_reader.next()
+
+        period = int(currency_line[0].split(' ')[2])
+
+        for row in csv_reader:
+            (formulation, msh_price, dummy) = row
+            msh_price = msh_price.strip()
+
+            if msh_price:
+                yield (formulation, period, msh_price)
+
+    def import_files(self, csv_files):
+        start = time.time()
+
+        # Matched as MySQL's collation matched Formulation.objects.get(name=...)
+        formulation_ids = {}
+        # pylint: disable-msg=E1101
+        for (name, formulation_id) in \
+                Formulation.objects.order_by('id').values_list('name', 'id'):
+            formulation_ids.setdefault(self.get_name_key(name), formulation_id)
+        existing = {}
+
+        for (formulation_id, msh_price_id, period) in \
+                MSHPrice.objects.values_list('formulation', 'id', 'period'):
+            existing[formulation_id] = (msh_price_id, period)
+
+        latest = {}
+        unknown = set()
+
+        for csv_file in csv_files:
+            for (name, period, msh_price) in self.read_prices(csv_file):
+                self.num_rows += 1
+                formulation_id = formulation_ids.get(self.get_name_key(name))
+
+                if formulation_id is None:
+                    unknown.add(name)
+                    continue
+
+                if formulation_id in latest and \
+                        latest[formulation_id][0] > period:
+                    continue
+
+                latest[formulation_id] = (period, msh_price)
+
+        inserts = []
+        updates = []
+        summary_updates = []
+
+        for (formulation_id, (period, msh_price)) in latest.items():
+            if formulation_id in existing:
+                (msh_price_id, existing_period) = existing[formulation_id]
+
+                # Don't replace a newer price with an older guide's
+                if existing_period <= period:
+                    updates.append((period, msh_price, msh_price_id))
+                    summary_updates.append((msh_price, formulation_id))
+            else:
+                inserts.append((formulation_id, period, msh_price))
+                summary_updates.append((msh_price, formulation_id))
+
+        self.write_prices(inserts, updates)
+
+        # The raw SQL doesn't send the signals that keep the price summaries
+        # up to date, but only their copy of the MSH price can have changed
+        self.update_price_summaries(summary_updates)
+
+        transaction.commit_unless_managed()
+
+        self.unknown_formulations = sorted(unknown)
+        self.num_inserted = len(inserts)
+        self.num_updated = len(updates)
+        self.elapsed_time = time.time() - start
+
+    def get_name_key(self, name):
+        return name.strip().lower()
+
+    def write_prices(self, inserts, updates):
+        quote_name = connection.ops.quote_name
+        # pylint: disable-msg=W0212
+        table = quote_name(MSHPrice._meta.db_table)
+        formulation_column = quote_name(
+            MSHPrice._meta.get_field('formulation').column)
+
+        cursor = connection.cursor()
+
+        for start in range(0, len(inserts), self.BATCH_SIZE):
+            batch = inserts[start:start + self.BATCH_SIZE]
+            placeholders = ", ".join(["(%s, %s, %s)"] * len(batch))
+            parameters = []
+
+            for row in batch:
+                parameters.extend(row)
+
+            cursor.execute("INSERT INTO %s (%s, period, price) VALUES %s" %
+                           (table, formulation_column, placeholders),
+                           parameters)
+
+        cursor.executemany("UPDATE %s SET period = %%s, price = %%s "
+                           "WHERE id = %%s" % table, updates)
+
+    def update_price_summaries(self, summary_updates):
+        quote_name = connection.ops.quote_name
+        # pylint: disable-msg=W0212
+        table = quote_name(PriceSummary._meta.db_table)
+        formulation_column = quote_name(
+            PriceSummary._meta.get_field('formulation').column)
+
+        cursor = connection.cursor()
+        cursor.executemany("UPDATE %s SET msh_price = %%s WHERE %s = %%s" %
+                           (table, formulation_column), summary_updates)
+
+    def get_rows_per_second(self):
+        if self.elapsed_time > 0:
+            return self.num_rows / self.elapsed_time
+
+        return 0.0
@@ -0,0 +1,125 @@
+from itertools import izip
+from operator import attrgetter
+
+class PriceRecord(object):
+    """
+    A price as passed from the backends to DrugSearcher, the tables and
+    the price popups. It uses slots rather than a dict to keep large
+    searches small, but can be used like a dict with the same keys.
+    """
+    __slots__ = ('formulation',
+                 'country',
+                 'fob_price',
+                 'landed_price',
+                 'msh_price',
+                 'fob_currency',
+                 'period',
+                 'issue_unit',
+                 'landed_currency',
+                 'url',
+                 'incoterm',
+                 'supplier',
+                 'supplier_country',
+                 'manufacture_country',
+                 'volume')
+
+    field_names = frozenset(__slots__)
+
+    def __init__(self, formulation=None, country=None, fob_price=None,
+                 landed_price=None, msh_price=None, fob_currency=None,
+                 period=None, issue_unit=None, landed_currency=None, url=None,
+                 incoterm=None, supplier=None, supplier_country=None,
+                 manufacture_country=None, volume=None):
+        self.formulation = formulation
+        self.country = country
+        self.fob_price = fob_price
+        self.landed_price = landed_price
+        self.msh_price = msh_price
+        self.fob_currency = fob_currency
+        self.period = period
+        self.issue_unit = issue_unit
+        self.landed_currency = landed_currency
+        self.url = url
+        self.incoterm = incoterm
+        self.supplier = supplier
+        self.supplier_country = supplier_country
+        self.manufacture_country = manufacture_country
+        self.volume = volume
+
+    def __getitem__(self, name):
+        if name not in self.field_names:
+            raise KeyError(name)
+
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name not in self.field_names:
+            raise KeyError(name)
+
+        setattr(self, name, value)
+
+    @classmethod
+    def get_column(cls, records, name):
+        """
+        Returns the value of field name in each of records, which may be
+        dicts as well. Reading the slots directly is much quicker than
+        indexing each record.
+        """
+        if name not in cls.field_names:
+            raise KeyError(name)
+
+        try:
+            return map(attrgetter(name), records)
+        except AttributeError:
+            return [record[name] for record in records]
+
+    @classmethod
+    def set_column(cls, records, name, values):
+        """
+        Sets field name in each of records to the value at the same place
+        in values.
+        """
+        if name not in cls.field_names:
+            raise KeyError(name)
+
+        try:
+            for (record, value) in izip(records, values):
+                setattr(record, name, value)
+        except AttributeError:
+            for (record, value) in izip(records, values):
+                record[name] = value
+
+    def __contains__(self, name):
+        return name in self.field_names
+
+    def get(self, name, default=None):
+        if name not in self.field_names:
+            return default
+
+        return getattr(self, name)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.__slots__]
+
+    def copy(self):
+        return PriceRecord(**dict(self.items()))
+
+    def __eq__(self, other):
+        if isinstance(other, (PriceRecord, dict)):
+            return dict(self.items()) == dict(other.items())
+
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+
+        if equal is NotImplemented:
+            return equal
+
+        return not equal
+
+    def __repr__(self):
+        return "PriceRecord(%r)" % dict(self.items())
@@ -0,0 +1,148 @@
+import threading
+
+from django.utils.functional import wraps
+
+from sarpaminfohub.infohub.currency_exchange import CurrencyExchange
+from sarpaminfohub.infohub.django_backend import DjangoBackend
+from sarpaminfohub.infohub.drug_searcher import DrugSearcher
+from sarpaminfohub.infohub.models import Formulation, PriceSummary
+import utils
+
+class PriceSummaryBuilder(object):
+    def __init__(self):
+        self.drug_searcher = DrugSearcher(DjangoBackend())
+
+        # (currency, period) of each price left out of a summary because
+        # there was no exchange rate for it
+        self.missing_rates = set()
+
+    def rebuild(self, formulation_id):
+        """
+        Replaces the price summary for the formulation, returning the new
+        summary or None if it has no prices. Prices with no exchange rate
+        are left out of the medians, and their currency and period added
+        to missing_rates.
+        """
+        # pylint: disable-msg=E1101
+        PriceSummary.objects.filter(formulation=formulation_id).delete()
+
+        try:
+            formulation = Formulation.objects.get(pk=formulation_id)
+        except Formulation.DoesNotExist:
+            return None
+
+        prices = self.drug_searcher.backend.get_prices_for_formulation_with_id(
+            formulation_id)
+
+        if len(prices) == 0:
+            return None
+
+        self.drug_searcher.convert_all_prices_to_usd(prices,
+                                                     self.missing_rates)
+
+        (median_fob_price, median_landed_price) = \
+            utils.get_median_prices(prices)
+
+        return PriceSummary.objects.create(formulation=formulation,
+                                           median_fob_price=median_fob_price,
+                                           median_landed_price=median_landed_price,
+                                           msh_price=prices[0]['msh_price'],
+                                           price_count=len(prices))
+
+    def rebuild_all(self):
+        # This runs when an exchange rate changes, possibly before
+        # CurrencyExchange has heard about it
+        CurrencyExchange.clear_rates()
+
+        # pylint: disable-msg=E1101
+        PriceSummary.objects.all().delete()
+
+        summaries = []
+
+        for formulation_id in Formulation.objects.values_list('id', flat=True):
+            summary = self.rebuild(formulation_id)
+
+            if summary is not None:
+                summaries.append(summary)
+
+        return summaries
+
+def describe_missing_rates(missing_rates):
+    """
+    Returns a warning for each (currency, period) in missing_rates, as
+    gathered by PriceSummaryBuilder.
+    """
+    return ["No exchange rate for %s in %s, its prices were left out of "
+            "the price summaries" % (currency, period)
+            for (currency, period) in sorted(missing_rates)]
+
+class PendingRebuilds(threading.local):
+    """
+    The summaries whose rebuilds have been put off, see deferred_rebuilds().
+    """
+    def __init__(self):
+        threading.local.__init__(self)
+        self.depth = 0
+        self.rebuild_all = False
+        self.formulation_ids = set()
+
+pending = PendingRebuilds()
+
+def rebuild_later(formulation_id=None):
+    """
+    Rebuilds the formulation's summary, or every summary if formulation_id
+    is None, once rebuilds are no longer being deferred.
+    """
+    if pending.depth == 0:
+        builder = PriceSummaryBuilder()
+
+        if formulation_id is None:
+            builder.rebuild_all()
+        else:
+            builder.rebuild(formulation_id)
+    elif formulation_id is None:
+        pending.rebuild_all = True
+    else:
+        pending.formulation_ids.add(formulation_id)
+
+def start_deferring():
+    pending.depth += 1
+
+def finish_deferring():
+    """
+    Does the rebuilds asked for since the matching start_deferring(), once
+    each, unless that was itself inside another.
+    """
+    pending.depth -= 1
+
+    if pending.depth > 0:
+        return
+
+    (rebuild_all, formulation_ids) = (pending.rebuild_all,
+                                      pending.formulation_ids)
+    pending.rebuild_all = False
+    pending.formulation_ids = set()
+
+    builder = PriceSummaryBuilder()
+
+    if rebuild_all:
+        builder.rebuild_all()
+    else:
+        for formulation_id in sorted(formulation_ids):
+            builder.rebuild(formulation_id)
+
+def deferred_rebuilds(function):
+    """
+    Decorates function so that the summaries the rows it saves or deletes
+    call for are each rebuilt once, when it returns, rather than after
+    every row. Put it outside any transaction decorator so the rebuilds
+    follow the commit.
+    """
+    def call(*args, **kwargs):
+        start_deferring()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            finish_deferring()
+
+    return wraps(function)(call)
@@ -0,0 +1,143 @@
+"""
+Caches the rendered formulation, formulation products and supplier
+catalogue pages in CACHE_BACKEND.
+
+Cached pages are keyed by a data version as well as the view, id and
+backend, so bumping the version (as loaddata and import_msh_prices do,
+and saving or deleting a row behind the pages does) means no page
+rendered from the old data will be served again.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.functional import wraps
+
+DATA_VERSION_KEY = 'infohub:data_version'
+HITS_KEY = 'infohub:response_cache:hits'
+MISSES_KEY = 'infohub:response_cache:misses'
+
+# The longest timeout every cache backend accepts (memcached treats
+# anything longer as a timestamp)
+COUNTER_TIMEOUT = 60 * 60 * 24 * 30
+
+def get_new_data_version():
+    # Taken from the clock so it won't repeat a version that was
+    # evicted from the cache
+    return int(time.time() * 1000)
+
+def get_data_version():
+    version = cache.get(DATA_VERSION_KEY)
+
+    if version is None:
+        cache.add(DATA_VERSION_KEY, get_new_data_version(), COUNTER_TIMEOUT)
+        version = cache.get(DATA_VERSION_KEY)
+
+    return version
+
+def bump_data_version():
+    """
+    Stops any page cached so far from being served. Call this after
+    changing the data behind the pages.
+    """
+    try:
+        version = cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        version = get_new_data_version()
+        cache.set(DATA_VERSION_KEY, version, COUNTER_TIMEOUT)
+
+    return version
+
+class RequestChanges(threading.local):
+    """
+    Whether a request is being handled and has changed the data, see
+    data_changed().
+    """
+    def __init__(self):
+        threading.local.__init__(self)
+        self.watching = False
+        self.changed = False
+
+request_changes = RequestChanges()
+
+def data_changed():
+    """
+    Bumps the data version after a row behind the pages has been saved or
+    deleted. In a request it is bumped again at the end, once the change
+    has been committed, as a page rendered from the old data in between
+    could otherwise be cached under the new version.
+    """
+    bump_data_version()
+
+    if request_changes.watching:
+        request_changes.changed = True
+
+def start_watching_changes():
+    request_changes.watching = True
+    request_changes.changed = False
+
+def finish_watching_changes():
+    """
+    Bumps the data version again if data_changed() has been called since
+    start_watching_changes().
+    """
+    changed = request_changes.changed
+    request_changes.watching = False
+    request_changes.changed = False
+
+    if changed:
+        bump_data_version()
+
+def count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, COUNTER_TIMEOUT)
+
+def get_counters():
+    return {'hits': cache.get(HITS_KEY, 0),
+            'misses': cache.get(MISSES_KEY, 0)}
+
+def get_response_key(view_name, object_id, backend_name):
+    return "infohub:%s:%s:%s:%s" % (get_data_version(), view_name, 
+                                     object_id, backend_name)
+
+def cache_response(id_name):
+    """
+    Decorates a view taking an id (called id_name) and a backend name so
+    that its response is cached until the data version is bumped or
+    SARPAM_RESPONSE_CACHE_TIMEOUT seconds have passed.
+    """
+    def decorate(view):
+        def cached_view(request, *args, **kwargs):
+            timeout = settings.SARPAM_RESPONSE_CACHE_TIMEOUT
+
+            if timeout == 0:
+                return view(request, *args, **kwargs)
+
+            arguments = dict(zip((id_name, 'backend_name'), args))
+            arguments.update(kwargs)
+
+            key = get_response_key(view.__name__, arguments[id_name],
+                                   arguments.get('backend_name', "django"))
+            cached = cache.get(key)
+
+            if cached is not None:
+                count(HITS_KEY)
+                (content, content_type) = cached
+                return HttpResponse(content, content_type=content_type)
+
+            count(MISSES_KEY)
+            response = view(request, *args, **kwargs)
+
+            if response.status_code == 200:
+                cache.set(key, (response.content, response['Content-Type']),
+                          timeout)
+
+            return response
+
+        return wraps(view)(cached_view)
+
+    return decorate
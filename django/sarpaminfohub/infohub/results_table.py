@@ -10,20 +10,27 @@ class ResultsTable(SarpamTable):
     landed_price = tables.Column(verbose_name="Median Landed Price (%s)"%settings.SARPAM_CURRENCY_CODE)
     msh_price = tables.Column(verbose_name="MSH International Median (%s)"%settings.SARPAM_CURRENCY_CODE)
     rows_template = "drug_price_rows.html"
+    table_template = "drug_price_table.html"
 
     def __init__(self, rows, search_string):
-        for row in rows:
-            self.round_to_set_decimal_places(row, 'fob_price')
-            self.round_to_set_decimal_places(row, 'landed_price')
-            self.round_to_set_decimal_places(row, 'msh_price')
-
         SarpamTable.__init__(self, rows)
         self.search_string = search_string
 
+    def render_msh_price(self, row):
+        return self.get_rounded_value(row['msh_price'])
+
     def as_html(self):
         return render_to_string('results.html', \
                                 {'table':self, \
+                                 'table_html':SarpamTable.as_html(self), \
                                  'search_string':self.search_string})
 
     def get_rows_template(self):
         return "drug_price_rows.html"
+
+    def get_cells(self, row):
+        return {'href': row.get('href', ""),
+                'formulation': row['formulation'],
+                'fob_price': self.format_number(row['fob_price']),
+                'landed_price': self.format_number(row['landed_price']),
+                'msh_price': self.format_number(row['msh_price'])}
@@ -1,25 +1,107 @@
 import django_tables as tables
-from django.template.loader import render_to_string
+from django.template import Context
+from django.template.loader import get_template, render_to_string
 from django.conf import settings
+from django.utils.safestring import mark_safe
 import inspect
+
+compiled_templates = {}
+
+def get_compiled_template(name):
+    """
+    Returns the template called name, only loading and compiling it the
+    first time unless TEMPLATE_DEBUG is on, so that changes to it show up
+    while developing.
+    """
+    if settings.TEMPLATE_DEBUG:
+        return get_template(name)
+
+    if name not in compiled_templates:
+        compiled_templates[name] = get_template(name)
+
+    return compiled_templates[name]
+
 class SarpamTable(tables.MemoryTable):
+    """
+    Table of price rows. The rows are never modified, so the same rows can
+    be shared by several tables and graphs on a page; prices are rounded
+    as they are displayed instead.
+    """
     def abstract(self):
         caller = inspect.getouterframes(inspect.currentframe())[1][3]
         raise NotImplementedError(caller + ' must be implemented in subclass')
     
     NO_DATA = "--"
+
+    # Tables that can be rendered by as_compiled_html() name the template
+    # for it here and implement get_cells()
+    table_template = None
     
+    def get_rounded_value(self, value):
+        if value is None:
+            return self.NO_DATA
+
+        return round(float(value), settings.SARPAM_NUMBER_ROUNDING)
+
     def round_to_set_decimal_places(self, row, column):
-        value = row[column]
-                    
+        row[column] = self.get_rounded_value(row[column])
+
+    def format_number(self, value):
+        """
+        Returns value as the rows templates show it, marked safe as it
+        can't contain anything that needs escaping.
+        """
         if value is None:
-            value = self.NO_DATA
-        else:
-            value = round(float(value), settings.SARPAM_NUMBER_ROUNDING)
-         
-        row[column] = value
+            return mark_safe(self.NO_DATA)
+
+        return mark_safe(("%" + settings.SARPAM_NUMBER_FORMAT) %
+                         round(float(value), settings.SARPAM_NUMBER_ROUNDING))
+
+    def render_fob_price(self, row):
+        return self.get_rounded_value(row['fob_price'])
+
+    def render_landed_price(self, row):
+        return self.get_rounded_value(row['landed_price'])
+
+    def _build_snapshot(self):
+        # MemoryTable fills in missing values by writing to the rows, and
+        # sorts missing values first. Instead leave the rows alone, and sort
+        # missing values last as they were when they were stored as NO_DATA.
+        self._columns._reset()
+        self._rows._reset()
+
+        snapshot = list(self._data)
+
+        if self.order_by:
+            order_by = self._resolve_sort_directions(self.order_by)
+
+            for field in reversed(self._cols_to_fields(order_by)):
+                name = field.lstrip('-')
+                snapshot.sort(key=lambda row: (row[name] is None, row[name]),
+                              reverse=field.startswith('-'))
+
+        return snapshot
 
     def as_html(self):
+        if settings.SARPAM_COMPILED_TABLES and self.table_template:
+            return self.as_compiled_html()
+
+        return self.as_template_html()
+
+    def as_compiled_html(self):
+        """
+        Renders the same table as as_template_html(), but from rows of
+        ready formatted cells and a template compiled once, rather than
+        through django_tables and the rows template.
+        """
+        rows = [self.get_cells(row) for row in self._build_snapshot()]
+        headings = [unicode(column) for column in self.columns]
+
+        template = get_compiled_template(self.table_template)
+
+        return template.render(Context({'headings': headings, 'rows': rows}))
+
+    def as_template_html(self):
         extra_context = {
             'sarpam_number_format':settings.SARPAM_NUMBER_FORMAT,
             'sarpam_number_rounding':settings.SARPAM_NUMBER_ROUNDING,
@@ -30,3 +112,9 @@ class SarpamTable(tables.MemoryTable):
 
     def get_rows_template(self):
         self.abstract()
+
+    def get_cells(self, row):
+        """
+        Returns the cells table_template shows for row.
+        """
+        self.abstract()
@@ -0,0 +1,57 @@
+import imp
+
+from django.conf import settings
+
+from sarpaminfohub.infohub.fixture_loader import BulkFixtureLoader
+from sarpaminfohub.infohub.formulation_index import FormulationIndex
+from sarpaminfohub.infohub.price_summaries import PriceSummaryBuilder
+
+def load_scrape_script():
+    return imp.load_source('sarpaminfohub_scrape', settings.SARPAM_SCRAPE_SCRIPT)
+
+class ScrapeImporter(object):
+    """
+    Loads the file.db that scripts/scrape.py reads straight into the
+    database, without writing and reading JSON fixtures in between.
+
+    The records come from scrape.py itself, so they have the same
+    standardised names and primary keys as its fixtures, and are bulk
+    loaded as bulk_loaddata would load those.
+    """
+    def __init__(self, workers=1, quiet=False):
+        self.loader = BulkFixtureLoader()
+        self.workers = workers
+        self.quiet = quiet
+        self.num_indexed = 0
+        self.num_summaries = 0
+        self.missing_rates = set()
+
+    def import_data_dir(self, data_dir):
+        scrape = load_scrape_script()
+        self.loader.load_from(scrape.scrapeTo, data_dir, self,
+                              scrape.countKeys, self.workers, self.quiet)
+
+        # Bulk loading doesn't trigger the search index or price summary
+        # updates
+        self.num_indexed = FormulationIndex().rebuild_all()
+        builder = PriceSummaryBuilder()
+        self.num_summaries = len(builder.rebuild_all())
+        self.missing_rates = builder.missing_rates
+
+    # The rest are what scrape.py writes its fixtures with
+    # pylint: disable-msg=C0103
+
+    def open(self, name):
+        return self
+
+    def write(self, record):
+        self.loader.add_objects((record,))
+
+    def writeAll(self, name, records):
+        self.loader.add_objects(records)
+
+    def close(self):
+        pass
+
+    def finish(self):
+        self.loader.flush()
@@ -0,0 +1,332 @@
+"""
+A cache backend that keeps entries in a memory-mapped file, so every
+process on the host sees the same cache without a database round trip.
+Use it with
+
+    CACHE_BACKEND = 'sarpaminfohub.infohub.shared_memory_cache:///path/to/file'
+
+or without a path to use the SARPAM_SHARED_CACHE_PATH setting.
+
+The file is split into max_entries fixed-size slots (slot_size bytes each,
+including a small header), grouped into sets of WAYS slots. A key can only
+live in the set its hash picks, and when the set is full the least
+recently used entry in it is replaced. Values too big for a slot aren't
+cached, as with memcached's item size limit.
+
+Timeouts behave like Django's other backends: None means the default
+timeout and 0 means the entry has already expired.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.utils.encoding import smart_str
+from django.utils.hashcompat import md5_constructor
+
+MAGIC = "SARPAMC1"
+
+# magic, max_entries, slot_size
+FILE_HEADER = struct.Struct("<8sII")
+
+# key digest, expiry time, last used time, value length
+SLOT_HEADER = struct.Struct("<16sddI")
+
+WAYS = 8
+
+EMPTY_DIGEST = "\0" * 16
+
+# The web server and the deploy commands may run as different users in the
+# same group, and they all need to write to the file
+FILE_MODE = 0660
+
+class CacheClass(BaseCache):
+    def __init__(self, path, params):
+        BaseCache.__init__(self, params)
+
+        self._max_entries = self._get_int_param(params, 'max_entries', 512)
+        self._slot_size = self._get_int_param(params, 'slot_size', 256 * 1024)
+
+        # Every set must be complete
+        self._num_sets = max(1, (self._max_entries + WAYS - 1) // WAYS)
+        self._max_entries = self._num_sets * WAYS
+
+        self._set_size = self._slot_size * WAYS
+        self._size = FILE_HEADER.size + self._num_sets * self._set_size
+
+        self._path = path or settings.SARPAM_SHARED_CACHE_PATH
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+
+    def _get_int_param(self, params, name, default):
+        try:
+            return int(params.get(name, default))
+        except (ValueError, TypeError):
+            return default
+
+    def _open(self):
+        # Opened lazily so that processes forked after settings are loaded
+        # get their own file descriptor and locks
+        if self._map is not None:
+            return
+
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        expected = FILE_HEADER.pack(MAGIC, self._max_entries,
+                                    self._slot_size)
+
+        while self._map is None:
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT, FILE_MODE)
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+
+            try:
+                # Another process may have put a new file in place while
+                # this one waited for the lock, in which case that's opened
+                # instead
+                if not self._is_replaced(fd):
+                    header = os.read(fd, FILE_HEADER.size)
+
+                    if header == expected:
+                        self._map = mmap.mmap(fd, self._size)
+                        self._fd = fd
+                    else:
+                        # New, or created with different settings. Other
+                        # processes may still have it mapped, and emptying
+                        # it in place would crash them, so it's replaced
+                        self._create_file(directory, expected)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+
+                if self._fd != fd:
+                    os.close(fd)
+
+    def _is_replaced(self, fd):
+        try:
+            current = os.stat(self._path)
+        except OSError:
+            return True
+
+        opened = os.fstat(fd)
+        return (opened.st_dev, opened.st_ino) != \
+            (current.st_dev, current.st_ino)
+
+    def _create_file(self, directory, header):
+        """
+        Writes an empty cache file next to the path and renames it into
+        place.
+        """
+        (fd, temp_path) = tempfile.mkstemp(dir=directory or os.curdir,
+                                           prefix=".tmp")
+        try:
+            try:
+                # mkstemp only lets the owner use the file
+                os.fchmod(fd, FILE_MODE)
+                os.ftruncate(fd, self._size)
+                os.write(fd, header)
+            finally:
+                os.close(fd)
+
+            os.rename(temp_path, self._path)
+        except: # pylint: disable-msg=W0702
+            os.remove(temp_path)
+            raise
+
+    def _get_digest(self, key):
+        return md5_constructor(smart_str(key)).digest()
+
+    def _get_set_offset(self, digest):
+        set_number = struct.unpack("<I", digest[:4])[0] % self._num_sets
+        return FILE_HEADER.size + set_number * self._set_size
+
+    def _locked(self, key, function, *args):
+        """
+        Calls function with the digest of key and the offset of its set
+        while holding the set's lock in this process and on the file.
+        """
+        self.validate_key(key)
+        digest = self._get_digest(key)
+
+        self._lock.acquire()
+        try:
+            self._open()
+            offset = self._get_set_offset(digest)
+
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._set_size, offset)
+            try:
+                return function(digest, offset, *args)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._set_size, offset)
+        finally:
+            self._lock.release()
+
+    def _read_slot_header(self, slot_offset):
+        return SLOT_HEADER.unpack_from(self._map, slot_offset)
+
+    def _find(self, digest, offset, now):
+        """
+        Returns the offset of the live slot holding digest, or None.
+        """
+        for slot_offset in range(offset, offset + self._set_size,
+                                 self._slot_size):
+            (slot_digest, expires, _, _) = self._read_slot_header(slot_offset)
+
+            if slot_digest == digest:
+                if expires > now:
+                    return slot_offset
+
+                return None
+
+        return None
+
+    def _choose_slot(self, digest, offset, now):
+        """
+        Returns the slot to store digest in: the one it is already in, else
+        an empty or expired one, else the least recently used.
+        """
+        best_offset = None
+        best_last_used = None
+
+        for slot_offset in range(offset, offset + self._set_size,
+                                 self._slot_size):
+            (slot_digest, expires, last_used, _) = \
+                self._read_slot_header(slot_offset)
+
+            if slot_digest == digest:
+                return slot_offset
+
+            if slot_digest == EMPTY_DIGEST or expires <= now:
+                last_used = -1.0
+
+            if best_last_used is None or last_used < best_last_used:
+                best_offset = slot_offset
+                best_last_used = last_used
+
+        return best_offset
+
+    def _clear_slot(self, slot_offset):
+        self._map[slot_offset:slot_offset + SLOT_HEADER.size] = \
+            SLOT_HEADER.pack(EMPTY_DIGEST, 0.0, 0.0, 0)
+
+    def _get(self, digest, offset, default):
+        now = time.time()
+        slot_offset = self._find(digest, offset, now)
+
+        if slot_offset is None:
+            return default
+
+        (_, expires, _, length) = self._read_slot_header(slot_offset)
+        start = slot_offset + SLOT_HEADER.size
+
+        try:
+            value = pickle.loads(self._map[start:start + length])
+        except (pickle.PickleError, EOFError, ValueError):
+            self._clear_slot(slot_offset)
+            return default
+
+        self._map[slot_offset:slot_offset + SLOT_HEADER.size] = \
+            SLOT_HEADER.pack(digest, expires, now, length)
+
+        return value
+
+    def _set(self, digest, offset, value, timeout):
+        if timeout is None:
+            timeout = self.default_timeout
+
+        try:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except pickle.PickleError:
+            data = None
+
+        if data is None or len(data) > self._slot_size - SLOT_HEADER.size:
+            # Don't leave an old value behind
+            self._delete(digest, offset)
+            return False
+
+        now = time.time()
+        slot_offset = self._choose_slot(digest, offset, now)
+
+        # Cleared first so a half written value is never read
+        self._clear_slot(slot_offset)
+
+        start = slot_offset + SLOT_HEADER.size
+        self._map[start:start + len(data)] = data
+        self._map[slot_offset:slot_offset + SLOT_HEADER.size] = \
+            SLOT_HEADER.pack(digest, now + timeout, now, len(data))
+
+        return True
+
+    def _add(self, digest, offset, value, timeout):
+        if self._find(digest, offset, time.time()) is not None:
+            return False
+
+        return self._set(digest, offset, value, timeout)
+
+    def _delete(self, digest, offset):
+        for slot_offset in range(offset, offset + self._set_size,
+                                 self._slot_size):
+            if self._read_slot_header(slot_offset)[0] == digest:
+                self._clear_slot(slot_offset)
+
+    def _incr(self, digest, offset, delta):
+        now = time.time()
+        slot_offset = self._find(digest, offset, now)
+
+        if slot_offset is None:
+            raise ValueError("Key not found")
+
+        (_, expires, _, _) = self._read_slot_header(slot_offset)
+        value = self._get(digest, offset, None)
+
+        if value is None:
+            raise ValueError("Key not found")
+
+        value += delta
+        self._set(digest, offset, value, expires - now)
+
+        return value
+
+    def add(self, key, value, timeout=None):
+        return self._locked(key, self._add, value, timeout)
+
+    def get(self, key, default=None):
+        return self._locked(key, self._get, default)
+
+    def set(self, key, value, timeout=None):
+        self._locked(key, self._set, value, timeout)
+
+    def delete(self, key):
+        self._locked(key, self._delete)
+
+    def has_key(self, key):
+        return self._locked(key, self._find, time.time()) is not None
+
+    def incr(self, key, delta=1):
+        # Done under the lock so that concurrent increments aren't lost
+        return self._locked(key, self._incr, delta)
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._open()
+
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                for slot_offset in range(FILE_HEADER.size, self._size,
+                                         self._slot_size):
+                    self._clear_slot(slot_offset)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
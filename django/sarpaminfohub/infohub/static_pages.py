@@ -0,0 +1,361 @@
+"""
+Writes the formulation, formulation products, supplier catalogue and
+product pages out as HTML files, which Apache serves without going through
+Django (see apache/production.conf). Pages are still rendered by Django
+for any file that doesn't exist yet.
+
+Each page is keyed by a digest of the rows it shows, kept in a manifest
+alongside the pages, and only pages whose digest has changed since the
+last run are rendered again.
+
+Saving or deleting a row through the ORM, as the admin site does, removes
+the written pages that show it, so that Django renders them until they're
+written again.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.urlresolvers import reverse
+from django.test.client import Client
+from django.utils import simplejson
+
+from sarpaminfohub.infohub.django_backend import DjangoBackend
+from sarpaminfohub.infohub.models import Country, ExchangeRate, \
+    Formulation, Incoterm, Manufacturer, MSHPrice, Price, Product, \
+    ProductRegistration, Supplier
+from sarpaminfohub.infohub.response_cache import bump_data_version
+
+MANIFEST_NAME = "manifest.json"
+
+# Apache's group has to be able to remove pages when the admin site changes
+# the data behind them, and new directories take the group of their parent
+DIRECTORY_MODE = 02775
+
+# The view name and arguments of each kind of page, which is keyed by its
+# kind and the id of what it shows
+PAGE_URLS = {'formulation': ('formulation-by-id', [""]),
+             'formulation_products': ('formulation_products', [""]),
+             'supplier': ('suppliers', [""]),
+             'product': ('product-page', [])}
+
+def get_page_url(kind, object_id):
+    (view_name, extra_args) = PAGE_URLS[kind]
+    return reverse(view_name, args=[str(object_id)] + extra_args)
+
+def get_page_path(url):
+    """
+    Returns where the page at url is written, relative to the root. The
+    rewrite rules in apache/production.conf make the same mapping.
+    """
+    return url.strip("/") + ".html"
+
+class PageDigests(object):
+    """
+    Builds a digest of the rows behind each page.
+    """
+    def __init__(self):
+        self.hashes = {}
+
+    def add_page(self, kind, object_id):
+        self.hashes[(kind, object_id)] = hashlib.md5()
+
+    def add_row(self, kind, object_id, row):
+        # Rows for pages that don't exist, such as the prices of a
+        # formulation that has gone, are ignored
+        key = (kind, object_id)
+
+        if key in self.hashes:
+            self.hashes[key].update(repr(row))
+
+    def get_digests(self):
+        """
+        Returns the digest of each page, keyed by its URL.
+        """
+        return dict([(get_page_url(kind, object_id), digest.hexdigest())
+                     for ((kind, object_id), digest) in self.hashes.items()])
+
+# pylint: disable-msg=E1101
+def get_page_digests():
+    """
+    Returns the digest of each page, keyed by its URL, reading each table
+    once.
+    """
+    digests = PageDigests()
+
+    for (formulation_id, name) in Formulation.objects.values_list('id',
+                                                                  'name'):
+        for kind in ('formulation', 'formulation_products'):
+            digests.add_page(kind, formulation_id)
+            digests.add_row(kind, formulation_id, name)
+
+    for (supplier_id, name) in Supplier.objects.values_list('id', 'name'):
+        digests.add_page('supplier', supplier_id)
+        digests.add_row('supplier', supplier_id, name)
+
+    for row in Product.objects.values_list(
+            'id', 'name', 'packaging', 'unit_of_issue', 'who_prequalified',
+            'formulation__id', 'formulation__name',
+            'formulation__generic_name', 'formulation__strength'):
+        digests.add_page('product', row[0])
+        digests.add_row('product', row[0], row)
+
+    # Prices are shown in USD, so a new exchange rate can change any
+    # formulation page
+    rates = list(ExchangeRate.objects.order_by('id').values_list(
+        'symbol', 'year', 'rate'))
+
+    for formulation_id in Formulation.objects.values_list('id', flat=True):
+        digests.add_row('formulation', formulation_id, rates)
+
+    for row in MSHPrice.objects.values_list('formulation', 'price'):
+        digests.add_row('formulation', row[0], row)
+
+    for row in Price.objects.order_by('id').values_list(
+            'formulation', *DjangoBackend.PRICE_RECORD_FIELDS):
+        digests.add_row('formulation', row[0], row)
+
+    registrations = ProductRegistration.objects.order_by('id')
+
+    for row in registrations.values_list(
+            'product__formulation', 'product__id', 'product__name',
+            'supplier__id', 'supplier__name', 'manufacturer__name',
+            'country__name'):
+        digests.add_row('formulation_products', row[0], row)
+        digests.add_row('product', row[1], row)
+
+    for row in registrations.values_list(
+            'supplier', *DjangoBackend.SUPPLIER_REGISTRATION_FIELDS):
+        digests.add_row('supplier', row[0], row)
+
+    return digests.get_digests()
+
+def get_pages_of_registrations(registrations):
+    pages = set()
+
+    for (product_id, formulation_id, supplier_id) in \
+            registrations.values_list('product', 'product__formulation',
+                                      'supplier'):
+        pages.add(('product', product_id))
+        pages.add(('formulation_products', formulation_id))
+
+        if supplier_id is not None:
+            pages.add(('supplier', supplier_id))
+
+    return pages
+
+def get_pages_of_prices(prices):
+    return set([('formulation', formulation_id) for formulation_id in
+                prices.values_list('formulation', flat=True)])
+
+# pylint: disable-msg=E1101
+def get_pages_showing(instance):
+    """
+    Returns the kind and id of each page that shows instance, one of the
+    rows get_page_digests() reads or refers to.
+    """
+    registrations = ProductRegistration.objects
+    prices = Price.objects
+
+    if isinstance(instance, Formulation):
+        return set([('formulation', instance.pk),
+                    ('formulation_products', instance.pk)] +
+                   [('product', product_id) for product_id in
+                    Product.objects.filter(formulation=instance.pk).values_list(
+                        'id', flat=True)]) | \
+            get_pages_of_registrations(registrations.filter(
+                product__formulation=instance.pk))
+
+    if isinstance(instance, (Price, MSHPrice)):
+        return set([('formulation', instance.formulation_id)])
+
+    if isinstance(instance, ExchangeRate):
+        return set([('formulation', formulation_id) for formulation_id in
+                    Formulation.objects.values_list('id', flat=True)])
+
+    if isinstance(instance, Product):
+        return set([('product', instance.pk),
+                    ('formulation_products', instance.formulation_id)]) | \
+            get_pages_of_registrations(registrations.filter(
+                product=instance.pk))
+
+    if isinstance(instance, ProductRegistration):
+        # Read from the instance, as the row may have gone
+        pages = set([('product', instance.product_id)])
+        pages.update([('formulation_products', formulation_id)
+                      for formulation_id in Product.objects.filter(
+                          id=instance.product_id).values_list(
+                              'formulation', flat=True)])
+
+        if instance.supplier_id is not None:
+            pages.add(('supplier', instance.supplier_id))
+
+        return pages
+
+    if isinstance(instance, Supplier):
+        return set([('supplier', instance.pk)]) | \
+            get_pages_of_registrations(registrations.filter(
+                supplier=instance.pk)) | \
+            get_pages_of_prices(prices.filter(supplier=instance.pk))
+
+    if isinstance(instance, Manufacturer):
+        return get_pages_of_registrations(registrations.filter(
+            manufacturer=instance.pk))
+
+    if isinstance(instance, Country):
+        return get_pages_of_registrations(registrations.filter(
+            country=instance.pk)) | \
+            get_pages_of_prices(prices.filter(country=instance.pk)) | \
+            get_pages_of_prices(prices.filter(
+                manufacture_country=instance.pk)) | \
+            get_pages_of_prices(prices.filter(supplier_country=instance.pk))
+
+    if isinstance(instance, Incoterm):
+        return get_pages_of_prices(prices.filter(incoterm=instance.pk))
+
+    return set()
+
+def remove_pages_showing(instance, stored=False):
+    """
+    Removes the written pages that show instance, or if stored is True the
+    row instance was read from as it is in the database, so that a page
+    showing a row that has moved elsewhere is removed too.
+    """
+    root = settings.SARPAM_STATIC_PAGES_ROOT
+
+    if not os.path.isdir(root):
+        return
+
+    if stored:
+        if instance.pk is None:
+            return
+
+        try:
+            # pylint: disable-msg=W0212
+            instance = instance.__class__._default_manager.get(pk=instance.pk)
+        except ObjectDoesNotExist:
+            return
+
+    writer = StaticPageWriter(root)
+
+    for (kind, object_id) in get_pages_showing(instance):
+        writer.remove_page(get_page_url(kind, object_id))
+
+def update_static_pages():
+    """
+    Writes the pages whose data has changed, if render_static_pages has
+    been run before. Returns the writer, or None if it hasn't.
+    """
+    root = settings.SARPAM_STATIC_PAGES_ROOT
+
+    if not os.path.isdir(root):
+        return None
+
+    writer = StaticPageWriter(root)
+    writer.write_all()
+
+    return writer
+
+class StaticPageWriter(object):
+    def __init__(self, root):
+        self.root = root
+        self.client = Client()
+        self.num_written = 0
+        self.num_unchanged = 0
+        self.num_removed = 0
+
+    def get_filename(self, url):
+        return os.path.join(self.root, *get_page_path(url).split("/"))
+
+    def write_all(self, rebuild_all=False):
+        """
+        Writes the pages whose data has changed since the last run, or every
+        page if rebuild_all is True, and removes the pages of anything that
+        has been deleted.
+        """
+        digests = get_page_digests()
+        old_digests = self.read_manifest()
+
+        changed = [url for url in sorted(digests)
+                   if rebuild_all or digests[url] != old_digests.get(url) or
+                   not os.path.exists(self.get_filename(url))]
+
+        if changed:
+            # A cached response could predate the change, as loading
+            # fixtures doesn't bump the data version until it is committed
+            bump_data_version()
+
+        for url in changed:
+            self.write_page(url)
+
+        self.num_unchanged = len(digests) - len(changed)
+
+        for url in old_digests:
+            if url not in digests:
+                self.remove_page(url)
+
+        self.write_file(os.path.join(self.root, MANIFEST_NAME),
+                        simplejson.dumps(digests, sort_keys=True, indent=0))
+
+    def read_manifest(self):
+        filename = os.path.join(self.root, MANIFEST_NAME)
+
+        if not os.path.exists(filename):
+            return {}
+
+        manifest_file = open(filename, 'rb')
+        try:
+            return simplejson.load(manifest_file)
+        finally:
+            manifest_file.close()
+
+    def render(self, url):
+        response = self.client.get(url)
+
+        if response.status_code != 200:
+            raise ValueError("%s returned status %d" % (url,
+                                                        response.status_code))
+
+        return response.content
+
+    def write_page(self, url):
+        self.write_file(self.get_filename(url), self.render(url))
+        self.num_written += 1
+
+    def write_file(self, filename, content):
+        """
+        Writes content to a temporary file next to filename and renames it
+        into place, so that Apache never serves a half written page.
+        """
+        directory = os.path.dirname(filename)
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+            # Not left to the umask
+            os.chmod(directory, DIRECTORY_MODE)
+
+        (handle, temp_filename) = tempfile.mkstemp(dir=directory,
+                                                   prefix=".tmp")
+        try:
+            temp_file = os.fdopen(handle, 'wb')
+            try:
+                temp_file.write(content)
+            finally:
+                temp_file.close()
+
+            # mkstemp only lets the owner read the file
+            os.chmod(temp_filename, 0644)
+            os.rename(temp_filename, filename)
+        except: # pylint: disable-msg=W0702
+            os.remove(temp_filename)
+            raise
+
+    def remove_page(self, url):
+        filename = self.get_filename(url)
+
+        if os.path.exists(filename):
+            os.remove(filename)
+
+        self.num_removed += 1
@@ -1,5 +1,6 @@
 # -*- coding: iso-8859-15 -*-
 from sarpaminfohub.infohub.backend import Backend
+from sarpaminfohub.infohub.price_record import PriceRecord
 
 class TestBackend(Backend):
     def get_amitriptyline(self):
@@ -45,17 +46,15 @@ class TestBackend(Backend):
         
         url = "/formulation/%d/" % formulation_id
         
-        return {'formulation':name, 'country':country, 'fob_price': fob_price,
-                'fob_currency':currency, 'period':period, 
-                'issue_unit':issue_unit, 'landed_price':landed_price, 
-                'msh_price':msh_price,
-                'landed_currency':currency,
-                'url':url,
-                'incoterm':incoterm,
-                'supplier':supplier,
-                'supplier_country':supplier_country,
-                'manufacture_country':manufacture_country,
-                'volume':volume}
+        return PriceRecord(formulation=name, country=country,
+                           fob_price=fob_price, fob_currency=currency,
+                           period=period, issue_unit=issue_unit,
+                           landed_price=landed_price, msh_price=msh_price,
+                           landed_currency=currency, url=url,
+                           incoterm=incoterm, supplier=supplier,
+                           supplier_country=supplier_country,
+                           manufacture_country=manufacture_country,
+                           volume=volume)
     
     def get_amoxycillin125_for_country(self, country, 
                                        fob_price=None, 
@@ -146,6 +145,30 @@ class TestBackend(Backend):
     def get_formulation_msh_with_id(self, formulation_id):
         return 0.0057
 
+    def get_formulation_with_id(self, formulation_id):
+        return {'name': self.get_formulation_name_with_id(formulation_id),
+                'msh_price': self.get_formulation_msh_with_id(formulation_id),
+                'prices': self.get_prices_for_formulation_with_id(formulation_id)}
+
+    def get_for_each_id(self, function, ids):
+        return dict([(int(i), function(i)) for i in ids])
+
+    def get_formulation_names_with_ids(self, formulation_ids):
+        return self.get_for_each_id(self.get_formulation_name_with_id,
+                                    formulation_ids)
+
+    def get_formulation_mshs_with_ids(self, formulation_ids):
+        return self.get_for_each_id(self.get_formulation_msh_with_id,
+                                    formulation_ids)
+
+    def get_prices_for_formulations_with_ids(self, formulation_ids):
+        return self.get_for_each_id(self.get_prices_for_formulation_with_id,
+                                    formulation_ids)
+
+    def get_names_of_suppliers_with_ids(self, supplier_ids):
+        return self.get_for_each_id(self.get_name_of_supplier_with_id,
+                                    supplier_ids)
+
     def get_product_registrations_based_on_formulation_with_id(self,
                                                                formulation_id):
         return self.get_amitrilon25_registrations()        
@@ -160,8 +183,12 @@ class TestBackend(Backend):
         return products
 
     def get_registrations_from_supplier_with_id(self, supplier_id):
-        return [reg for reg in self.get_amitrilon25_registrations()
-            if reg['supplier']['id'] == 1]
+        return [{'product': reg['product']['name'],
+                 'country': reg['country']['name'],
+                 'formulation_id': reg['product']['formulation']['id'],
+                 'formulation_name': reg['product']['formulation']['name']}
+                for reg in self.get_amitrilon25_registrations()
+                if reg['supplier']['id'] == 1]
 
     def get_amitrilon25_registrations(self):
         afrifarmacia = {'id': 1,
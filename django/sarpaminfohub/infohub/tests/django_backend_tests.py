@@ -2,7 +2,7 @@ from sarpaminfohub.infohub.django_backend import DjangoBackend
 from decimal import Decimal
 from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
 from sarpaminfohub.infohub.models import Country, Supplier, Manufacturer,\
-    ProductRegistration, Price, Formulation
+    ProductRegistration, Price, Formulation, Incoterm
 from django.core.urlresolvers import reverse
 
 class DjangoBackendTest(SarpamTestCase):
@@ -117,6 +117,46 @@ class DjangoBackendTest(SarpamTestCase):
         row = self.get_first_row_of_prices_for_formulation(ciprofloxacin)
         self.assertEquals(10000, row['volume'])        
 
+    def test_matching_records_same_as_price_records(self):
+        self.set_up_msh_for_ciprofloxacin()
+        self.set_up_fully_populated_ciprofloxacin_prices(1)
+
+        # pylint:disable-msg=E1101
+        expected_records = [price.get_record() for price in
+            Price.objects.filter(formulation=self.ciprofloxacin)]
+        records = self.backend.get_formulations_that_match("ciprofloxacin")
+
+        self.assertEquals(expected_records, records)
+
+    def test_number_of_queries_independent_of_number_of_matches(self):
+        self.set_up_msh_for_ciprofloxacin()
+        single_match_queries = self.count_queries(
+            self.backend.get_formulations_that_match, "ciprofloxacin")
+
+        self.set_up_fully_populated_ciprofloxacin_prices(10)
+
+        many_match_queries = self.count_queries(
+            self.backend.get_formulations_that_match, "ciprofloxacin")
+
+        self.assertEquals(4, single_match_queries)
+        self.assertEquals(single_match_queries, many_match_queries)
+
+    def set_up_fully_populated_ciprofloxacin_prices(self, count):
+        nibia = self.set_up_and_return_nibia()
+        samgala = self.set_up_and_return_samgala()
+        camox = self.set_up_and_return_camox()
+        # pylint:disable-msg=E1101
+        incoterm = Incoterm.objects.get(name="CIF")
+
+        for _ in range(count):
+            price = Price(formulation=self.ciprofloxacin, country=nibia,
+                          fob_price=Decimal("1.5"), fob_currency='NAD',
+                          landed_price=Decimal("1.75"), landed_currency='NAD',
+                          period=2009, issue_unit=100, incoterm=incoterm,
+                          supplier=camox, supplier_country=samgala,
+                          manufacture_country=nibia, volume=10000)
+            price.save()
+
     def test_formulation_name_can_be_retrieved_by_id(self):
         name = self.backend.get_formulation_name_with_id(self.ciprofloxacin.id)
         self.assertEquals("ciprofloxacin 500mg tablet", name)
@@ -127,6 +167,89 @@ class DjangoBackendTest(SarpamTestCase):
         self.assertEquals(self.expected_ciprofloxacin_results['msh_price'], 
                           msh_price)
 
+    def test_formulation_bundle_matches_separate_lookups(self):
+        self.set_up_msh_for_ciprofloxacin()
+        formulation = self.backend.get_formulation_with_id(self.ciprofloxacin.id)
+
+        self.assertEquals(
+            self.backend.get_formulation_name_with_id(self.ciprofloxacin.id),
+            formulation['name'])
+        self.assertEquals(
+            self.backend.get_formulation_msh_with_id(self.ciprofloxacin.id),
+            formulation['msh_price'])
+        self.assertEquals(
+            self.backend.get_prices_for_formulation_with_id(self.ciprofloxacin.id),
+            formulation['prices'])
+
+    def test_formulation_bundle_without_prices_has_name_and_msh(self):
+        self.set_up_msh_for_ciprofloxacin()
+        Price.objects.all().delete()
+        formulation = self.backend.get_formulation_with_id(self.ciprofloxacin.id)
+
+        self.assertEquals("ciprofloxacin 500mg tablet", formulation['name'])
+        self.assertEquals(self.expected_ciprofloxacin_results['msh_price'],
+                          formulation['msh_price'])
+        self.assertEquals([], formulation['prices'])
+
+    def test_formulation_bundle_read_in_two_queries(self):
+        self.set_up_msh_for_ciprofloxacin()
+        num_queries = self.count_queries(self.backend.get_formulation_with_id,
+                                         self.ciprofloxacin.id)
+        self.assertEquals(2, num_queries)
+
+    def set_up_and_return_unpriced_formulation(self):
+        paracetamol = Formulation(name="paracetamol 500mg tablet")
+        paracetamol.save()
+
+        return paracetamol
+
+    def test_formulation_names_retrieved_by_ids(self):
+        paracetamol = self.set_up_and_return_unpriced_formulation()
+        names = self.backend.get_formulation_names_with_ids(
+            [self.ciprofloxacin.id, paracetamol.id, 9999])
+
+        self.assertEquals({self.ciprofloxacin.id: "ciprofloxacin 500mg tablet",
+                           paracetamol.id: "paracetamol 500mg tablet"}, names)
+
+    def test_formulation_mshs_retrieved_by_ids(self):
+        self.set_up_msh_for_ciprofloxacin()
+        paracetamol = self.set_up_and_return_unpriced_formulation()
+        msh_prices = self.backend.get_formulation_mshs_with_ids(
+            [self.ciprofloxacin.id, paracetamol.id, 9999])
+
+        self.assertEquals(
+            {self.ciprofloxacin.id: self.expected_ciprofloxacin_results['msh_price'],
+             paracetamol.id: None}, msh_prices)
+
+    def test_prices_for_formulations_retrieved_by_ids(self):
+        self.set_up_fully_populated_ciprofloxacin_prices(3)
+        paracetamol = self.set_up_and_return_unpriced_formulation()
+        prices = self.backend.get_prices_for_formulations_with_ids(
+            [self.ciprofloxacin.id, paracetamol.id])
+
+        self.assertEquals(
+            {self.ciprofloxacin.id:
+                self.backend.get_prices_for_formulation_with_id(self.ciprofloxacin.id),
+             paracetamol.id: []}, prices)
+
+    def test_prices_for_formulations_read_in_fixed_number_of_queries(self):
+        self.set_up_fully_populated_ciprofloxacin_prices(10)
+        paracetamol = self.set_up_and_return_unpriced_formulation()
+        num_queries = self.count_queries(
+            self.backend.get_prices_for_formulations_with_ids,
+            [self.ciprofloxacin.id, paracetamol.id])
+
+        self.assertEquals(3, num_queries)
+
+    def test_supplier_names_retrieved_by_ids(self):
+        biotech = self.set_up_and_return_biotech_labs()
+        camox = self.set_up_and_return_camox()
+        names = self.backend.get_names_of_suppliers_with_ids([biotech.id,
+                                                              camox.id])
+
+        self.assertEquals({biotech.id: "Biotech Laboratories",
+                           camox.id: "Camox Pharmaceuticals (Pty) Ltd"}, names)
+
     def test_ciprofloxacin_product_can_be_retrieved_by_id(self):
         self.set_up_minimal_biofloxx_registrations()
         registrations = self.get_product_registrations_based_on_ciprofloxacin()
@@ -215,6 +338,51 @@ class DjangoBackendTest(SarpamTestCase):
         
         self.assertEquals(expected_products, products)
     
+    def test_supplier_catalogue_has_flat_registration_rows(self):
+        self.set_up_biofloxx_registrations_with_suppliers_and_manufacturers()
+        (supplier_name, registrations) = \
+            self.backend.get_supplier_catalogue_with_id(self.biotech_labs.id)
+
+        biofloxx = {'product': "BIOFLOXX 500 MG",
+                    'country': "Nibia",
+                    'formulation_id': self.ciprofloxacin.id,
+                    'formulation_name': "ciprofloxacin 500mg tablet"}
+
+        self.assertEquals("Biotech Laboratories", supplier_name)
+        self.assertEquals([biofloxx], registrations)
+
+    def test_supplier_catalogue_read_in_one_query(self):
+        self.set_up_biofloxx_registrations_with_suppliers_and_manufacturers()
+
+        for _ in range(10):
+            self.set_up_biofloxx_registration(manufacturer=None,
+                                              supplier=self.biotech_labs,
+                                              country=Country.objects.get(code='SM'))
+
+        num_queries = self.count_queries(
+            self.backend.get_supplier_catalogue_with_id, self.biotech_labs.id)
+        self.assertEquals(1, num_queries)
+
+    def test_formulation_registrations_read_in_one_query(self):
+        self.set_up_biofloxx_registrations_with_suppliers_and_manufacturers()
+
+        for _ in range(10):
+            self.set_up_biofloxx_registration(manufacturer=None,
+                                              supplier=self.camox,
+                                              country=Country.objects.get(code='SM'))
+
+        num_queries = self.count_queries(
+            self.get_product_registrations_based_on_ciprofloxacin)
+        self.assertEquals(1, num_queries)
+
+    def test_supplier_with_no_registrations_still_named(self):
+        biotech = self.set_up_and_return_biotech_labs()
+        (supplier_name, registrations) = \
+            self.backend.get_supplier_catalogue_with_id(biotech.id)
+
+        self.assertEquals("Biotech Laboratories", supplier_name)
+        self.assertEquals([], registrations)
+
     def get_product_registrations_based_on_ciprofloxacin(self):
         registrations = self.backend.get_product_registrations_based_on_formulation_with_id(self.ciprofloxacin.id)
         return registrations
@@ -1,5 +1,6 @@
 # -*- coding: iso-8859-15 -*-
 from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+from sarpaminfohub.infohub.backend_executor import BackendExecutor
 from sarpaminfohub.infohub.test_backend import TestBackend
 from sarpaminfohub.infohub.drug_searcher import DrugSearcher
 
@@ -53,10 +54,98 @@ class DrugSearcherTest(SarpamTestCase):
         self.assertEquals(fob_price_in_usd, row['fob_price'])
         self.assertEquals(landed_price_in_usd, row['landed_price'])
 
+    def test_dicts_converted_same_as_price_records(self):
+        self.set_up_exchange_rate_for_eur()
+        self.set_up_exchange_rate_for_nad()
+        self.set_up_exchange_rate_for_usd()
+
+        expected_rows = self.get_rows_to_convert()
+        self.drug_searcher.convert_all_prices_to_usd(expected_rows)
+
+        rows = [dict(row.items()) for row in self.get_rows_to_convert()]
+        self.drug_searcher.convert_all_prices_to_usd(rows)
+
+        self.assertEquals(expected_rows, rows)
+
+    def test_price_without_issue_unit_not_converted(self):
+        self.set_up_exchange_rate_for_nad()
+
+        row = TestBackend().get_amitriptyline_with_issue_unit_none()
+        self.drug_searcher.convert_all_prices_to_usd([row])
+
+        self.assertEquals(None, row['fob_price'])
+        self.assertEquals(None, row['landed_price'])
+
+    def test_rate_only_needed_for_rows_with_prices(self):
+        row = TestBackend().get_amitriptyline()
+        row['fob_price'] = None
+        row['landed_price'] = None
+
+        self.drug_searcher.convert_all_prices_to_usd([row])
+
+        self.assertEquals(None, row['fob_price'])
+
+    def get_rows_to_convert(self):
+        test_backend = TestBackend()
+        rows = test_backend.get_amox()
+        rows.append(test_backend.get_amitriptyline())
+        rows.append(test_backend.get_amitriptyline_with_issue_unit_none())
+
+        return rows
+
     def test_gets_formulation_name_from_backend_given_id(self):
         name = self.drug_searcher.get_formulation_name_with_id(1)
         self.assertEquals("amitriptyline 25mg tablet", name)
 
+    def test_formulation_bundle_matches_separate_lookups(self):
+        self.set_up_exchange_rate_for_nad()
+        self.set_up_exchange_rate_for_usd()
+
+        formulation = self.drug_searcher.get_formulation_with_id(1)
+
+        self.assertEquals("amitriptyline 25mg tablet", formulation['name'])
+        self.assertEquals(0.0057, formulation['msh_price'])
+        self.assertEquals(
+            self.drug_searcher.get_prices_for_formulation_with_id(1),
+            formulation['prices'])
+
+    def test_formulation_bundle_only_fetched_once(self):
+        self.set_up_exchange_rate_for_nad()
+        self.set_up_exchange_rate_for_usd()
+
+        first = self.drug_searcher.get_formulation_with_id(1)
+        second = self.drug_searcher.get_formulation_with_id("1")
+
+        self.assertTrue(first is second)
+
+    def test_supplier_names_retrieved_by_ids(self):
+        names = self.drug_searcher.get_names_of_suppliers_with_ids(["1", 2])
+        self.assertEquals({1: u"Afrif\xe1rmacia, Lda",
+                           2: u"Afrif\xe1rmacia, Lda"}, names)
+
+    def test_prices_for_formulations_converted_to_usd(self):
+        self.set_up_exchange_rate_for_nad()
+        self.set_up_exchange_rate_for_usd()
+
+        prices = self.drug_searcher.get_prices_for_formulations_with_ids([1])
+
+        self.assertEquals(
+            {1: self.drug_searcher.get_prices_for_formulation_with_id(1)},
+            prices)
+
+    def test_formulation_products_same_with_executor(self):
+        expected = self.drug_searcher.get_formulation_products_with_id(1)
+
+        executor = BackendExecutor(2)
+        try:
+            drug_searcher = DrugSearcher(TestBackend(), executor)
+            products = drug_searcher.get_formulation_products_with_id(1)
+        finally:
+            executor.close()
+
+        self.assertEquals("amitriptyline 25mg tablet", products[0])
+        self.assertEquals(expected, products)
+
     def get_formulations_that_match_amox(self):
         self.set_up_exchange_rate_for_eur()
         self.set_up_exchange_rate_for_nad()
@@ -1,6 +1,99 @@
+from django.db import connection
+
 from sarpaminfohub.infohub.currency_exchange import CurrencyExchange
+from sarpaminfohub.infohub.models import ExchangeRate
+from sarpaminfohub.infohub.response_cache import bump_data_version
 from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
 class ExchangeTest(SarpamTestCase):
     def test_currency_may_be_none(self):
         currency_exchange = CurrencyExchange()
-        currency_exchange.exchange(local_price=1, currency=None, year=2009)
\ No newline at end of file
+        currency_exchange.exchange(local_price=1, currency=None, year=2009)
+
+    def test_price_multiplied_by_rate_for_currency_and_year(self):
+        self.set_up_exchange_rate_for_usd()
+        currency_exchange = CurrencyExchange()
+        usd_price = currency_exchange.exchange(local_price=2, currency='USD',
+                                               year=2007)
+        self.assertAlmostEquals(2.06, usd_price)
+
+    def test_unknown_currency_raises_does_not_exist(self):
+        self.set_up_exchange_rate_for_usd()
+        currency_exchange = CurrencyExchange()
+        self.assertRaises(ExchangeRate.DoesNotExist, 
+                          currency_exchange.exchange, 
+                          local_price=1, currency='NAD', year=2009)
+
+    def test_rates_loaded_with_one_query_for_many_exchanges(self):
+        self.set_up_exchange_rate_for_usd()
+        self.set_up_exchange_rate_for_nad()
+
+        num_queries = self.count_queries(self.exchange_many_prices)
+        self.assertEquals(1, num_queries)
+
+    def exchange_many_prices(self):
+        for price in range(100):
+            CurrencyExchange().exchange(price, 'USD', 2009)
+            CurrencyExchange().exchange(price, 'NAD', 2009)
+
+    def test_saved_rate_used_for_next_exchange(self):
+        self.set_up_exchange_rate_for_usd()
+        currency_exchange = CurrencyExchange()
+        currency_exchange.exchange(local_price=1, currency='USD', year=2009)
+
+        self.set_up_exchange_rate_for_nad()
+        nad_price = currency_exchange.exchange(local_price=1, currency='NAD',
+                                               year=2009)
+        self.assertAlmostEquals(0.12314, nad_price)
+
+    def test_deleted_rate_not_used_for_next_exchange(self):
+        self.set_up_exchange_rate_for_nad()
+        currency_exchange = CurrencyExchange()
+        currency_exchange.exchange(local_price=1, currency='NAD', year=2009)
+
+        # pylint: disable-msg=E1101
+        ExchangeRate.objects.filter(symbol='NAD').delete()
+        self.assertRaises(ExchangeRate.DoesNotExist, 
+                          currency_exchange.exchange, 
+                          local_price=1, currency='NAD', year=2009)
+
+    def test_rate_added_elsewhere_found_without_signal(self):
+        self.set_up_exchange_rate_for_usd()
+        currency_exchange = CurrencyExchange()
+        currency_exchange.exchange(local_price=1, currency='USD', year=2009)
+
+        # As if saved by another process, whose signals aren't heard here
+        connection.cursor().execute(
+            "INSERT INTO infohub_exchangerate (symbol, rate, year) " +
+            "VALUES ('NAD', 0.12314, 2009)")
+
+        nad_price = currency_exchange.exchange(local_price=1, currency='NAD',
+                                               year=2009)
+        self.assertAlmostEquals(0.12314, nad_price)
+
+    def test_rates_reloaded_after_data_version_bumped(self):
+        self.set_up_exchange_rate_for_usd()
+        CurrencyExchange().exchange(local_price=1, currency='USD', year=2009)
+
+        connection.cursor().execute(
+            "UPDATE infohub_exchangerate SET rate = 2 " +
+            "WHERE symbol = 'USD' AND year = 2009")
+        bump_data_version()
+
+        usd_price = CurrencyExchange().exchange(local_price=1, currency='USD',
+                                                year=2009)
+        self.assertAlmostEquals(2, usd_price)
+
+    def test_rates_reloaded_once_for_missing_rate(self):
+        self.set_up_exchange_rate_for_usd()
+        currency_exchange = CurrencyExchange()
+        currency_exchange.exchange(local_price=1, currency='USD', year=2009)
+
+        num_queries = self.count_queries(self.exchange_missing_rate_twice,
+                                         currency_exchange)
+        self.assertEquals(1, num_queries)
+
+    def exchange_missing_rate_twice(self, currency_exchange):
+        for _ in range(2):
+            self.assertRaises(ExchangeRate.DoesNotExist,
+                              currency_exchange.exchange,
+                              local_price=1, currency='NAD', year=2009)
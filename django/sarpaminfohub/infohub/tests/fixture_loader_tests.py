@@ -0,0 +1,288 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.core import serializers
+from django.core.management import call_command
+
+from sarpaminfohub.infohub.fixture_loader import BulkFixtureLoader, \
+    FixtureDeltaLoader, iter_json_array
+from sarpaminfohub.infohub.formulation_index import FormulationIndex
+from sarpaminfohub.infohub.models import Country, ExchangeRate, \
+    Formulation, FormulationTrigram, Incoterm, Manufacturer, MSHPrice, \
+    Price, PriceSummary, Product, ProductRegistration, Supplier
+from sarpaminfohub.infohub.price_summaries import PriceSummaryBuilder
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class StatementCursor(object):
+    """
+    Records the statements a BulkFixtureLoader would send to MySQL.
+    """
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, parameters=None):
+        if parameters is not None:
+            sql = "%s %s" % (sql, parameters)
+
+        self.statements.append(sql)
+
+    def fetchone(self):
+        return ('STRICT_TRANS_TABLES',)
+
+class MySQLStatementLoader(BulkFixtureLoader):
+    def __init__(self):
+        BulkFixtureLoader.__init__(self)
+        self.cursor = StatementCursor()
+
+    def is_using(self, engine):
+        return engine == 'mysql'
+
+class FixtureLoaderTest(SarpamTestCase):
+    # In the order they're dumped to fixtures
+    MODELS = (Country, Incoterm, Formulation, MSHPrice, Price)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        self.set_up_and_return_drc_ciprofloxacin(volume=1000)
+        self.set_up_msh_for_ciprofloxacin()
+        # pylint: disable-msg=E1101
+        drc = Country.objects.get(code='CD')
+        Price.objects.create(formulation=self.ciprofloxacin, country=drc,
+                             period=2010, fob_price="0", volume=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def dump_all(self):
+        dumps = []
+
+        for model in self.MODELS:
+            # pylint: disable-msg=E1101
+            dumps.append(serializers.serialize('json',
+                                               model.objects.order_by('pk')))
+
+        return dumps
+
+    def write_fixtures(self):
+        filenames = []
+
+        for (i, dump) in enumerate(self.dump_all()):
+            filename = os.path.join(self.directory, "%02d_fixture.json" % i)
+            fixture_file = open(filename, 'w')
+            fixture_file.write(dump)
+            fixture_file.close()
+            filenames.append(filename)
+
+        return filenames
+
+    def delete_all(self):
+        for model in reversed(self.MODELS):
+            # pylint: disable-msg=E1101
+            model.objects.all().delete()
+
+    def test_bulk_load_gives_same_data_as_loaddata(self):
+        filenames = self.write_fixtures()
+
+        self.delete_all()
+        call_command('loaddata', *filenames, **{'verbosity': 0})
+        loaddata_dumps = self.dump_all()
+
+        self.delete_all()
+        BulkFixtureLoader().load(filenames)
+
+        self.assertEquals(loaddata_dumps, self.dump_all())
+
+    def test_bulk_load_replaces_existing_objects(self):
+        filenames = self.write_fixtures()
+        expected_dumps = self.dump_all()
+
+        self.ciprofloxacin.name = "ciprofloxacin 250mg tablet"
+        self.ciprofloxacin.save()
+        BulkFixtureLoader().load(filenames)
+
+        self.assertEquals(expected_dumps, self.dump_all())
+
+    def test_later_fixture_file_wins(self):
+        filenames = self.write_fixtures()
+        self.ciprofloxacin.name = "ciprofloxacin 250mg tablet"
+        self.ciprofloxacin.save()
+
+        later_filename = os.path.join(self.directory, "99_fixture.json")
+        later_file = open(later_filename, 'w')
+        later_file.write(serializers.serialize('json', [self.ciprofloxacin]))
+        later_file.close()
+
+        self.delete_all()
+        BulkFixtureLoader().load([later_filename] + filenames)
+
+        # pylint: disable-msg=E1101
+        self.assertEquals("ciprofloxacin 250mg tablet",
+                          Formulation.objects.get(pk=self.ciprofloxacin.pk).name)
+
+    def test_objects_counted_by_model(self):
+        filenames = self.write_fixtures()
+        self.delete_all()
+
+        loader = BulkFixtureLoader()
+        loader.load(filenames)
+
+        self.assertEquals(2, loader.counts[Price])
+        self.assertEquals(6, loader.get_num_objects())
+
+    def load_exchange_rates(self):
+        loader = BulkFixtureLoader()
+        loader.load_from(loader.load_objects,
+                         [{'model': 'infohub.exchangerate', 'pk': pk,
+                           'fields': {'symbol': symbol, 'year': 2009,
+                                      'rate': rate}}
+                          for (pk, symbol, rate) in ((0, 'EUR', 1.39071),
+                                                     (1, 'NAD', 0.12314))])
+
+    def test_zero_pk_kept_when_loaded_again(self):
+        self.load_exchange_rates()
+        self.load_exchange_rates()
+
+        # pylint: disable-msg=E1101
+        self.assertEquals([(0, 'EUR'), (1, 'NAD')],
+                          list(ExchangeRate.objects.order_by('pk').values_list(
+                              'pk', 'symbol')))
+
+    def test_mysql_told_to_keep_zero_pks_during_load(self):
+        loader = MySQLStatementLoader()
+        loader.load_from(lambda: None)
+
+        self.assertEquals(
+            ["SET FOREIGN_KEY_CHECKS = 0",
+             "SELECT @@SESSION.sql_mode",
+             "SET SESSION sql_mode = CONCAT_WS(',', @@SESSION.sql_mode, "
+             "'NO_AUTO_VALUE_ON_ZERO')",
+             "SET SESSION sql_mode = %s ['STRICT_TRANS_TABLES']",
+             "SET FOREIGN_KEY_CHECKS = 1"],
+            loader.cursor.statements)
+
+    def test_json_array_read_a_chunk_at_a_time(self):
+        json_file = StringIO('[{"pk": 1, "name": "caf\\u00e9"},\n'
+                             ' {"pk": 2, "name": "[x]"}]')
+        items = list(iter_json_array(json_file, chunk_size=5))
+
+        self.assertEquals([{"pk": 1, "name": u"caf\xe9"},
+                           {"pk": 2, "name": "[x]"}], items)
+
+    def test_truncated_json_array_raises_value_error(self):
+        json_file = StringIO('[{"pk": 1}, {"pk": 2')
+        self.assertRaises(ValueError, list, iter_json_array(json_file))
+
+class FixtureDeltaLoaderTest(SarpamTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        self.set_up_exchange_rate_for_eur()
+        self.set_up_exchange_rate_for_usd()
+        self.set_up_and_return_drc_ciprofloxacin()
+        self.set_up_msh_for_ciprofloxacin()
+
+        FormulationIndex().rebuild_all()
+        PriceSummaryBuilder().rebuild_all()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, contents):
+        filename = os.path.join(self.directory, name)
+        json_file = open(filename, 'w')
+        json_file.write(contents)
+        json_file.close()
+
+        return filename
+
+    def apply(self, changed_objects, deletes):
+        changes_filename = self.write_file(
+            "changes.json", serializers.serialize('json', changed_objects))
+        deletes_filename = self.write_file("deletes.json", deletes)
+
+        loader = FixtureDeltaLoader()
+        loader.apply(changes_filename, deletes_filename)
+
+        return loader
+
+    def get_price(self):
+        # pylint: disable-msg=E1101
+        return Price.objects.get(formulation=self.ciprofloxacin)
+
+    def test_changed_price_updates_price_summary(self):
+        price = self.get_price()
+        price.fob_price = "3.6"
+
+        loader = self.apply([price], "[]")
+
+        # pylint: disable-msg=E1101
+        summary = PriceSummary.objects.get(formulation=self.ciprofloxacin)
+        self.assertAlmostEquals(3.6 * 1.39071 / 100, summary.median_fob_price, 5)
+        self.assertEquals(1, loader.num_summaries_rebuilt)
+
+    def test_deleted_price_removes_price_summary(self):
+        loader = self.apply([], '[{"model": "infohub.price", "pk": %d}]' %
+                            self.get_price().pk)
+
+        # pylint: disable-msg=E1101
+        self.assertEquals(0, Price.objects.count())
+        self.assertEquals(0, PriceSummary.objects.count())
+        self.assertEquals(1, loader.get_num_deleted())
+
+    def test_renamed_formulation_is_reindexed(self):
+        self.ciprofloxacin.name = "amoxicillin 500mg tablet"
+
+        self.apply([self.ciprofloxacin], "[]")
+
+        # pylint: disable-msg=E1101
+        self.assertTrue(FormulationTrigram.objects.filter(
+            formulation=self.ciprofloxacin, trigram="amo").exists())
+        self.assertFalse(FormulationTrigram.objects.filter(
+            formulation=self.ciprofloxacin, trigram="cip").exists())
+
+    def test_deleted_formulation_leaves_nothing_behind(self):
+        deletes = '[{"model": "infohub.price", "pk": %d}, ' \
+            '{"model": "infohub.mshprice", "pk": %d}, ' \
+            '{"model": "infohub.formulation", "pk": %d}]' % \
+            (self.get_price().pk,
+             MSHPrice.objects.get(formulation=self.ciprofloxacin).pk,
+             self.ciprofloxacin.pk)
+
+        self.apply([], deletes)
+
+        # pylint: disable-msg=E1101
+        self.assertEquals(0, Formulation.objects.count())
+        self.assertEquals(0, FormulationTrigram.objects.count())
+        self.assertEquals(0, PriceSummary.objects.count())
+
+    def test_deleted_formulation_takes_its_msh_price(self):
+        deletes = '[{"model": "infohub.price", "pk": %d}, ' \
+            '{"model": "infohub.formulation", "pk": %d}]' % \
+            (self.get_price().pk, self.ciprofloxacin.pk)
+
+        self.apply([], deletes)
+
+        # pylint: disable-msg=E1101
+        self.assertEquals(0, MSHPrice.objects.count())
+        self.assertEquals(0, PriceSummary.objects.count())
+
+    def test_rows_deleted_before_the_rows_they_refer_to(self):
+        models = [Formulation, Supplier, Manufacturer, Product, MSHPrice,
+                  Price, ProductRegistration]
+        order = FixtureDeltaLoader().get_delete_order(models)
+
+        self.assertEquals(sorted(models), sorted(order))
+
+        for (child, parent) in ((ProductRegistration, Product),
+                                (ProductRegistration, Supplier),
+                                (ProductRegistration, Manufacturer),
+                                (Product, Formulation), (Price, Formulation),
+                                (Price, Supplier), (MSHPrice, Formulation)):
+            self.assertTrue(order.index(child) < order.index(parent))
+
+    def test_unknown_model_raises_value_error(self):
+        self.assertRaises(ValueError, self.apply, [],
+                          '[{"model": "infohub.nothing", "pk": 1}]')
@@ -1,4 +1,5 @@
-from sarpaminfohub.infohub.formulation_graph import FormulationGraph
+from sarpaminfohub.infohub.formulation_graph import FormulationGraph, \
+    get_scale_maximum
 from sarpaminfohub.infohub.tests.table_test_case import TableTestCase
 from decimal import Decimal
 import re
@@ -34,6 +35,18 @@ class FormulationGraphTest(TableTestCase):
         landed_price = float(self.get_nth_value(self.first_row, self.LANDED_PRICE_COLUMN))
         self.assertAlmostEquals(4.988, landed_price)
 
+    def test_rows_not_modified(self):
+        self.formulation_graph.as_html()
+        self.assertAlmostEquals(3.12345678, self.raw_data[0]['fob_price'])
+
+    def test_missing_price_displayed_as_empty(self):
+        test_graph = FormulationGraph([dict(fob_price = None,
+                                            landed_price = 4.12345678,
+                                            country = "Namibia")])
+        first_row = test_graph.rows[self.FIRST_ROW]
+        fob_price = self.get_nth_value(first_row, self.FOB_PRICE_COLUMN)
+        self.assertEquals("", fob_price)
+
     def test_max_price(self):
         # round up from 5.988 to 10
         self.assertAlmostEquals(10.0, self.formulation_graph.max_price)
@@ -154,3 +167,32 @@ class FormulationGraphTest(TableTestCase):
             (3.7854638 + 4.12345678) / 2.0, scale, 2)
         self.assertBar(html, "median_landed_price",
             (5.5367875 + 5.98765432) / 2.0, scale, 2)
+
+    def test_bar_widths_are_pixels_across_scale(self):
+        bar = self.formulation_graph.bars[self.FIRST_ROW]
+        # 3.123 and 4.988 out of 10
+        self.assertEquals(217, bar['fob_width'])
+        self.assertEquals(347, bar['landed_width'])
+
+    def test_missing_price_has_no_width(self):
+        test_graph = FormulationGraph([dict(fob_price = None,
+                                            landed_price = 4.12345678,
+                                            country = "Namibia")])
+        self.assertEquals(0, test_graph.bars[self.FIRST_ROW]['fob_width'])
+
+    def test_no_marker_for_missing_msh_price(self):
+        self.assertEquals(None, self.formulation_graph.msh_offset)
+
+    def test_scale_maximum_rounds_up_to_one_two_or_five(self):
+        self.assertAlmostEquals(0.0005, get_scale_maximum(0.0003))
+        self.assertAlmostEquals(0.5, get_scale_maximum(0.201))
+        self.assertAlmostEquals(2.0, get_scale_maximum(1.01))
+        self.assertAlmostEquals(1000.0, get_scale_maximum(501.0))
+
+    def test_svg_draws_bars_and_one_line_per_marker(self):
+        svg = FormulationGraph(self.raw_data, 2.5643865).as_svg()
+        self.assertTrue(self.contains(svg, "<svg"))
+        self.assertTrue(self.contains(svg, 'id="bar_1_fob"'))
+        self.assertTrue(self.contains(svg, 'id="bar_2_landed"'))
+        self.assertEquals(1, svg.count('class="msh_price marker"'))
+        self.assertEquals(1, svg.count('class="median_fob_price marker"'))
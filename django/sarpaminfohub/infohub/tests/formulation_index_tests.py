@@ -0,0 +1,53 @@
+from sarpaminfohub.infohub.formulation_index import FormulationIndex
+from sarpaminfohub.infohub.models import Formulation
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class FormulationIndexTest(SarpamTestCase):
+    def setUp(self):
+        self.index = FormulationIndex()
+        self.amoxycillin = self.set_up_and_return_formulation(
+            "amoxycillin 500mg tablet/capsule")
+        self.tamoxifen = self.set_up_and_return_formulation(
+            "tamoxifen 20mg tablet")
+        self.ciprofloxacin = self.set_up_and_return_formulation(
+            "ciprofloxacin 500mg tablet")
+
+    def set_up_and_return_formulation(self, name):
+        formulation = Formulation(name=name)
+        formulation.save()
+        return formulation
+
+    def test_names_containing_search_term_returned(self):
+        ids = self.index.search("500mg")
+        self.assertEquals(set([self.amoxycillin.id, self.ciprofloxacin.id]),
+                          set(ids))
+
+    def test_search_is_case_insensitive(self):
+        ids = self.index.search("CIPROFLOXACIN")
+        self.assertEquals([self.ciprofloxacin.id], ids)
+
+    def test_names_starting_with_search_term_returned_first(self):
+        ids = self.index.search("amox")
+        self.assertEquals([self.amoxycillin.id, self.tamoxifen.id], ids)
+
+    def test_misspelt_search_term_returns_similar_names(self):
+        ids = self.index.search("ciprofloxacine")
+        self.assertEquals([self.ciprofloxacin.id], ids)
+
+    def test_unrelated_search_term_returns_nothing(self):
+        ids = self.index.search("paracetamol")
+        self.assertEquals([], ids)
+
+    def test_search_term_shorter_than_trigram_matched_on_name(self):
+        ids = self.index.search("mg")
+        self.assertEquals(3, len(ids))
+
+    def test_renamed_formulation_found_by_new_name(self):
+        self.tamoxifen.name = "tamoxifen 10mg tablet"
+        self.tamoxifen.save()
+
+        self.assertEquals([self.tamoxifen.id], self.index.search("10mg"))
+
+    def test_rebuild_all_indexes_every_formulation(self):
+        self.assertEquals(3, self.index.rebuild_all())
+        self.assertEquals([self.tamoxifen.id], self.index.search("tamoxifen"))
@@ -35,3 +35,38 @@ class FormulationTableTest(TableTestCase):
 
     def test_ordered_by_landed_price(self):
         self.check_ordered_by(self.formulation_table, 'landed_price')
+
+    def test_rows_not_modified(self):
+        raw_data = [{"fob_price":None, "landed_price":4.98765432,
+                     "country":"South Africa"}]
+        FormulationTable(raw_data).as_html()
+
+        self.assertEquals([{"fob_price":None, "landed_price":4.98765432,
+                            "country":"South Africa"}], raw_data)
+
+    def test_missing_landed_prices_ordered_last(self):
+        raw_data = [{"fob_price":None, "landed_price":None, "country":"Nibia"},
+                    {"fob_price":None, "landed_price":2.5, "country":"Samgala"},
+                    {"fob_price":None, "landed_price":1.5, "country":"Angola"}]
+        table = FormulationTable(raw_data)
+
+        countries = [row['country'] for row in table.rows]
+        self.assertEquals(["Angola", "Samgala", "Nibia"], countries)
+
+    def test_compiled_html_matches_template_html(self):
+        raw_data = [{"fob_price":None, "landed_price":None, "country":"Nibia"},
+                    {"fob_price":"1.2345", "landed_price":2.5,
+                     "country":"<Samgala>"},
+                    {"fob_price":0.0005, "landed_price":1.5,
+                     "country":"Angola"}]
+
+        self.check_compiled_html_matches_template_html(
+            FormulationTable(raw_data))
+
+    def test_missing_price_displayed_as_no_data(self):
+        raw_data = [{"fob_price":None, "landed_price":None, "country":"Nibia"}]
+        table = FormulationTable(raw_data)
+
+        first_row = table.rows[self.FIRST_ROW]
+        fob_price = self.get_nth_value(first_row, self.FOB_PRICE_COLUMN)
+        self.assertEquals("--", fob_price)
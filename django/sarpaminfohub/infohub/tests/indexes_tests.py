@@ -0,0 +1,22 @@
+from django.db import connection, IntegrityError
+
+from sarpaminfohub.infohub.indexes import INDEXES, create_missing_indexes, \
+    drop_indexes
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class IndexesTest(SarpamTestCase):
+    def test_indexes_created_with_tables(self):
+        cursor = connection.cursor()
+
+        for index in INDEXES:
+            self.assertTrue(index.exists(cursor), index.name)
+
+    def test_only_missing_indexes_created(self):
+        self.assertEquals([], create_missing_indexes())
+
+        drop_indexes(INDEXES[1:])
+        self.assertEquals(list(INDEXES[1:]), create_missing_indexes())
+
+    def test_exchange_rate_unique_for_currency_and_year(self):
+        self.set_up_exchange_rate_for_eur()
+        self.assertRaises(IntegrityError, self.set_up_exchange_rate_for_eur)
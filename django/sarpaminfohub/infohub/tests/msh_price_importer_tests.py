@@ -0,0 +1,109 @@
+from decimal import Decimal
+from StringIO import StringIO
+
+from sarpaminfohub.infohub.models import Formulation, MSHPrice, PriceSummary
+from sarpaminfohub.infohub.msh_price_importer import MSHPriceImporter
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class MSHPriceImporterTest(SarpamTestCase):
+    def setUp(self):
+        self.set_up_exchange_rate_for_eur()
+        self.set_up_and_return_drc_ciprofloxacin()
+        self.importer = MSHPriceImporter()
+
+    def get_csv_file(self, period, rows):
+        lines = ["MSH Prices %d\t\t" % period, "Formulation\tPrice\t"]
+
+        for (name, price) in rows:
+            lines.append("%s\t%s\t" % (name, price))
+
+        return StringIO("\n".join(lines) + "\n")
+
+    def get_ciprofloxacin_msh_price(self):
+        # pylint: disable-msg=E1101
+        return MSHPrice.objects.get(formulation=self.ciprofloxacin)
+
+    def test_price_added_for_formulation(self):
+        csv_file = self.get_csv_file(2009, [("ciprofloxacin 500mg tablet",
+                                             "0.033")])
+        self.importer.import_files([csv_file])
+
+        msh_price = self.get_ciprofloxacin_msh_price()
+        self.assertEquals(2009, msh_price.period)
+        self.assertEquals(Decimal("0.033"), msh_price.price)
+        self.assertEquals(1, self.importer.num_inserted)
+
+    def test_formulation_name_matched_ignoring_case(self):
+        csv_file = self.get_csv_file(2009, [("Ciprofloxacin 500MG Tablet ",
+                                             "0.033")])
+        self.importer.import_files([csv_file])
+
+        self.assertEquals(Decimal("0.033"),
+                          self.get_ciprofloxacin_msh_price().price)
+        self.assertEquals([], self.importer.unknown_formulations)
+
+    def test_existing_price_updated(self):
+        self.set_up_msh_for_ciprofloxacin()
+        csv_file = self.get_csv_file(2010, [("ciprofloxacin 500mg tablet",
+                                             "0.05")])
+        self.importer.import_files([csv_file])
+
+        msh_price = self.get_ciprofloxacin_msh_price()
+        self.assertEquals(2010, msh_price.period)
+        self.assertEquals(Decimal("0.05"), msh_price.price)
+        self.assertEquals(1, self.importer.num_updated)
+
+    def test_price_summary_gets_new_msh_price(self):
+        csv_file = self.get_csv_file(2009, [("ciprofloxacin 500mg tablet",
+                                             "0.033")])
+        self.importer.import_files([csv_file])
+
+        # pylint: disable-msg=E1101
+        summary = PriceSummary.objects.get(formulation=self.ciprofloxacin)
+        self.assertEquals(Decimal("0.033"), summary.msh_price)
+
+    def test_latest_period_wins_when_importing_several(self):
+        files = [self.get_csv_file(2010, [("ciprofloxacin 500mg tablet",
+                                           "0.05")]),
+                 self.get_csv_file(2009, [("ciprofloxacin 500mg tablet",
+                                           "0.033")])]
+        self.importer.import_files(files)
+
+        self.assertEquals(Decimal("0.05"),
+                          self.get_ciprofloxacin_msh_price().price)
+
+    def test_older_guide_does_not_replace_newer_price(self):
+        csv_file = self.get_csv_file(2010, [("ciprofloxacin 500mg tablet",
+                                             "0.05")])
+        self.importer.import_files([csv_file])
+
+        csv_file = self.get_csv_file(2009, [("ciprofloxacin 500mg tablet",
+                                             "0.033")])
+        MSHPriceImporter().import_files([csv_file])
+
+        self.assertEquals(Decimal("0.05"),
+                          self.get_ciprofloxacin_msh_price().price)
+
+    def test_unknown_formulations_reported(self):
+        csv_file = self.get_csv_file(2009, [("ciprofloxacin 500mg tablet",
+                                             "0.033"),
+                                            ("unobtainium 1mg tablet", "1"),
+                                            ("no price 1mg tablet", "")])
+        self.importer.import_files([csv_file])
+
+        self.assertEquals(["unobtainium 1mg tablet"],
+                          self.importer.unknown_formulations)
+        self.assertEquals(2, self.importer.num_rows)
+
+    def test_query_count_does_not_depend_on_number_of_rows(self):
+        rows = []
+        for i in range(20):
+            name = "formulation %d" % i
+            Formulation.objects.create(name=name)
+            rows.append((name, "0.%d" % (i + 1)))
+
+        few = self.count_queries(MSHPriceImporter().import_files,
+                                 [self.get_csv_file(2009, rows[:2])])
+        many = self.count_queries(MSHPriceImporter().import_files,
+                                  [self.get_csv_file(2009, rows[2:])])
+        self.assertEquals(few, many)
@@ -0,0 +1,76 @@
+from django.template import Template, Context
+
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+from sarpaminfohub.infohub.price_record import PriceRecord
+
+class PriceRecordTest(SarpamTestCase):
+    def test_fields_can_be_read_as_keys(self):
+        record = PriceRecord(formulation="ciprofloxacin 500mg tablet",
+                             fob_price=1.23)
+        self.assertEquals("ciprofloxacin 500mg tablet", record['formulation'])
+        self.assertEquals(1.23, record['fob_price'])
+        self.assertEquals(None, record['landed_price'])
+
+    def test_fields_can_be_set_as_keys(self):
+        record = PriceRecord()
+        record['landed_price'] = 4.56
+        self.assertEquals(4.56, record.landed_price)
+
+    def test_unknown_key_raises_key_error(self):
+        record = PriceRecord()
+        self.assertRaises(KeyError, record.__getitem__, 'keys')
+        self.assertRaises(KeyError, record.__setitem__, 'href', "/")
+
+    def test_get_returns_default_for_unknown_key(self):
+        record = PriceRecord(country="Namibia")
+        self.assertEquals("Namibia", record.get('country'))
+        self.assertEquals("--", record.get('href', "--"))
+
+    def test_record_equals_dict_with_same_fields(self):
+        record = PriceRecord(country="Namibia", volume=100)
+        fields = dict(record.items())
+        self.assertEquals(fields, record)
+        self.assertEquals(record, fields)
+
+        fields['volume'] = 200
+        self.assertNotEquals(fields, record)
+
+    def test_copy_is_independent(self):
+        record = PriceRecord(fob_price=1.0)
+        copy = record.copy()
+        copy['fob_price'] = 2.0
+        self.assertEquals(1.0, record['fob_price'])
+        self.assertEquals(PriceRecord(fob_price=2.0), copy)
+
+    def test_record_has_no_instance_dict(self):
+        record = PriceRecord()
+        self.assertRaises(AttributeError, setattr, record, 'href', "/")
+
+    def test_fields_can_be_used_in_templates(self):
+        record = PriceRecord(supplier="Aspen Pharmacare Ltd, S.A")
+        template = Template("{{ record.supplier }}")
+        html = template.render(Context({'record':record}))
+        self.assertEquals("Aspen Pharmacare Ltd, S.A", html)
+
+    def test_column_read_from_records_and_dicts(self):
+        records = [PriceRecord(fob_price=1.0), PriceRecord(fob_price=2.0)]
+        self.assertEquals([1.0, 2.0],
+                          PriceRecord.get_column(records, 'fob_price'))
+
+        dicts = [{'fob_price': 1.0}, {'fob_price': 2.0}]
+        self.assertEquals([1.0, 2.0],
+                          PriceRecord.get_column(dicts, 'fob_price'))
+
+    def test_column_written_to_records_and_dicts(self):
+        records = [PriceRecord(), PriceRecord()]
+        PriceRecord.set_column(records, 'fob_price', [1.0, 2.0])
+        self.assertEquals([PriceRecord(fob_price=1.0),
+                           PriceRecord(fob_price=2.0)], records)
+
+        dicts = [{}, {}]
+        PriceRecord.set_column(dicts, 'fob_price', [1.0, 2.0])
+        self.assertEquals([{'fob_price': 1.0}, {'fob_price': 2.0}], dicts)
+
+    def test_only_fields_read_as_columns(self):
+        self.assertRaises(KeyError, PriceRecord.get_column, [PriceRecord()],
+                          'keys')
@@ -0,0 +1,172 @@
+from decimal import Decimal
+from sarpaminfohub.infohub.django_backend import DjangoBackend
+from django.http import HttpRequest, HttpResponse
+
+from sarpaminfohub.infohub.drug_searcher import DrugSearcher
+from sarpaminfohub.infohub.middleware import DeferredPriceSummaryMiddleware
+from sarpaminfohub.infohub.models import ExchangeRate, Formulation, Price, \
+    PriceSummary
+from sarpaminfohub.infohub.price_summaries import PriceSummaryBuilder, \
+    deferred_rebuilds, describe_missing_rates
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class PriceSummaryTest(SarpamTestCase):
+    def setUp(self):
+        self.set_up_exchange_rate_for_eur()
+        self.set_up_and_return_drc_ciprofloxacin()
+        self.backend = DjangoBackend()
+        self.drug_searcher = DrugSearcher(self.backend)
+
+    def get_ciprofloxacin_summary(self):
+        # pylint: disable-msg=E1101
+        return PriceSummary.objects.get(formulation=self.ciprofloxacin)
+
+    def test_summary_created_when_price_saved(self):
+        summary = self.get_ciprofloxacin_summary()
+
+        self.assertEquals(1, summary.price_count)
+        self.assertAlmostEquals((1.8 * 1.39071) / 100,
+                                summary.median_fob_price)
+        self.assertAlmostEquals((2.085 * 1.39071) / 100,
+                                summary.median_landed_price)
+
+    def test_summary_includes_msh_price(self):
+        self.set_up_msh_for_ciprofloxacin()
+        summary = self.get_ciprofloxacin_summary()
+        self.assertEquals(Decimal("0.033"), summary.msh_price)
+
+    def test_summary_removed_when_prices_deleted(self):
+        # pylint: disable-msg=E1101
+        Price.objects.filter(formulation=self.ciprofloxacin).delete()
+        self.assertEquals(0, PriceSummary.objects.count())
+
+    def test_summary_rebuilt_when_exchange_rate_changes(self):
+        # pylint: disable-msg=E1101
+        exchange_rate = ExchangeRate.objects.get(symbol='EUR', year=2009)
+        exchange_rate.rate = 2.0
+        exchange_rate.save()
+
+        summary = self.get_ciprofloxacin_summary()
+        self.assertAlmostEquals((1.8 * 2.0) / 100, summary.median_fob_price)
+
+    def test_moving_price_rebuilds_summary_it_left(self):
+        amoxicillin = Formulation(name="amoxicillin 500mg tablet")
+        amoxicillin.save()
+
+        price = Price.objects.get(formulation=self.ciprofloxacin)
+        price.formulation = amoxicillin
+        price.save()
+
+        # pylint: disable-msg=E1101
+        self.assertFalse(PriceSummary.objects.filter(
+            formulation=self.ciprofloxacin).exists())
+        self.assertEquals(1, PriceSummary.objects.get(
+            formulation=amoxicillin).price_count)
+
+    def test_deferred_rebuilds_done_when_function_returns(self):
+        @deferred_rebuilds
+        def add_prices():
+            for fob_price in ("1.0", "2.0", "3.0"):
+                Price(formulation=self.ciprofloxacin, fob_price=fob_price,
+                      fob_currency='EUR', period=2009,
+                      issue_unit=100).save()
+
+            self.assertEquals(1, self.get_ciprofloxacin_summary().price_count)
+
+        add_prices()
+        self.assertEquals(4, self.get_ciprofloxacin_summary().price_count)
+
+    def test_rebuilds_deferred_until_end_of_request(self):
+        middleware = DeferredPriceSummaryMiddleware()
+        request = HttpRequest()
+        middleware.process_request(request)
+
+        # pylint: disable-msg=E1101
+        Price.objects.filter(formulation=self.ciprofloxacin).delete()
+        self.assertEquals(1, PriceSummary.objects.count())
+
+        middleware.process_response(request, HttpResponse())
+        self.assertEquals(0, PriceSummary.objects.count())
+
+    def test_search_reads_summaries_after_searching_index(self):
+        num_queries = self.count_queries(
+            self.drug_searcher.get_formulations_that_match, "ciprofloxacin")
+        self.assertEquals(3, num_queries)
+
+    def test_search_results_best_matches_first(self):
+        # Sorts before ciprofloxacin by name, but doesn't start with the
+        # search term
+        combination = Formulation(name="amoxicillin/ciprofloxacin tablet")
+        combination.save()
+        Price(formulation=combination, fob_price="1.0", fob_currency='EUR',
+              period=2009, issue_unit=100).save()
+
+        rows = self.backend.get_price_summaries_that_match("cipro")
+
+        self.assertEquals(["ciprofloxacin 500mg tablet",
+                           "amoxicillin/ciprofloxacin tablet"],
+                          [row['formulation'] for row in rows])
+
+    def test_summaries_match_medians_of_prices(self):
+        self.set_up_msh_for_ciprofloxacin()
+        rows = self.drug_searcher.get_formulations_that_match("cipro")
+        expected_rows = self.drug_searcher.get_median_prices_that_match("cipro")
+
+        self.assertEquals(expected_rows, rows)
+
+    def test_rebuild_all_returns_summary_for_each_formulation_with_prices(self):
+        summaries = PriceSummaryBuilder().rebuild_all()
+        self.assertEquals([self.ciprofloxacin.id],
+                          [summary.formulation_id for summary in summaries])
+
+    def add_ciprofloxacin_price_in_zar(self):
+        # There is no ZAR exchange rate
+        Price(formulation=self.ciprofloxacin, fob_price="100.0",
+              fob_currency='ZAR', landed_price="200.0",
+              landed_currency='ZAR', period=2009, issue_unit=100).save()
+
+    def test_prices_without_exchange_rate_left_out_of_summary(self):
+        self.add_ciprofloxacin_price_in_zar()
+
+        summary = self.get_ciprofloxacin_summary()
+        self.assertEquals(2, summary.price_count)
+        self.assertAlmostEquals((1.8 * 1.39071) / 100,
+                                summary.median_fob_price)
+
+    def test_formulation_kept_when_no_price_has_exchange_rate(self):
+        # pylint: disable-msg=E1101
+        ExchangeRate.objects.filter(symbol='EUR').delete()
+
+        summary = self.get_ciprofloxacin_summary()
+        self.assertEquals(1, summary.price_count)
+        self.assertEquals(None, summary.median_fob_price)
+
+    def test_missing_exchange_rates_reported(self):
+        self.add_ciprofloxacin_price_in_zar()
+
+        builder = PriceSummaryBuilder()
+        builder.rebuild_all()
+
+        self.assertEquals(set([('ZAR', 2009)]), builder.missing_rates)
+        self.assertEquals(["No exchange rate for ZAR in 2009, its prices "
+                           "were left out of the price summaries"],
+                          describe_missing_rates(builder.missing_rates))
+
+    def test_search_works_out_medians_until_summaries_built(self):
+        # As after loaddata, whose raw saves don't build summaries
+        # pylint: disable-msg=E1101
+        PriceSummary.objects.all().delete()
+
+        self.assertEquals(None,
+                          self.backend.get_price_summaries_that_match("cipro"))
+
+        rows = self.drug_searcher.get_formulations_that_match("cipro")
+        self.assertEquals(1, len(rows))
+        self.assertAlmostEquals((1.8 * 1.39071) / 100, rows[0]['fob_price'])
+
+    def test_search_uses_summaries_when_others_have_no_prices(self):
+        Formulation(name="ciprofloxacin 250mg tablet").save()
+
+        rows = self.backend.get_price_summaries_that_match("cipro")
+        self.assertEquals(["ciprofloxacin 500mg tablet"],
+                          [row['formulation'] for row in rows])
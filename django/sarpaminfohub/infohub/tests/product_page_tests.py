@@ -11,17 +11,19 @@ class ProductPageTest(PageDisplayTestCase):
         
         response = self.get(sarpaminfohub.infohub.views.product_page,
             product_id=zovirax.id)
-        self.assertEqual(response.context['product'], zovirax)
-        self.assertTrue(len(zovirax.registrations.all()) > 0)
+        self.assertEqual(zovirax.id, response.context['product']['id'])
+        self.assertEqual(1, len(response.context['product']['registrations']))
         
     def test_product_landing_page_for_product_with_supplier(self):
         lovire = self.create_and_return_lovire()
         
         response = self.get(sarpaminfohub.infohub.views.product_page,
             product_id=lovire.id)
-        self.assertEqual(response.context['product'], lovire)
-        self.assertTrue(len(lovire.registrations.all()) > 0)
-        self.assertNotEqual(None, lovire.registrations.all()[0])
+        self.assertEqual(lovire.id, response.context['product']['id'])
+        registrations = response.context['product']['registrations']
+        self.assertEqual(1, len(registrations))
+        self.assertEqual("CIPLA MEDPRO, RSA (company name)",
+                         registrations[0]['supplier']['name'])
 
     def test_landing_page_sub_title_is_product(self):
         lovire = self.create_and_return_lovire()
@@ -38,6 +40,46 @@ class ProductPageTest(PageDisplayTestCase):
 
         self.check_sub_sub_title_is(response, lovire.name)
 
+    def test_registrations_shown_with_country_supplier_and_manufacturer(self):
+        lovire = self.create_and_return_lovire()
+
+        response = self.get(sarpaminfohub.infohub.views.product_page,
+            product_id=lovire.id)
+
+        self.assertContains(response, "<td>Sangala</td>")
+        self.assertContains(response, "CIPLA MEDPRO, RSA (company name)</a>")
+        self.assertContains(response, "<td>Ranbaxy Laboratories Ltd, India</td>")
+        self.assertContains(response, "aciclovir 200mg tablet</a>")
+
+    def test_registration_without_supplier_shows_unknown(self):
+        zovirax = self.create_and_return_zovirax()
+
+        response = self.get(sarpaminfohub.infohub.views.product_page,
+            product_id=zovirax.id)
+
+        self.assertContains(response, "Unknown")
+
+    def test_number_of_queries_independent_of_number_of_registrations(self):
+        lovire = self.create_and_return_lovire()
+        few_queries = self.count_queries(self.get,
+            sarpaminfohub.infohub.views.product_page, product_id=lovire.id)
+
+        sangala = Country.objects.get(pk="XL")
+        for i in range(10):
+            manufacturer = Manufacturer(name="Manufacturer %d" % i)
+            manufacturer.save()
+            supplier = Supplier(name="Supplier %d" % i)
+            supplier.save()
+            ProductRegistration(product=lovire, country=sangala,
+                                manufacturer=manufacturer,
+                                supplier=supplier).save()
+
+        many_queries = self.count_queries(self.get,
+            sarpaminfohub.infohub.views.product_page, product_id=lovire.id)
+
+        self.assertEqual(2, few_queries)
+        self.assertEqual(few_queries, many_queries)
+
     def get(self, view_function, **view_args):
         return self.client.get(django.core.urlresolvers.reverse(view_function,
             kwargs=view_args))
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+
+from sarpaminfohub.infohub.tests.page_display_test_case import PageDisplayTestCase
+from sarpaminfohub.infohub.middleware import DataVersionMiddleware
+from sarpaminfohub.infohub.models import Price
+from sarpaminfohub.infohub.response_cache import bump_data_version, \
+    get_counters, get_data_version
+
+class ResponseCacheTest(PageDisplayTestCase):
+    def setUp(self):
+        self.set_up_exchange_rate_for_eur()
+        self.set_up_and_return_drc_ciprofloxacin()
+        self.url = '/formulation/%d/django' % self.ciprofloxacin.id
+
+    def rename_ciprofloxacin(self):
+        self.ciprofloxacin.name = "ciprofloxacin 250mg tablet"
+        self.ciprofloxacin.save()
+
+    def test_second_request_is_a_cache_hit(self):
+        counters = get_counters()
+        first_response = self.client.get(self.url)
+        second_response = self.client.get(self.url)
+
+        self.assertEquals(first_response.content, second_response.content)
+        self.assertEquals(first_response['Content-Type'],
+                          second_response['Content-Type'])
+
+        self.assertEquals(counters['misses'] + 1, get_counters()['misses'])
+        self.assertEquals(counters['hits'] + 1, get_counters()['hits'])
+
+    def test_cached_page_served_until_data_version_bumped(self):
+        self.client.get(self.url)
+
+        # Without the signals that bump the data version
+        connection.cursor().execute(
+            "UPDATE infohub_formulation SET name = %s WHERE id = %s",
+            ["ciprofloxacin 250mg tablet", self.ciprofloxacin.id])
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "ciprofloxacin 500mg tablet")
+
+        bump_data_version()
+        response = self.client.get(self.url)
+        self.assertContains(response, "ciprofloxacin 250mg tablet")
+
+    def test_pages_for_different_backends_cached_separately(self):
+        self.set_up_exchange_rate_for_nad()
+        self.set_up_exchange_rate_for_usd()
+
+        self.client.get('/formulation/1/django')
+        response = self.client.get('/formulation/1/test')
+        self.assertContains(response, "/formulation_products/1/test")
+
+    def test_pages_not_cached_with_zero_timeout(self):
+        timeout = settings.SARPAM_RESPONSE_CACHE_TIMEOUT
+        settings.SARPAM_RESPONSE_CACHE_TIMEOUT = 0
+
+        try:
+            self.client.get(self.url)
+            self.rename_ciprofloxacin()
+
+            response = self.client.get(self.url)
+            self.assertContains(response, "ciprofloxacin 250mg tablet")
+        finally:
+            settings.SARPAM_RESPONSE_CACHE_TIMEOUT = timeout
+
+    def test_loaddata_bumps_data_version(self):
+        version = get_data_version()
+        call_command('loaddata', 'no_such_fixture', verbosity=0)
+        self.assertNotEquals(version, get_data_version())
+
+    def test_saving_row_shows_change_on_cached_page(self):
+        self.client.get(self.url)
+        self.rename_ciprofloxacin()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "ciprofloxacin 250mg tablet")
+
+    def test_deleting_row_bumps_data_version(self):
+        version = get_data_version()
+        # pylint: disable-msg=E1101
+        Price.objects.get(formulation=self.ciprofloxacin).delete()
+        self.assertNotEquals(version, get_data_version())
+
+    def test_data_version_bumped_again_at_end_of_request_that_saved(self):
+        middleware = DataVersionMiddleware()
+        request = HttpRequest()
+        middleware.process_request(request)
+
+        self.rename_ciprofloxacin()
+        version = get_data_version()
+
+        middleware.process_response(request, HttpResponse())
+        self.assertNotEquals(version, get_data_version())
+
+    def test_data_version_kept_at_end_of_request_that_saved_nothing(self):
+        middleware = DataVersionMiddleware()
+        request = HttpRequest()
+        middleware.process_request(request)
+        version = get_data_version()
+
+        middleware.process_response(request, HttpResponse())
+        self.assertEquals(version, get_data_version())
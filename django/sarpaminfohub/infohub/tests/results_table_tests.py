@@ -38,3 +38,27 @@ class ResultsTableTest(TableTestCase):
 
         self.assertAlmostEquals(2.123, float(msh_price))
         
+
+    def test_compiled_html_matches_template_html(self):
+        raw_data = [{"formulation":"amoxycillin 125mg/5ml suspension",
+                     "fob_price":None, "landed_price":0.5, "msh_price":None,
+                     "href":"/formulation/9/"},
+                    {"formulation":"ciprofloxacin <500mg> tablet",
+                     "fob_price":"3.12345678", "landed_price":None,
+                     "msh_price":2.12345678, "href":"/formulation/1/?a&b"}]
+
+        self.check_compiled_html_matches_template_html(
+            ResultsTable(raw_data, ""))
+
+    def test_missing_prices_shown_as_no_data_independently(self):
+        raw_data = [{"formulation":"amoxycillin 125mg/5ml suspension",
+                     "fob_price":None, "landed_price":0.5, "msh_price":None,
+                     "href":"/formulation/9/"}]
+        html = ResultsTable(raw_data, "").as_html()
+
+        self.assertTrue(self.contains(html,
+            '<td class="second number">--</td>'))
+        self.assertTrue(self.contains(html,
+            '<td class="third number">0.500</td>'))
+        self.assertTrue(self.contains(html,
+            '<td class="fourth number">--</td>'))
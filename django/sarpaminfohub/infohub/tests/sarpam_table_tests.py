@@ -17,4 +17,13 @@ class SarpamTableTest(SarpamTestCase):
         
         self.assertEquals("--", test_data[first_column])
  
-        
\ No newline at end of file
+        
+
+    def test_number_formatted_with_set_decimal_places(self):
+        table = SarpamTable(None)
+        self.assertEquals("0.123", table.format_number(0.12346))
+        self.assertEquals("2.000", table.format_number("2"))
+
+    def test_no_data_returned_when_none_formatted(self):
+        table = SarpamTable(None)
+        self.assertEquals("--", table.format_number(None))
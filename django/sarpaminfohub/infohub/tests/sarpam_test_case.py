@@ -1,4 +1,8 @@
+from django.conf import settings
+from django.db import connection
 from django.test.testcases import TestCase
+from sarpaminfohub.infohub.currency_exchange import CurrencyExchange
+from sarpaminfohub.infohub.response_cache import bump_data_version
 from sarpaminfohub.infohub.models import Formulation, Price, Country, \
     ExchangeRate, Product, MSHPrice, Incoterm
 from decimal import Decimal
@@ -7,6 +11,16 @@ class SarpamTestCase(TestCase):
     def __init__(self, method_name):
         self.ciprofloxacin = None
         TestCase.__init__(self, method_name)
+
+    def _pre_setup(self):
+        TestCase._pre_setup(self)
+
+        # Rolling back the previous test's transaction doesn't send any
+        # signals, so the shared exchange rates may be stale
+        CurrencyExchange.clear_rates()
+
+        # Nor does it empty a cache outside the database
+        bump_data_version()
     
     def set_up_and_return_biofloxx(self, formulation):
         biofloxx = Product(formulation=formulation, name="BIOFLOXX 500 MG")
@@ -60,3 +74,16 @@ class SarpamTestCase(TestCase):
 
     def contains(self, string_to_search, sub_string):
         return string_to_search.find(sub_string) > -1
+
+    def count_queries(self, function, *args, **kwargs):
+        # Django only logs queries when DEBUG is on, which the test runner
+        # turns off
+        old_debug = settings.DEBUG
+        settings.DEBUG = True
+        connection.queries = []
+
+        try:
+            function(*args, **kwargs)
+            return len(connection.queries)
+        finally:
+            settings.DEBUG = old_debug
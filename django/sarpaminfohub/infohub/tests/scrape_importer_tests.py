@@ -0,0 +1,180 @@
+import glob
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.core import serializers
+
+from sarpaminfohub.infohub.fixture_loader import BulkFixtureLoader
+from sarpaminfohub.infohub.models import Country, ExchangeRate, Formulation, \
+    FormulationTrigram, Incoterm, Manufacturer, Price, PriceSummary, \
+    Product, ProductRegistration, Supplier
+from sarpaminfohub.infohub.scrape_importer import ScrapeImporter, \
+    load_scrape_script
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class ScrapeImporterTest(SarpamTestCase):
+    MODELS = (Country, ExchangeRate, Supplier, Manufacturer, Formulation,
+              Incoterm, Price, Product, ProductRegistration)
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.data_dir, 'fixtures', 'initial_data'))
+
+        # scrape.py writes a list of unknown formulations to the current
+        # directory
+        self.old_cwd = os.getcwd()
+        os.chdir(self.data_dir)
+
+        self.write_lookups()
+        self.write_file_db()
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.data_dir)
+
+    def write_lookups(self):
+        drugs = open(os.path.join(self.data_dir, 'drugs2.csv'), 'w')
+        drugs.write("Biofloxx\tBIOFLOXX 500 MG\n")
+        drugs.close()
+
+        manufacturers = open(os.path.join(self.data_dir, 'manufacturers.csv'),
+                             'w')
+        manufacturers.write("Camox Ltd\tcamox\n\tAspen\n")
+        manufacturers.close()
+
+    def write_file_db(self):
+        conn = sqlite3.connect(os.path.join(self.data_dir, 'file.db'))
+        conn.execute("CREATE TABLE country (id INTEGER, name TEXT)")
+        conn.execute("CREATE TABLE exchange_rate "
+                     "(symbol TEXT, year TEXT, rate REAL)")
+        conn.execute("CREATE TABLE form10_row (description TEXT, "
+                     "landed_cost_price REAL, fob_price REAL, period TEXT, "
+                     "issue_unit INTEGER, country INTEGER, fob_currency TEXT, "
+                     "landed_cost_currency TEXT, incoterm TEXT, "
+                     "volume INTEGER, supplier TEXT, supplier_country TEXT, "
+                     "manufacture_country TEXT)")
+        conn.execute("CREATE TABLE form1_row (item TEXT, product_name TEXT, "
+                     "manufacturer TEXT, supplier TEXT, country INTEGER)")
+
+        conn.execute("INSERT INTO country VALUES (1, 'Seychelles')")
+        conn.execute("INSERT INTO country VALUES (2, 'Angola')")
+        conn.execute("INSERT INTO exchange_rate VALUES ('EUR', '2009', 1.39)")
+
+        conn.executemany("INSERT INTO form10_row VALUES "
+                         "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            ("ciprofloxacin* 500mg tablet", 2.085, 1.8, "2009", 100, 1,
+             "EUR", "EUR", "CIF", 10, " Camox ", "India", "IN"),
+            ("ciprofloxacin 500mg tablet", 0, 1.9, "2009", 100, 2,
+             "EUR", "EUR", "", None, "Aspen", "", "ZA"),
+            ("amoxicillin 250mg capsule", 0.5, 0, "2009", 50, 2,
+             "EUR", "EUR", " FOB ", 20, "", "kenya", "KE")])
+
+        conn.executemany("INSERT INTO form1_row VALUES (?, ?, ?, ?, ?)", [
+            ("ciprofloxacin 500mg tablet", "biofloxx", "Aspen", "camox", 1),
+            ("ciprofloxacin 500mg tablet", "biofloxx", "Aspen", "", 2),
+            ("amoxicillin* 250mg capsule", "Amoxil", "camox", "Aspen", 1),
+            ("paracetamol 500mg tablet", "Panado", "Aspen", "", 1)])
+
+        conn.commit()
+        conn.close()
+
+    def dump_all(self):
+        dumps = []
+
+        for model in self.MODELS:
+            # pylint: disable-msg=E1101
+            dumps.append(serializers.serialize('json',
+                                               model.objects.order_by('pk')))
+
+        return dumps
+
+    def delete_all(self):
+        for model in reversed(self.MODELS):
+            # pylint: disable-msg=E1101
+            model.objects.all().delete()
+
+    def test_import_gives_same_objects_as_scraped_fixtures(self):
+        load_scrape_script().scrape(self.data_dir, quiet=True)
+        BulkFixtureLoader().load(glob.glob(os.path.join(
+            self.data_dir, 'fixtures', 'initial_data', '*.json')))
+        fixture_dumps = self.dump_all()
+
+        self.delete_all()
+        ScrapeImporter(quiet=True).import_data_dir(self.data_dir)
+
+        self.assertEquals(fixture_dumps, self.dump_all())
+
+    def test_names_are_standardised(self):
+        ScrapeImporter(quiet=True).import_data_dir(self.data_dir)
+
+        # pylint: disable-msg=E1101
+        self.assertEquals(["Aspen", "Camox Ltd"],
+                          sorted(Supplier.objects.values_list('name',
+                                                              flat=True)))
+        self.assertEquals(["ciprofloxacin 500mg tablet"],
+                          list(Product.objects.filter(
+                              name="BIOFLOXX 500 MG").values_list(
+                                  'formulation__name', flat=True)))
+
+    def test_objects_counted_by_model(self):
+        importer = ScrapeImporter(quiet=True)
+        importer.import_data_dir(self.data_dir)
+
+        self.assertEquals(3, importer.loader.counts[Price])
+        self.assertEquals(3, importer.loader.counts[ProductRegistration])
+
+    def test_search_index_and_price_summaries_rebuilt(self):
+        importer = ScrapeImporter(quiet=True)
+        importer.import_data_dir(self.data_dir)
+
+        # pylint: disable-msg=E1101
+        ciprofloxacin = Formulation.objects.get(
+            name="ciprofloxacin 500mg tablet")
+        self.assertTrue(FormulationTrigram.objects.filter(
+            formulation=ciprofloxacin, trigram="cip").exists())
+        self.assertTrue(PriceSummary.objects.filter(
+            formulation=ciprofloxacin).exists())
+        self.assertEquals(Formulation.objects.count(), importer.num_indexed)
+
+    def reverse_file_db_rows(self):
+        conn = sqlite3.connect(os.path.join(self.data_dir, 'file.db'))
+
+        for table in ('form10_row', 'form1_row'):
+            conn.execute("CREATE TABLE reversed AS SELECT * FROM %s "
+                         "ORDER BY rowid DESC" % table)
+            conn.execute("DROP TABLE %s" % table)
+            conn.execute("ALTER TABLE reversed RENAME TO %s" % table)
+
+        conn.commit()
+        conn.close()
+
+    def read_delta(self, name):
+        delta_file = open(os.path.join(self.data_dir, 'fixtures', 'delta',
+                                       name))
+        try:
+            return json.load(delta_file)
+        finally:
+            delta_file.close()
+
+    def test_regenerated_file_db_gives_empty_delta(self):
+        scrape = load_scrape_script()
+        scrape.scrape(self.data_dir, incremental=True, quiet=True)
+
+        # The rows get new rowids, but are the same records
+        self.reverse_file_db_rows()
+        scrape.scrape(self.data_dir, incremental=True, quiet=True)
+
+        self.assertEquals([], self.read_delta('changes.json'))
+        self.assertEquals([], self.read_delta('deletes.json'))
+
+    def test_plain_scrape_keeps_nothing_per_row(self):
+        key_counter = load_scrape_script().KeyCounter()
+
+        for price in range(3):
+            key_counter.getRowPk({'formulation': "ciprofloxacin"},
+                                 ('formulation',))
+
+        self.assertEquals({'next_pk': 4}, vars(key_counter))
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import get_cache
+
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class SharedMemoryCacheTest(SarpamTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache')
+        self.cache = self.get_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_cache(self, params="slot_size=1024"):
+        return get_cache('sarpaminfohub.infohub.shared_memory_cache://%s?%s' %
+                         (self.path, params))
+
+    def test_value_can_be_set_and_got(self):
+        self.cache.set('formulation', {'name': "amitriptyline 25mg tablet"})
+        self.assertEquals({'name': "amitriptyline 25mg tablet"},
+                          self.cache.get('formulation'))
+
+    def test_default_returned_for_missing_key(self):
+        self.assertEquals(None, self.cache.get('missing'))
+        self.assertEquals("--", self.cache.get('missing', "--"))
+
+    def test_value_with_zero_timeout_has_expired(self):
+        self.cache.set('token', "secret", 0)
+        self.assertEquals(None, self.cache.get('token'))
+
+    def test_value_expires_after_timeout(self):
+        self.cache.set('token', "secret", 0.05)
+        self.assertEquals("secret", self.cache.get('token'))
+
+        time.sleep(0.1)
+        self.assertEquals(None, self.cache.get('token'))
+
+    def test_default_timeout_used_when_none_given(self):
+        cache = self.get_cache("timeout=0")
+        cache.set('token', "secret")
+        self.assertEquals(None, cache.get('token'))
+
+    def test_add_does_not_replace_live_value(self):
+        self.assertTrue(self.cache.add('token', "first"))
+        self.assertFalse(self.cache.add('token', "second"))
+        self.assertEquals("first", self.cache.get('token'))
+
+    def test_deleted_value_is_missing(self):
+        self.cache.set('token', "secret")
+        self.cache.delete('token')
+        self.assertEquals(None, self.cache.get('token'))
+
+    def test_incr_adds_to_value(self):
+        self.cache.set('hits', 1)
+        self.assertEquals(3, self.cache.incr('hits', 2))
+        self.assertEquals(3, self.cache.get('hits'))
+
+    def test_incr_of_missing_key_raises_value_error(self):
+        self.assertRaises(ValueError, self.cache.incr, 'hits')
+
+    def test_values_are_shared_between_caches_on_the_same_file(self):
+        self.cache.set('token', "secret")
+        self.assertEquals("secret", self.get_cache().get('token'))
+
+    def test_value_too_big_for_a_slot_is_not_cached(self):
+        self.cache.set('page', "small")
+        self.cache.set('page', "x" * 2048)
+        self.assertEquals(None, self.cache.get('page'))
+
+    def test_least_recently_used_value_evicted_when_full(self):
+        # Eight entries make a single set
+        cache = self.get_cache("max_entries=8&slot_size=1024")
+
+        for i in range(8):
+            cache.set('key%d' % i, i)
+            time.sleep(0.001)
+
+        self.assertEquals(0, cache.get('key0'))
+        cache.set('key8', 8)
+
+        self.assertEquals(0, cache.get('key0'))
+        self.assertEquals(None, cache.get('key1'))
+        self.assertEquals(8, cache.get('key8'))
+
+    def test_clear_removes_all_values(self):
+        self.cache.set('token', "secret")
+        self.cache.clear()
+        self.assertEquals(None, self.cache.get('token'))
+
+    def test_file_is_group_writable(self):
+        self.cache.set('token', "secret")
+        self.assertEquals(0660, os.stat(self.path).st_mode & 0777)
+
+    def test_file_with_other_settings_is_replaced_not_emptied(self):
+        self.cache.set('token', "secret")
+
+        # Emptying the file this cache has mapped would crash it
+        cache = self.get_cache("slot_size=2048")
+        cache.set('hits', 1)
+
+        self.assertEquals("secret", self.cache.get('token'))
+        self.assertEquals(1, cache.get('hits'))
+        self.assertEquals(None, cache.get('token'))
@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.utils import simplejson
+
+from sarpaminfohub.infohub.models import Country, Formulation, Price, \
+    ProductRegistration, Supplier
+from sarpaminfohub.infohub.static_pages import MANIFEST_NAME, \
+    StaticPageWriter, get_page_digests, update_static_pages
+from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
+
+class StaticPageWriterTest(SarpamTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old_root = settings.SARPAM_STATIC_PAGES_ROOT
+        settings.SARPAM_STATIC_PAGES_ROOT = self.directory
+
+        self.set_up_exchange_rate_for_eur()
+        self.set_up_and_return_drc_ciprofloxacin()
+        self.biofloxx = self.set_up_and_return_biofloxx(self.ciprofloxacin)
+
+        self.camox = Supplier(name="Camox Pharmaceuticals (Pty) Ltd")
+        self.camox.save()
+
+        ProductRegistration(product=self.biofloxx, supplier=self.camox,
+                            country=Country.objects.get(code='CD')).save()
+
+        self.formulation_url = "/formulation/%d/" % self.ciprofloxacin.id
+        self.products_url = "/formulation_products/%d/" % self.ciprofloxacin.id
+        self.supplier_url = "/suppliers/%d/" % self.camox.id
+        self.product_url = "/product/%d" % self.biofloxx.id
+
+    def tearDown(self):
+        settings.SARPAM_STATIC_PAGES_ROOT = self.old_root
+        shutil.rmtree(self.directory)
+
+    def write_all(self, rebuild_all=False):
+        writer = StaticPageWriter(self.directory)
+        writer.write_all(rebuild_all)
+
+        return writer
+
+    def page_exists(self, url):
+        return os.path.exists(StaticPageWriter(self.directory).get_filename(
+            url))
+
+    def read_page(self, url):
+        page_file = open(StaticPageWriter(self.directory).get_filename(url))
+        try:
+            return page_file.read()
+        finally:
+            page_file.close()
+
+    def test_every_page_written_as_django_renders_it(self):
+        writer = self.write_all()
+
+        self.assertEquals(4, writer.num_written)
+
+        for url in (self.formulation_url, self.products_url,
+                    self.supplier_url, self.product_url):
+            self.assertEquals(self.client.get(url).content,
+                              self.read_page(url))
+
+    def test_pages_written_where_apache_looks_for_them(self):
+        self.write_all()
+
+        for path in ("formulation/%d.html" % self.ciprofloxacin.id,
+                     "formulation_products/%d.html" % self.ciprofloxacin.id,
+                     "suppliers/%d.html" % self.camox.id,
+                     "product/%d.html" % self.biofloxx.id):
+            self.assertTrue(os.path.exists(os.path.join(self.directory, path)),
+                            path)
+
+    def test_no_temporary_files_left_behind(self):
+        self.write_all()
+
+        for (_, _, filenames) in os.walk(self.directory):
+            for filename in filenames:
+                self.assertFalse(filename.startswith(".tmp"), filename)
+
+    def test_unchanged_pages_not_written_again(self):
+        self.write_all()
+        writer = self.write_all()
+
+        self.assertEquals(0, writer.num_written)
+        self.assertEquals(4, writer.num_unchanged)
+
+    def test_only_pages_showing_changed_price_written_again(self):
+        self.write_all()
+
+        price = Price.objects.get(formulation=self.ciprofloxacin)
+        price.fob_price = "2.5"
+        price.save()
+
+        writer = self.write_all()
+
+        self.assertEquals(1, writer.num_written)
+        self.assertContains(self.client.get(self.formulation_url), "0.025")
+        self.assertTrue("0.025" in self.read_page(self.formulation_url))
+
+    def test_renamed_supplier_rewrites_its_pages(self):
+        self.write_all()
+
+        self.camox.name = "Camox Pharmaceuticals"
+        self.camox.save()
+
+        writer = self.write_all()
+
+        # The supplier's catalogue, the formulation's products and the
+        # product's page all show the name
+        self.assertEquals(3, writer.num_written)
+
+    def test_page_of_deleted_supplier_removed(self):
+        self.write_all()
+        filename = StaticPageWriter(self.directory).get_filename(
+            self.supplier_url)
+
+        ProductRegistration.objects.all().delete()
+        self.camox.delete()
+        writer = self.write_all()
+
+        self.assertEquals(1, writer.num_removed)
+        self.assertFalse(os.path.exists(filename))
+
+    def test_all_pages_written_when_asked(self):
+        self.write_all()
+        writer = self.write_all(rebuild_all=True)
+
+        self.assertEquals(4, writer.num_written)
+
+    def test_manifest_holds_page_digests(self):
+        self.write_all()
+
+        manifest_file = open(os.path.join(self.directory, MANIFEST_NAME))
+        try:
+            manifest = simplejson.load(manifest_file)
+        finally:
+            manifest_file.close()
+
+        self.assertEquals(get_page_digests(), manifest)
+
+    def test_saving_price_removes_page_showing_it(self):
+        self.write_all()
+
+        price = Price.objects.get(formulation=self.ciprofloxacin)
+        price.fob_price = "2.5"
+        price.save()
+
+        self.assertFalse(self.page_exists(self.formulation_url))
+        self.assertTrue(self.page_exists(self.products_url))
+
+    def test_renaming_supplier_removes_pages_showing_it(self):
+        self.write_all()
+
+        self.camox.name = "Camox Pharmaceuticals"
+        self.camox.save()
+
+        for url in (self.supplier_url, self.products_url, self.product_url):
+            self.assertFalse(self.page_exists(url), url)
+
+        self.assertTrue(self.page_exists(self.formulation_url))
+
+    def test_moving_product_removes_page_it_has_left(self):
+        self.write_all()
+
+        amoxicillin = Formulation(name="amoxicillin 500mg tablet")
+        amoxicillin.save()
+
+        self.biofloxx.formulation = amoxicillin
+        self.biofloxx.save()
+
+        self.assertFalse(self.page_exists(self.products_url))
+
+    def test_pages_updated_only_once_written(self):
+        settings.SARPAM_STATIC_PAGES_ROOT = os.path.join(self.directory,
+                                                         "missing")
+        self.assertEquals(None, update_static_pages())
+
+        settings.SARPAM_STATIC_PAGES_ROOT = self.directory
+        self.assertEquals(4, update_static_pages().num_written)
@@ -1,5 +1,6 @@
 from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
 from itertools import islice
+import re
 
 class TableTestCase(SarpamTestCase):
     def get_nth_value(self, iterable, nn, default=None):
@@ -13,4 +14,11 @@ class TableTestCase(SarpamTestCase):
     def check_ordered_by(self, table, order):
         order_by = table.order_by
         expected_order = (order,)
-        self.assertEquals(expected_order, order_by)
\ No newline at end of file
+        self.assertEquals(expected_order, order_by)
+
+    def get_normalised_html(self, html):
+        return re.sub(r">\s+<", "><", html).strip()
+
+    def check_compiled_html_matches_template_html(self, table):
+        self.assertEquals(self.get_normalised_html(table.as_template_html()),
+                          self.get_normalised_html(table.as_compiled_html()))
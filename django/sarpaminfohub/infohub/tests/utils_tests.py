@@ -1,4 +1,5 @@
 # -*- coding: iso-8859-15 -*-
+import random
 from sarpaminfohub.infohub.tests.sarpam_test_case import SarpamTestCase
 import sarpaminfohub.infohub.utils as utils
 
@@ -18,6 +19,43 @@ class UtilsTest(SarpamTestCase):
         median = utils.get_median(price_list)
         self.assertAlmostEquals(0.06, median)
 
+    def get_median_by_sorting(self, values):
+        sorted_values = sorted(values)
+        (mid_point, remainder) = divmod(len(values), 2)
+
+        if remainder == 1:
+            return sorted_values[mid_point]
+        else:
+            return (sorted_values[mid_point] + sorted_values[mid_point - 1]) / 2
+
+    def test_median_of_long_odd_length_list_same_as_sorting(self):
+        size = utils.SELECTION_THRESHOLD + 1
+        price_list = [random.random() for _ in range(size)]
+        median = utils.get_median(price_list)
+        self.assertEquals(self.get_median_by_sorting(price_list), median)
+
+    def test_median_of_long_even_length_list_same_as_sorting(self):
+        size = utils.SELECTION_THRESHOLD
+        price_list = [random.random() for _ in range(size)]
+        median = utils.get_median(price_list)
+        self.assertEquals(self.get_median_by_sorting(price_list), median)
+
+    def test_median_of_long_list_of_integers_same_as_sorting(self):
+        size = utils.SELECTION_THRESHOLD
+        price_list = [random.randint(1, 100) for _ in range(size)]
+        median = utils.get_median(price_list)
+        self.assertEquals(self.get_median_by_sorting(price_list), median)
+
+    def test_select_returns_sorted_values_at_k_and_before_with_duplicates(self):
+        values = [5, 1, 3, 3, 3, 9, 1, 7]
+        sorted_values = sorted(values)
+
+        self.assertEquals((None, 1), utils.select(values, 0))
+
+        for k in range(1, len(values)):
+            self.assertEquals((sorted_values[k - 1], sorted_values[k]),
+                              utils.select(values, k))
+
     def test_none_values_ignored_when_calculating_median_fob_price_of_list(self):
         price_list = [{'fob_price':None, 'landed_price':None},
                       {'fob_price':0.09, 'landed_price':None}, 
@@ -1,15 +1,80 @@
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Below this many values sorting is quicker than numpy's partition
+NUMPY_THRESHOLD = 1000
+
+# Below this many values sorting is quicker than selection in Python
+SELECTION_THRESHOLD = 100000
+
+def select(values, k):
+    """
+    Returns the values that would be at positions k - 1 and k (counting
+    from 0) if the values were sorted, in expected linear time. The first
+    is None when k is 0.
+    """
+    # The largest value known to be smaller than everything left in values
+    below = None
+
+    while True:
+        pivot = random.choice(values)
+        lows = [value for value in values if value < pivot]
+
+        if k < len(lows):
+            values = lows
+            continue
+
+        highs = [value for value in values if value > pivot]
+        num_pivots = len(values) - len(lows) - len(highs)
+
+        if k < len(lows) + num_pivots:
+            if k > len(lows):
+                previous = pivot
+            elif len(lows) > 0:
+                previous = max(lows)
+            else:
+                previous = below
+
+            return (previous, pivot)
+
+        k -= len(lows) + num_pivots
+        below = pivot
+        values = highs
+
+def get_values_either_side(values, mid_point):
+    """
+    Returns the values that would be at positions mid_point - 1 and
+    mid_point if the values were sorted.
+    """
+    if numpy is not None and len(values) >= NUMPY_THRESHOLD:
+        array = numpy.array(values)
+
+        # Only use numpy if it could store the values as they are
+        if array.dtype.kind == 'f':
+            array.partition((mid_point - 1, mid_point))
+            return (float(array[mid_point - 1]), float(array[mid_point]))
+
+    if len(values) >= SELECTION_THRESHOLD:
+        return select(values, mid_point)
+
+    sorted_values = sorted(values)
+    return (sorted_values[mid_point - 1], sorted_values[mid_point])
+
 def get_median(values):
     num_set = len(values)
 
     if num_set > 0:
-        sorted_values = sorted(values)
-        
         (mid_point, remainder) = divmod(num_set, 2)
-        
+        (lower_value, upper_value) = get_values_either_side(values, mid_point)
+
         if remainder == 1:
-            median = sorted_values[mid_point]
+            median = upper_value
         else:
-            median = (sorted_values[mid_point] + sorted_values[mid_point - 1]) / 2
+            median = (upper_value + lower_value) / 2
     else:
         median = None
         
@@ -18,16 +83,18 @@ def get_median(values):
 def get_median_prices(formulations):
     fob_prices = []
     landed_prices = []
-    
+    add_fob_price = fob_prices.append
+    add_landed_price = landed_prices.append
+
     for formulation in formulations:
         fob_price = formulation['fob_price']
         landed_price = formulation['landed_price']
-        
-        if fob_price != None:
-            fob_prices.append(fob_price)
 
-        if landed_price != None:
-            landed_prices.append(landed_price)
+        if fob_price is not None:
+            add_fob_price(fob_price)
+
+        if landed_price is not None:
+            add_landed_price(landed_price)
 
     median_fob_price = get_median(fob_prices)
     median_landed_price = get_median(landed_prices)
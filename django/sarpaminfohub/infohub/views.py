@@ -2,17 +2,16 @@ from django.template import RequestContext
 from django.shortcuts import render_to_response
 from django.core.urlresolvers import reverse
 
-from copy import deepcopy
-
+from sarpaminfohub.infohub.backend_executor import get_shared_executor
 from sarpaminfohub.infohub.django_backend import DjangoBackend
 from sarpaminfohub.infohub.drug_searcher import DrugSearcher
 from sarpaminfohub.infohub.forms import SearchForm
 from sarpaminfohub.infohub.formulation_graph import FormulationGraph
 from sarpaminfohub.infohub.formulation_table import FormulationTable
 from sarpaminfohub.infohub.menu import Menu
-from sarpaminfohub.infohub.models import Product
 from sarpaminfohub.infohub.price_popup import PricePopup
 from sarpaminfohub.infohub.product_table import ProductTable
+from sarpaminfohub.infohub.response_cache import cache_response
 from sarpaminfohub.infohub.results_table import ResultsTable
 from sarpaminfohub.infohub.test_backend import TestBackend
 
@@ -51,20 +50,19 @@ def search(request):
                                'results_table': results_table,
                                'menu' : menu},RequestContext(request))
     
+@cache_response('formulation_id')
 def formulation(request, formulation_id, backend_name="django"):
     backend = get_backend(backend_name)
 
     drug_searcher = DrugSearcher(backend)
-    rows = drug_searcher.get_prices_for_formulation_with_id(formulation_id)
-
-    # Don't like that, but results is being changed in the constructor of the table.
-    rows_graph = deepcopy(rows)
+    formulation = drug_searcher.get_formulation_with_id(formulation_id)
 
-    formulation_name = drug_searcher.get_formulation_name_with_id(formulation_id)
-    formulation_msh = drug_searcher.get_formulation_msh_with_id(formulation_id)
+    rows = formulation['prices']
+    formulation_name = formulation['name']
+    formulation_msh = formulation['msh_price']
 
     formulation_table = FormulationTable(rows)
-    formulation_graph = FormulationGraph(rows_graph, formulation_msh)
+    formulation_graph = FormulationGraph(rows, formulation_msh)
 
     search_form = SearchForm()
 
@@ -89,17 +87,18 @@ def formulation(request, formulation_id, backend_name="django"):
                                'sub_sub_title' : formulation_name},
                                RequestContext(request))
 
+@cache_response('formulation_id')
 def formulation_products(request, formulation_id, backend_name="django"):
     backend = get_backend(backend_name)
     
-    drug_searcher = DrugSearcher(backend)
-    
-    rows = drug_searcher.get_product_registrations_based_on_formulation_with_id(formulation_id)
-    
+    drug_searcher = DrugSearcher(backend, get_shared_executor())
+
+    (formulation_name, rows) = \
+        drug_searcher.get_formulation_products_with_id(formulation_id)
+
     supplier_table = ProductTable(rows)
     search_form = SearchForm()
 
-    formulation_name = drug_searcher.get_formulation_name_with_id(formulation_id)
     formulation_href = reverse('formulation-by-id', args=[str(formulation_id),
                                                     backend_name])
 
@@ -116,15 +115,16 @@ def formulation_products(request, formulation_id, backend_name="django"):
                                },
                                RequestContext(request))
 
+@cache_response('supplier_id')
 def supplier_catalogue(request, supplier_id, backend_name="django"):
     backend = get_backend(backend_name)
 
     drug_searcher = DrugSearcher(backend)
-    registrations = drug_searcher.get_registrations_from_supplier_with_id(supplier_id)
+    (supplier_name, registrations) = \
+        drug_searcher.get_supplier_catalogue_with_id(supplier_id)
     search_form = SearchForm()
     catalogue_tab = get_catalogue_tab()
     menu = Menu([catalogue_tab])
-    supplier_name = drug_searcher.get_name_of_supplier_with_id(supplier_id)
     
     return render_to_response('supplier_catalogue.html',
                               {'registrations': registrations,
@@ -154,12 +154,12 @@ def product_page_tab(product, selected):
     if selected:
         href = None
     else:
-        href = reverse(product_page, args=[product.name])
+        href = reverse(product_page, args=[product['id']])
     
     return get_tab(href, "Details")
 
 def product_page(request, product_id):
-    product = Product.objects.get(id=product_id)
+    product = DjangoBackend().get_product_with_id(product_id)
     return render_to_response('product_page.html',
         RequestContext(request, 
                        dict(
@@ -167,7 +167,7 @@ def product_page(request, product_id):
             menu = Menu([product_page_tab(product, selected=True)]),
             product=product,
             search_form = SearchForm(),
-            sub_sub_title=product.name)))
+            sub_sub_title=product['name'])))
     
 def pricing_iframe(request):
     extra_context = {'iframe_url':'/', 'iframe_title':"Drug Price Database"}
@@ -1,6 +1,8 @@
 # Django settings for sarpaminfohub project.
 
 import os
+import sys
+import tempfile
 
 settings_dir = os.path.abspath(os.path.dirname(__file__))
 
@@ -67,6 +69,8 @@ TEMPLATE_LOADERS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'sarpaminfohub.infohub.middleware.DataVersionMiddleware',
+    'sarpaminfohub.infohub.middleware.DeferredPriceSummaryMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -111,7 +115,40 @@ TEMPLATE_CONTEXT_PROCESSORS = ('django.contrib.auth.context_processors.auth',
 LINKED_IN_API_KEY = "jFIwE5opBJM3bKpQbAYtCkYUZrEq4djATVmqXhr3Qph81qz8rLkN0M-fFY0vcys7"
 LINKED_IN_SECRET_KEY = "sFVDxOJq9k75YYgvzad2bjaqpMsdKQTrW_-PsZljQS-hux1ecdC57OhWTgi4intB"
 
-CACHE_BACKEND = 'db://sarpam_cache_table'
+# Shared between the processes on a host through a memory-mapped file, see
+# infohub/shared_memory_cache.py
+CACHE_BACKEND = 'sarpaminfohub.infohub.shared_memory_cache://'
+
+# The file the shared memory cache keeps its entries in, which has to be
+# somewhere both the web server and the deploy user can write to (see
+# create_shared_cache_dir in deploy/localtasks.py)
+SARPAM_SHARED_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'sarpaminfohub',
+                                        'shared_cache')
+
+# How long to cache the formulation and supplier pages for (0 turns it off).
+# They are also refreshed whenever loaddata or import_msh_prices runs.
+SARPAM_RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# The script the import_scrape_db command takes its records from
+SARPAM_SCRAPE_SCRIPT = os.path.join(settings_dir, os.pardir, os.pardir,
+                                    'scripts', 'scrape.py')
+
+# Where the render_static_pages command writes the formulation, supplier and
+# product pages for Apache to serve, see apache/production.conf
+SARPAM_STATIC_PAGES_ROOT = os.path.join(settings_dir, 'static_pages')
+
+# Threads for fetching the independent parts of a page from the database at
+# the same time (0 fetches them one after the other), see
+# infohub/backend_executor.py
+SARPAM_BACKEND_THREADS = 0
+
+# Render the price tables from preformatted cells with a template compiled
+# once, instead of through django_tables, see infohub/sarpam_table.py
+SARPAM_COMPILED_TABLES = True
+
+# Draw the price graph on the formulation page as SVG rather than with
+# nested tables, see infohub/formulation_graph.py
+SARPAM_SVG_GRAPH = False
 
 SARPAM_NUMBER_ROUNDING = 3 
 SARPAM_NUMBER_FORMAT = ".0%df"%SARPAM_NUMBER_ROUNDING
@@ -120,3 +157,10 @@ SARPAM_CURRENCY_CODE = "USD"
 # pylint: disable-msg=W0401
 # pylint: disable-msg=W0614
 from local_settings import * #@UnusedWildImport
+
+# The tests get a cache of their own rather than sharing the site's, and
+# leave the site's static pages alone
+if len(getattr(sys, 'argv', [])) > 1 and sys.argv[1] in ('test', 'jenkins'):
+    CACHE_BACKEND = 'locmem://'
+    SARPAM_STATIC_PAGES_ROOT = os.path.join(tempfile.gettempdir(),
+                                            'sarpaminfohub_test_static_pages')
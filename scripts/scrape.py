@@ -7,9 +7,14 @@ the purposes of import)
 """
 
 import os
+import collections
+import hashlib
 import json
+import multiprocessing
+import optparse
 import sqlite3
 import sys
+import time
 import pprint
 
 import csv
@@ -125,17 +130,16 @@ def appendCountryRecord(records, country_code, country_name):
     records.append(record)
     
 
-def scrapeExchangeRate(conn):
+def scrapeExchangeRate(conn, exchange_rate_keys):
     query = "SELECT * FROM exchange_rate"
     c = conn.cursor()
     c.execute(query)
     results = []
-    counter = 0
     for row in c:
         result={}
         exchange_fields = {}
 
-        result['pk'] = counter
+        result['pk'] = exchange_rate_keys.getPk("%s %s" % (row[0], row[1]))
         result['model'] = "infohub.exchangerate"
         result['fields'] = exchange_fields
         exchange_fields['symbol'] = row[0]
@@ -143,79 +147,84 @@ def scrapeExchangeRate(conn):
         exchange_fields['rate'] = row[2]
 
         results.append(result)
-        counter += 1
     return results
 
-def appendSupplierAndReturnIndex(results, manufacturer_lookups, supplier_dict,
-                                 cursor, counter):
-    for row in cursor:
-        name = getStandardisedManufacturerName(manufacturer_lookups, row[0])
-        
-        if name != "" and name not in supplier_dict:
+def appendNamedRecords(results, name_dict, names, model, keys):
+    """
+    Adds a record for each standardised name not already in name_dict.
+    """
+    for name in names:
+        if name != "" and name not in name_dict:
             result = {}
-            supplier_fields = {}
-    
-            result['pk'] = counter
-            result['model'] = "infohub.supplier"
-            result['fields'] = supplier_fields
-            supplier_fields['name'] = name
+            fields = {}
+
+            result['pk'] = keys.getPk(name)
+            result['model'] = model
+            result['fields'] = fields
+            fields['name'] = name
+
+            name_dict[name] = result['pk']
 
-            supplier_dict[name] = counter
-    
             results.append(result)
-            counter += 1
-    
-    return counter
 
-def scrapeSuppliers(conn, manufacturer_lookups):
-    query = "SELECT DISTINCT supplier FROM form1_row"
-    cursor = conn.cursor()
-    cursor.execute(query)
+def uniqueInOrder(values):
+    seen = set()
+    unique = []
 
-    results = []
-    
-    counter = 1
-    supplier_dict = {}
+    for value in values:
+        if value not in seen:
+            seen.add(value)
+            unique.append(value)
 
-    counter = appendSupplierAndReturnIndex(results, manufacturer_lookups, 
-                                           supplier_dict, cursor, counter)
-    
-    query = "SELECT DISTINCT supplier FROM form10_row"
-    cursor = conn.cursor()
-    cursor.execute(query)
-    
-    counter = appendSupplierAndReturnIndex(results, manufacturer_lookups, 
-                                           supplier_dict, cursor, counter)
+    return unique
 
-    return results, supplier_dict
+def scrapeSuppliersAndManufacturers(conn, standardiser, supplier_keys,
+                                    manufacturer_keys):
+    """
+    Returns the supplier and manufacturer records, and dicts from their
+    names to their primary keys.
 
-def scrapeManufacturers(conn, manufacturer_lookups):
-    query = "SELECT DISTINCT manufacturer FROM form1_row"
-    c = conn.cursor()
-    c.execute(query)
-    results = []
-    counter = 1
+    Both tables are read in one pass, only keeping each distinct name.
+    The names keep the order in which they first appear, so they get the
+    same primary keys as when they were scraped separately.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""SELECT 1, supplier, manufacturer FROM form1_row
+        UNION ALL
+        SELECT 10, supplier, NULL FROM form10_row""")
+
+    raw_suppliers = []
+    seen_suppliers = set()
+    raw_manufacturers = []
+    seen_manufacturers = set()
+
+    for (form, supplier, manufacturer) in cursor:
+        if supplier not in seen_suppliers:
+            seen_suppliers.add(supplier)
+            raw_suppliers.append(supplier)
+
+        if form == 1 and manufacturer not in seen_manufacturers:
+            seen_manufacturers.add(manufacturer)
+            raw_manufacturers.append(manufacturer)
+
+    raw_names = uniqueInOrder(raw_suppliers + raw_manufacturers)
+    standardised = dict(zip(raw_names,
+                            standardiser.map('manufacturerNames',
+                                             iterChunks(raw_names))))
+
+    suppliers = []
+    supplier_dict = {}
+    appendNamedRecords(suppliers, supplier_dict,
+                       [standardised[name] for name in raw_suppliers],
+                       "infohub.supplier", supplier_keys)
+
+    manufacturers = []
     manufacturer_dict = {}
-    
-    for row in c:
-        name = getStandardisedManufacturerName(manufacturer_lookups, row[0])
-        
-        if name != "" and name not in manufacturer_dict:
-            result = {}
-            manufacturer_fields = {}
-        
-            result['pk'] = counter
-            result['model'] = "infohub.manufacturer"
-            result['fields'] = manufacturer_fields
+    appendNamedRecords(manufacturers, manufacturer_dict,
+                       [standardised[name] for name in raw_manufacturers],
+                       "infohub.manufacturer", manufacturer_keys)
 
-            manufacturer_fields['name'] = name
-        
-            manufacturer_dict[name] = counter
-        
-            results.append(result)
-            counter += 1
-        
-    return results, manufacturer_dict
+    return suppliers, supplier_dict, manufacturers, manufacturer_dict
 
 def getStandardisedManufacturerName(manufacturer_lookups, name):
     name = name.strip()
@@ -225,9 +234,9 @@ def getStandardisedManufacturerName(manufacturer_lookups, name):
     return name
 
 
-def scrapeProductRegistrations(conn, drug_lookups, manufacturer_lookups):
+def scrapeProductRegistrations(conn, standardiser):
     """
-    Returns suppliers and products.
+    Yields suppliers and products a row at a time.
 
     conn - a connection to the Sqlite database
     """
@@ -239,23 +248,11 @@ def scrapeProductRegistrations(conn, drug_lookups, manufacturer_lookups):
         ON f1.country=c.id"""
     c = conn.cursor()
     c.execute(query)
-    results = []
-    for row in c:
-        result={}
-        result['country'] = row[0]
-        result['formulation'] = getStandardisedFormulationName(row[1])       
-        result['product'] = getStandardisedDrugName(drug_lookups, row[2])
-        result['manufacturer'] = getStandardisedManufacturerName(manufacturer_lookups,
-                                                                 row[3])
-        result['supplier'] = getStandardisedManufacturerName(manufacturer_lookups, 
-                                                             row[4]) or None
-        result['country_id'] = country_codes[row[5]]
-        results.append(result)
-    return results
+    return standardiser.map('registrationRows', iterChunks(c))
 
-def scrapeFormulations(conn, drug_lookups, manufacturer_lookups):
+def scrapeFormulations(conn, standardiser):
     """
-    Returns a list of formulation dicts to be turned into a JSON dump.
+    Yields formulation dicts to be turned into a JSON dump, a row at a time.
 
     conn - a connection to the Sqlite database.
     """
@@ -270,29 +267,7 @@ def scrapeFormulations(conn, drug_lookups, manufacturer_lookups):
         INNER JOIN country ON f10.country = country.id
         ORDER BY f10.description, country.name"""
     c.execute(query)
-    results = []
-    for row in c:
-        result = {}
-        
-        result['formulation'] = getStandardisedFormulationName(row[0])
-        result['landed_cost_price'] = row[1] or None
-        result['fob_price'] = row[2] or None
-        result['period'] = row[3]
-        result['unit'] = row[4]
-        result['country'] = row[5]
-        result['country_id'] = country_codes[row[6]]
-        result['fob_currency'] = row[7]
-        result['landed_currency'] = row[8]
-        result['period'] = int(row[9])
-        result['incoterm'] = row[10].strip()
-        result['volume'] = row[11]
-        result['supplier'] = getStandardisedManufacturerName(manufacturer_lookups, row[12])
-        result['supplier_country'] = row[13].lower()
-        result['manufacture_country'] = row[14]
-        
-        results.append(result)
-    return results
-
+    return standardiser.map('formulationRows', iterChunks(c))
 
 def getStandardisedFormulationName(name):
     return name.replace('*', '')
@@ -303,86 +278,511 @@ def getStandardisedDrugName(drug_lookups, name):
         
     return name
 
-def outputJson(data_dir, name, data):
+# Rows sent to a worker at a time
+CHUNK_SIZE = 1000
+
+def iterChunks(rows, size=CHUNK_SIZE):
+    """
+    Yields lists of up to size rows from rows, which may be a cursor.
+    """
+    if hasattr(rows, 'fetchmany'):
+        while True:
+            chunk = rows.fetchmany(size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+class Standardiser(object):
+    """
+    Turns chunks of rows from file.db into dicts with standardised names.
+    """
+    def __init__(self, drug_lookups, manufacturer_lookups):
+        self.drug_lookups = drug_lookups
+        self.manufacturer_lookups = manufacturer_lookups
+
+    def manufacturerNames(self, names):
+        return [getStandardisedManufacturerName(self.manufacturer_lookups, name)
+                for name in names]
+
+    def registrationRows(self, rows):
+        results = []
+        for row in rows:
+            result={}
+            result['country'] = row[0]
+            result['formulation'] = getStandardisedFormulationName(row[1])       
+            result['product'] = getStandardisedDrugName(self.drug_lookups, row[2])
+            result['manufacturer'] = getStandardisedManufacturerName(self.manufacturer_lookups,
+                                                                     row[3])
+            result['supplier'] = getStandardisedManufacturerName(self.manufacturer_lookups, 
+                                                                 row[4]) or None
+            result['country_id'] = country_codes[row[5]]
+            results.append(result)
+        return results
+
+    def formulationRows(self, rows):
+        results = []
+        for row in rows:
+            result = {}
+            
+            result['formulation'] = getStandardisedFormulationName(row[0])
+            result['landed_cost_price'] = row[1] or None
+            result['fob_price'] = row[2] or None
+            result['period'] = row[3]
+            result['unit'] = row[4]
+            result['country'] = row[5]
+            result['country_id'] = country_codes[row[6]]
+            result['fob_currency'] = row[7]
+            result['landed_currency'] = row[8]
+            result['period'] = int(row[9])
+            result['incoterm'] = row[10].strip()
+            result['volume'] = row[11]
+            result['supplier'] = getStandardisedManufacturerName(self.manufacturer_lookups, row[12])
+            result['supplier_country'] = row[13].lower()
+            result['manufacture_country'] = row[14]
+            results.append(result)
+        return results
+
+    def map(self, method_name, chunks):
+        """
+        Yields the results of standardising each row in chunks, in order.
+        """
+        method = getattr(self, method_name)
+        for chunk in chunks:
+            for result in method(chunk):
+                yield result
+
+    def close(self):
+        pass
+
+# The Standardiser of each worker process, set up by Pool's initializer
+worker_standardiser = None
+
+def initWorker(drug_lookups, manufacturer_lookups):
+    global worker_standardiser
+    worker_standardiser = Standardiser(drug_lookups, manufacturer_lookups)
+
+def standardiseInWorker(method_name, chunk):
+    return getattr(worker_standardiser, method_name)(chunk)
+
+class PoolStandardiser(Standardiser):
+    """
+    Standardises chunks in a pool of worker processes. Results still come
+    back in the order the rows were read, so primary keys are given out
+    exactly as they are without workers.
+    """
+    def __init__(self, drug_lookups, manufacturer_lookups, workers):
+        Standardiser.__init__(self, drug_lookups, manufacturer_lookups)
+        self.workers = workers
+        self.pool = multiprocessing.Pool(workers, initWorker,
+                                         (drug_lookups, manufacturer_lookups))
+
+    def map(self, method_name, chunks):
+        # Chunks are read here rather than by the pool, which would read
+        # every row into memory from another thread, and only a few at a
+        # time are handed out
+        pending = collections.deque()
+
+        for chunk in chunks:
+            pending.append(self.pool.apply_async(standardiseInWorker,
+                                                 (method_name, chunk)))
+
+            if len(pending) >= self.workers * 2:
+                for result in pending.popleft().get():
+                    yield result
+
+        while pending:
+            for result in pending.popleft().get():
+                yield result
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+class StageTimer(object):
+    """
+    Adds up the time spent in each stage of the scrape.
+    """
+    def __init__(self):
+        self.stages = []
+        self.times = {}
+        self.current = None
+        self.started = None
+
+    def start(self, stage):
+        self.stop()
+
+        if stage not in self.times:
+            self.stages.append(stage)
+            self.times[stage] = 0.0
+
+        self.current = stage
+        self.started = time.time()
+
+    def stop(self):
+        if self.current is not None:
+            self.times[self.current] += time.time() - self.started
+            self.current = None
+
+    def report(self):
+        self.stop()
+
+        print "Time taken:"
+        for stage in self.stages:
+            print "  %-30s %8.2fs" % (stage, self.times[stage])
+        print "  %-30s %8.2fs" % ("total", sum(self.times.values()))
+
+def getOutputFilename(data_dir, name):
     fixtures_path = '%s/fixtures/initial_data' % (data_dir)
-    filename = '%s/%s.json' % (fixtures_path, name)
+    return '%s/%s.json' % (fixtures_path, name)
 
-    output = open(filename, 'w')
+def outputJson(data_dir, name, data):
+    output = open(getOutputFilename(data_dir, name), 'w')
     json.dump(data, output, indent=2)
     output.close()
 
-def scrape(data_dir):
+class JsonArrayWriter(object):
+    """
+    Writes a fixture a record at a time, so the whole table never has to be
+    held in memory. The output is laid out exactly as outputJson() would.
+    """
+    def __init__(self, filename):
+        self.output = open(filename, 'w')
+        self.count = 0
+
+    def write(self, record):
+        if self.count == 0:
+            self.output.write("[\n  ")
+        else:
+            self.output.write(", \n  ")
+
+        # JSON strings can't contain newlines, so this only indents
+        self.output.write(json.dumps(record, indent=2).replace("\n", "\n  "))
+        self.count += 1
+
+    def close(self):
+        if self.count == 0:
+            self.output.write("[]")
+        else:
+            self.output.write("\n]")
+
+        self.output.close()
+
+class KeyCounter(object):
     """
-    Opens the database, scrapes a bunch of data and writes it all out to JSON
+    Numbers the records of a model in the order they are scraped.
+    """
+    def __init__(self, first_pk=1):
+        self.next_pk = first_pk
+
+    def getPk(self, key):
+        pk = self.next_pk
+        self.next_pk += 1
+        return pk
+
+    def getRowPk(self, row, fields):
+        # Nothing about the row is kept, so memory doesn't grow with the
+        # number of rows
+        return self.getPk(None)
+
+def countKeys(model, first_pk=1):
     """
+    The getKeys() of a full scrape, which numbers every model from first_pk.
+    """
+    return KeyCounter(first_pk)
+
+# The values that identify a price or registration, which unlike the rowid
+# of its form10_row or form1_row stay the same if file.db is made again
+PRICE_KEY_FIELDS = ('formulation', 'country_id', 'period', 'fob_price',
+                    'landed_cost_price', 'fob_currency', 'landed_currency',
+                    'unit', 'incoterm', 'volume', 'supplier',
+                    'supplier_country', 'manufacture_country')
+REGISTRATION_KEY_FIELDS = ('country_id', 'formulation', 'product',
+                           'manufacturer', 'supplier')
+
+class FixtureFiles(object):
+    """
+    Writes every record to the fixtures in fixtures/initial_data.
+    """
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+
+    def open(self, name):
+        return JsonArrayWriter(getOutputFilename(self.data_dir, name))
+
+    def writeAll(self, name, records):
+        outputJson(self.data_dir, name, records)
+
+    def finish(self):
+        pass
+
+class StoredKeys(object):
+    """
+    Gives each key (a name, or the values of a price or registration) the
+    same primary key on every incremental run, and new keys the next unused
+    one.
+    """
+    def __init__(self, db, model, first_pk=1):
+        self.db = db
+        self.model = model
+        self.row_counts = collections.defaultdict(int)
+
+        (max_pk,) = db.execute("SELECT MAX(pk) FROM record_key WHERE model = ?",
+                               (model,)).fetchone()
+        if max_pk is None:
+            self.next_pk = first_pk
+        else:
+            self.next_pk = max_pk + 1
+
+    def getPk(self, key):
+        key = unicode(key)
+        row = self.db.execute("SELECT pk FROM record_key "
+                              "WHERE model = ? AND key = ?",
+                              (self.model, key)).fetchone()
+        if row is not None:
+            return row[0]
+
+        pk = self.next_pk
+        self.next_pk += 1
+        self.db.execute("INSERT INTO record_key (model, key, pk) "
+                        "VALUES (?, ?, ?)", (self.model, key, pk))
+        return pk
+
+    def getRowPk(self, row, fields):
+        """
+        Keys row on the values in fields, numbering identical rows so that
+        each still gets a key of its own.
+        """
+        key = json.dumps([row[field] for field in fields])
+        count = self.row_counts[key]
+        self.row_counts[key] += 1
+
+        if count > 0:
+            key = "%s #%d" % (key, count)
+
+        return self.getPk(key)
+
+class ScrapeState(object):
+    """
+    What incremental runs have written so far, kept in scrape_state.db next
+    to file.db: the primary key given to each key and the hash of each
+    record's content.
+    """
+    def __init__(self, data_dir):
+        self.db = sqlite3.connect('%s/scrape_state.db' % (data_dir))
+        self.db.execute("""CREATE TABLE IF NOT EXISTS record_key (
+            model TEXT, key TEXT, pk INTEGER, PRIMARY KEY (model, key))""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS record_hash (
+            model TEXT, pk TEXT, hash TEXT, run INTEGER,
+            PRIMARY KEY (model, pk))""")
+
+        (last_run,) = self.db.execute("SELECT MAX(run) FROM record_hash").fetchone()
+        self.run = (last_run or 0) + 1
+
+    def getKeys(self, model, first_pk=1):
+        return StoredKeys(self.db, model, first_pk)
+
+    def hasChanged(self, record):
+        """
+        Notes that record was scraped on this run, returning True if it is
+        new or different from the last run.
+        """
+        pk = json.dumps(record['pk'])
+        record_hash = hashlib.sha1(json.dumps(record, sort_keys=True)).hexdigest()
+
+        row = self.db.execute("SELECT hash FROM record_hash "
+                              "WHERE model = ? AND pk = ?",
+                              (record['model'], pk)).fetchone()
+
+        self.db.execute("INSERT OR REPLACE INTO record_hash "
+                        "(model, pk, hash, run) VALUES (?, ?, ?, ?)",
+                        (record['model'], pk, record_hash, self.run))
+
+        return row is None or row[0] != record_hash
+
+    def removeUnseen(self):
+        """
+        Yields the records that weren't scraped on this run, forgetting them.
+        """
+        cursor = self.db.execute("SELECT model, pk FROM record_hash "
+                                 "WHERE run <> ?", (self.run,))
+        for (model, pk) in cursor:
+            yield {'model': model, 'pk': json.loads(pk)}
+
+        self.db.execute("DELETE FROM record_hash WHERE run <> ?", (self.run,))
+
+    def commit(self):
+        self.db.commit()
+
+class FixtureDelta(object):
+    """
+    Writes only the records that have changed since the last incremental
+    run to fixtures/delta/changes.json, and the ones that have gone to
+    fixtures/delta/deletes.json.
+    """
+    def __init__(self, data_dir, state, quiet=False):
+        self.state = state
+        self.quiet = quiet
+        self.delta_path = '%s/fixtures/delta' % (data_dir)
+
+        if not os.path.exists(self.delta_path):
+            os.makedirs(self.delta_path)
+
+        self.changes = JsonArrayWriter('%s/changes.json' % (self.delta_path))
+
+    def open(self, name):
+        return self
+
+    def write(self, record):
+        if self.state.hasChanged(record):
+            self.changes.write(record)
+
+    def writeAll(self, name, records):
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        # Everything goes in the one file, which stays open until finish()
+        pass
+
+    def finish(self):
+        self.changes.close()
+
+        deletes = JsonArrayWriter('%s/deletes.json' % (self.delta_path))
+        for record in self.state.removeUnseen():
+            deletes.write(record)
+        deletes.close()
+
+        self.state.commit()
+
+        if not self.quiet:
+            print "Changed records: %d" % self.changes.count
+            print "Deleted records: %d" % deletes.count
+
+def scrape(data_dir, incremental=False, workers=1, quiet=False):
+    """
+    Opens the database, scrapes a bunch of data and writes it all out to JSON.
+
+    If incremental is True only the records that have changed since the
+    last incremental run are written, along with a list of records to
+    delete, for the apply_fixture_delta management command.
+
+    With more than one worker, names are standardised in that many
+    processes. If quiet is True the counts and timings aren't printed.
+    """
+    if incremental:
+        state = ScrapeState(data_dir)
+        fixtures = FixtureDelta(data_dir, state, quiet)
+        getKeys = state.getKeys
+    else:
+        fixtures = FixtureFiles(data_dir)
+        getKeys = countKeys
+
+    scrapeTo(data_dir, fixtures, getKeys, workers, quiet)
+
+def scrapeTo(data_dir, fixtures, getKeys, workers=1, quiet=False):
+    """
+    Scrapes file.db in data_dir, handing the records to fixtures, which
+    has the open(), writeAll() and finish() methods of FixtureFiles.
+
+    getKeys(model, first_pk) returns what gives out primary keys for
+    model, such as countKeys.
+    """
+    timer = StageTimer()
+    timer.start("reading lookups")
+
     db_file = '%s/file.db' % (data_dir)
     conn = sqlite3.connect(db_file)
 
     drug_lookups = loadAndReturnDrugLookups(data_dir)
     manufacturer_lookups = loadAndReturnManufacturerLookups(data_dir)
-    
-    formulations = scrapeFormulations(conn, drug_lookups, manufacturer_lookups)
-    registrations = scrapeProductRegistrations(conn, drug_lookups, 
-                                               manufacturer_lookups)
+
+    if workers > 1:
+        standardiser = PoolStandardiser(drug_lookups, manufacturer_lookups,
+                                        workers)
+    else:
+        standardiser = Standardiser(drug_lookups, manufacturer_lookups)
+
+    try:
+        scrapeWithStandardiser(conn, standardiser, fixtures, getKeys, timer,
+                               quiet)
+    finally:
+        standardiser.close()
+
+    if not quiet:
+        timer.report()
+
+def scrapeWithStandardiser(conn, standardiser, fixtures, getKeys, timer,
+                           quiet):
+    timer.start("countries and exchange rates")
     countries = scrapeCountries(conn)
     supplier_country_records = createSupplierCountries()
     fictitious_country_records = createFictitiousCountries()
-    exchange_rates = scrapeExchangeRate(conn)
-    suppliers, supplier_dict = scrapeSuppliers(conn, manufacturer_lookups)
-    manufacturers, manufacturer_dict = scrapeManufacturers(conn,
-                                                           manufacturer_lookups)
-
-    outputJson(data_dir, "00_exchange_rates", exchange_rates)
+    exchange_rates = scrapeExchangeRate(conn, 
+                                        getKeys('infohub.exchangerate', 0))
+    fixtures.writeAll("00_exchange_rates", exchange_rates)
 
     # Temporarily disabled - using fictitious names instead
-    outputJson(data_dir, "00_countries", countries)
-    #outputJson(data_dir, "00_fictitious_countries", fictitious_country_records)
-    outputJson(data_dir, "00_supplier_countries", supplier_country_records)
-    outputJson(data_dir, "00_suppliers", suppliers)
-    outputJson(data_dir, "00_manufacturers", manufacturers)
+    fixtures.writeAll("00_countries", countries)
+    #fixtures.writeAll("00_fictitious_countries", fictitious_country_records)
+    fixtures.writeAll("00_supplier_countries", supplier_country_records)
+
+    timer.start("suppliers and manufacturers")
+    suppliers, supplier_dict, manufacturers, manufacturer_dict = \
+        scrapeSuppliersAndManufacturers(conn, standardiser,
+                                        getKeys('infohub.supplier'),
+                                        getKeys('infohub.manufacturer'))
+
+    fixtures.writeAll("00_suppliers", suppliers)
+    fixtures.writeAll("00_manufacturers", manufacturers)
 
     # formulations
-    form_counter = 0
-    formulation_table = []
+    timer.start("formulations and prices")
+    formulations = scrapeFormulations(conn, standardiser)
+
+    formulation_keys = getKeys('infohub.formulation')
+    formulation_table = fixtures.open('00_formulations')
     formulation_dict = {}
 
-    price_counter = 0
-    price_table = []
+    price_keys = getKeys('infohub.price')
+    price_table = fixtures.open('10_prices')
 
-    incoterm_counter = 0
-    incoterm_table = []
+    incoterm_keys = getKeys('infohub.incoterm')
+    incoterm_table = fixtures.open('00_incoterms')
     incoterm_dict = {}
     
     for f in formulations:
-        price_counter+=1
+        price_pk = price_keys.getRowPk(f, PRICE_KEY_FIELDS)
         if not f['formulation'] in formulation_dict:
-            form_counter+=1
+            form_pk = formulation_keys.getPk(f['formulation'])
             formulation_fields = {}
-            formulation_table.append({'pk': form_counter,
-                                      'model': "infohub.formulation",
-                                      'fields' : formulation_fields})
-
             formulation_fields['name'] = f['formulation']
-            formulation_dict[f['formulation']] = form_counter
+            formulation_table.write({'pk': form_pk,
+                                     'model': "infohub.formulation",
+                                     'fields' : formulation_fields})
+
+            formulation_dict[f['formulation']] = form_pk
             
         incoterm = f['incoterm']
         if incoterm == "":
             incoterm = "FOB"
 
         if not incoterm in incoterm_dict:
-            incoterm_counter+=1
+            incoterm_pk = incoterm_keys.getPk(incoterm)
             incoterm_fields = {}
-            incoterm_table.append({'pk' : incoterm_counter,
-                                   'model' : "infohub.incoterm",
-                                   'fields' : incoterm_fields})
             incoterm_fields['name'] = incoterm
-            incoterm_dict[incoterm] = incoterm_counter
+            incoterm_table.write({'pk' : incoterm_pk,
+                                  'model' : "infohub.incoterm",
+                                  'fields' : incoterm_fields})
+            incoterm_dict[incoterm] = incoterm_pk
                    
         incoterm_id = incoterm_dict[incoterm]
             
         price_record = {}
         price_fields = {}
-        price_record['pk'] = price_counter
+        price_record['pk'] = price_pk
         price_record['fields'] = price_fields
         price_record['model'] = "infohub.price"
 
@@ -416,18 +816,21 @@ def scrape(data_dir):
             else:
                 country_id = supplier_country_translations[supplier_country]
         
-        price_table.append(price_record)
-    outputJson(data_dir,'00_formulations', formulation_table)
-    outputJson(data_dir,'10_prices', price_table)
-    outputJson(data_dir,'00_incoterms', incoterm_table)
+        price_table.write(price_record)
+    formulation_table.close()
+    price_table.close()
+    incoterm_table.close()
 
     # Product
-    product_table = []
+    timer.start("products and registrations")
+    registrations = scrapeProductRegistrations(conn, standardiser)
+
+    product_keys = getKeys('infohub.product')
+    product_table = fixtures.open('10_products')
     product_dict = {}
-    product_counter = 0
     
-    registration_table = []
-    registration_counter = 0
+    registration_keys = getKeys('infohub.productregistration')
+    registration_table = fixtures.open('20_product_registrations')
     
     unknown_formulations = set()
     pp = pprint.PrettyPrinter(indent=4)
@@ -443,28 +846,26 @@ def scrape(data_dir):
             num_unknown+=1
             continue
         
-        registration_counter+=1
-        
         registration_record = {}
         registration_fields = {}
-        registration_record['pk'] = registration_counter
+        registration_record['pk'] = registration_keys.getRowPk(
+            registration, REGISTRATION_KEY_FIELDS)
         registration_record['model'] = 'infohub.productregistration'
         registration_record['fields'] = registration_fields
         
         product_name = registration['product']
         
         if not product_name in product_dict:
-            product_counter+=1
-            product_dict[product_name] = product_counter
+            product_dict[product_name] = product_keys.getPk(product_name)
             product_record = {}
             product_fields = {}
-            product_record['pk'] = product_counter
+            product_record['pk'] = product_dict[product_name]
             product_record['model'] = "infohub.product"
             product_record['fields'] = product_fields
 
             product_fields['formulation'] = formulation_id
             product_fields['name'] = product_name
-            product_table.append(product_record)
+            product_table.write(product_record)
         else:
             num_dup+=1
 
@@ -486,17 +887,21 @@ def scrape(data_dir):
 
         registration_fields['country'] = registration['country_id']
 
-        registration_table.append(registration_record)
+        registration_table.write(registration_record)
+
+    product_table.close()
+    registration_table.close()
 
-    outputJson(data_dir, '10_products', product_table)
-    outputJson(data_dir, '20_product_registrations', registration_table) 
+    timer.start("finishing fixtures")
+    fixtures.finish()
 
     output = open('unknownFormulationsInProducts.json', 'w')
     json.dump(list(unknown_formulations), output, indent=2)
     output.close()
 
-    print "Number of duplicate products: %d" % num_dup
-    print "Number of unknown formulations: %d" % num_unknown
+    if not quiet:
+        print "Number of duplicate products: %d" % num_dup
+        print "Number of unknown formulations: %d" % num_unknown
 
 def loadAndReturnDrugLookups(data_dir):
     csv_reader = getCsvReader(data_dir, 'drugs2')
@@ -537,4 +942,20 @@ def getCsvReader(data_dir, filename):
     
     
 if __name__ == "__main__":
-    scrape(sys.argv[1])
+    parser = optparse.OptionParser(usage="%prog [options] data_dir")
+    parser.add_option("--incremental", action="store_true", default=False,
+                      help="only write the records changed since the last "
+                      "incremental run, to fixtures/delta")
+    parser.add_option("--workers", type="int", default=1, metavar="N",
+                      help="standardise names in N processes")
+    parser.add_option("--quiet", action="store_true", default=False,
+                      help="don't print the counts and timings")
+    (options, args) = parser.parse_args()
+
+    if len(args) != 1:
+        parser.error("give the directory containing file.db")
+
+    if options.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    scrape(args[0], options.incremental, options.workers, options.quiet)